@@ -1,120 +1,24 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, render_template, jsonify, request, Response, stream_with_context
 import webbrowser
 import threading
 import time
 import json
-import os
+import logging
 from datetime import datetime
-from src.gmail_client import GmailClient
-from src.llm_service import LLMService
-from config.config import MAX_EMAILS_TO_PROCESS
+from src import metrics
+from src.jobs import JobManager
+from src.accounts import list_accounts
+from src.pipeline import email_store, import_legacy_emails, load_email_body, run_processing
+from config.config import LOG_LEVEL, LOG_FORMAT
+
+logging.basicConfig(level=LOG_LEVEL, format=LOG_FORMAT)
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-DATA_FILE = 'emails_data.json'
-
-def load_emails():
-    if os.path.exists(DATA_FILE):
-        try:
-            with open(DATA_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return []
-    return []
-
-def save_emails(emails):
-    with open(DATA_FILE, 'w') as f:
-        json.dump(emails, f, indent=2)
-
-def simple_categorize_email(subject, content):
-    text = f"{subject} {content}".lower()
-    categories = []
-    CATEGORIES = {
-        'IMPORTANT': ['urgent', 'important', 'critical', 'asap'],
-        'DEADLINE': ['deadline', 'due', 'by', 'before'],
-        'ACTION_REQUIRED': ['action required', 'please respond', 'needs your attention'],
-        'MEETING': ['meeting', 'schedule', 'appointment', 'call']
-    }
-    for category, keywords in CATEGORIES.items():
-        if any(keyword.lower() in text for keyword in keywords):
-            categories.append(category)
-    return categories
-
-def simple_summarize_email(content):
-    sentences = content.split('.')
-    sentences = [s.strip() for s in sentences if s.strip()]
-    if len(sentences) > 1:
-        summary = f"{sentences[0]}... {sentences[-1]}"
-    elif len(sentences) == 1:
-        summary = sentences[0]
-    else:
-        summary = "No content to summarize"
-    if len(summary) > 200:
-        summary = summary[:200] + "..."
-    return summary
-
-def process_email_with_llm(email_data, llm_service):
-    """Process a single email with LLM-powered analysis."""
-    if not email_data:
-        return None
-
-    subject = email_data.get('subject', '')
-    content = email_data.get('content', '')
-    sender = email_data.get('from', '')
-    from_name = email_data.get('from_name', '')
-    from_email = email_data.get('from_email', '')
-
-    print(f"[DEBUG] Processing email with LLM: {subject[:50]}...")
-
-    importance_level = llm_service.classify_email_importance(subject, content)
-    summary = simple_summarize_email(content)
-    deadlines = []
-    has_deadline = False
-    important_links = []
-    attachments_mentioned = []
-
-    print(f"[DEBUG] LLM Analysis - Importance: {importance_level}")
-    print(f"[DEBUG] Summary: {summary[:100]}...")
-
-    return {
-        'id': email_data.get('id'),
-        'subject': subject,
-        'from': sender,
-        'from_name': from_name,
-        'from_email': from_email,
-        'importance_level': importance_level,
-        'deadlines': deadlines,
-        'summary': summary,
-        'important_links': important_links,
-        'attachments_mentioned': attachments_mentioned,
-        'is_important': importance_level == 'Very Important',
-        'has_deadline': has_deadline,
-        'processed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
-
-def process_email_simple(email_data):
-    if not email_data:
-        return None
-    subject = email_data.get('subject', '')
-    content = email_data.get('content', '')
-    sender = email_data.get('from', '')
-    from_name = email_data.get('from_name', '')
-    from_email = email_data.get('from_email', '')
-    categories = simple_categorize_email(subject, content)
-    summary = simple_summarize_email(content)
-    return {
-        'id': email_data.get('id'),
-        'subject': subject,
-        'from': sender,
-        'from_name': from_name,
-        'from_email': from_email,
-        'categories': categories,
-        'deadlines': [],
-        'summary': summary,
-        'is_important': 'IMPORTANT' in categories,
-        'has_deadline': 'DEADLINE' in categories,
-        'processed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    }
+job_manager = JobManager()
+
+import_legacy_emails()
 
 @app.route('/')
 def index():
@@ -122,90 +26,226 @@ def index():
 
 @app.route('/api/process-emails', methods=['POST'])
 def process_emails():
+    """Start a background processing job, or join the one already running."""
     try:
-        save_emails([])
-        gmail_client = GmailClient()
-        print("[DEBUG] Initializing LLM service...")
-        llm_service = LLMService()
-        use_llm = llm_service.api_key is not None
-        if use_llm:
-            print("[DEBUG] Using LLM-powered processing")
-        else:
-            print("[DEBUG] API key not found, using simple processing")
-        print("[DEBUG] Authenticating with Gmail API...")
-        gmail_client.authenticate()
-        print("[DEBUG] Fetching unread messages...")
-        messages = gmail_client.list_messages(
-            query='is:unread in:inbox', max_results=MAX_EMAILS_TO_PROCESS)
-        processed_emails = []
-        for message in messages:
-            print(f"[DEBUG] Processing message ID: {message['id']}")
-            full_message = gmail_client.get_message(message['id'])
-            if not full_message:
-                continue
-            email_data = gmail_client.get_message_content(full_message)
-            print("DEBUG EMAIL DATA:", email_data)
-            if not email_data:
-                continue
-            if use_llm:
-                processed_data = process_email_with_llm(email_data, llm_service)
-            else:
-                processed_data = process_email_simple(email_data)
-            if not processed_data:
-                continue
-            processed_emails.append(processed_data)
-        save_emails(processed_emails)
-        processing_method = "LLM-powered" if use_llm else "Simple"
+        options = request.get_json(silent=True) or {}
+        job, created = job_manager.start(run_processing, options)
         return jsonify({
             'success': True,
-            'message': f'Processed {len(processed_emails)} emails using {processing_method} analysis',
-            'emails': processed_emails,
-            'method': processing_method
-        })
+            'job_id': job.id,
+            'created': created,
+            'status_url': f'/api/jobs/{job.id}'
+        }), 202
     except Exception as e:
-        print(f"[ERROR] An error occurred: {e}")
+        logger.error("Could not start processing: %s", e)
         return jsonify({
             'success': False,
             'message': f'Error processing emails: {str(e)}'
         }), 500
 
+def sse_event(event, data, event_id=None):
+    """Format one Server-Sent Events message."""
+    message = f"id: {event_id}\n" if event_id is not None else ''
+    return message + f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def stream_job_events(job, start=0):
+    """Yield each email of a job as it is processed, with progress updates, then a done event."""
+    index = start
+    yield sse_event('job', {'job_id': job.id})
+    while True:
+        index, emails, running = job.wait_for_emails(index, timeout=1.0)
+        for email in emails:
+            yield sse_event('email', email, event_id=index)
+            index += 1
+        if not running:
+            break
+        yield sse_event('progress', job.to_dict())
+    yield sse_event('done', job.to_dict())
+
+@app.route('/api/process-emails/stream')
+def stream_process_emails():
+    """Stream processed emails of a job as Server-Sent Events.
+
+    Streams the job named by ?job_id=, as returned by POST
+    /api/process-emails. Reconnecting clients send Last-Event-ID and resume
+    after the last email they saw, or after the oldest one the job still
+    keeps (see Job.emails).
+    """
+    job_id = request.args.get('job_id')
+    if not job_id:
+        return jsonify({
+            'success': False,
+            'message': 'job_id is required; start a job with POST /api/process-emails'
+        }), 400
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({
+            'success': False,
+            'message': 'Job not found'
+        }), 404
+    try:
+        start = int(request.headers.get('Last-Event-ID', -1)) + 1
+    except ValueError:
+        start = 0
+    return Response(stream_with_context(stream_job_events(job, start)),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/jobs/<job_id>')
+def get_job_status(job_id):
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({
+            'success': False,
+            'message': 'Job not found'
+        }), 404
+    return jsonify({
+        'success': True,
+        'job': job.to_dict()
+    })
+
+LIST_FIELDS = ('id', 'account', 'subject', 'from', 'from_name', 'from_email', 'importance_level',
+               'is_important', 'has_deadline', 'deadlines', 'received_time', 'processed_at')
+SORT_ORDERS = ('received', 'deadline')
+MAX_PAGE_SIZE = 500
+
+def parse_time_param(value):
+    """Parse epoch milliseconds or an ISO 8601 date/time (local time unless it has an offset)."""
+    if value.isdigit():
+        return int(value)
+    return int(datetime.fromisoformat(value).timestamp() * 1000)
+
+def parse_bool_param(value):
+    if value.lower() in ('1', 'true', 'yes'):
+        return True
+    if value.lower() in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f"Expected a boolean, got {value!r}")
+
 @app.route('/api/emails')
 def get_emails():
+    """List processed emails, newest first, one page at a time.
+
+    Query parameters: account, importance, has_deadline, sender (address or
+    domain), since/until (epoch ms or ISO 8601), due_after/due_before (the
+    earliest deadline, likewise), sort (received, newest first, or
+    deadline, soonest first), fields (comma-separated), limit and cursor
+    (the next_cursor of the previous page). Responses carry an ETag, and
+    If-None-Match gets a 304 while nothing changed.
+    """
+    args = request.args
     try:
-        emails = load_emails()
-        email_list = []
-        for email in emails:
-            email_list.append({
-                'id': email['id'],
-                'subject': email['subject'],
-                'from': email.get('from', ''),
-                'from_name': email.get('from_name', ''),
-                'from_email': email.get('from_email', ''),
-                'is_important': email['is_important'],
-                'has_deadline': email['has_deadline'],
-                'categories': email['categories'],
-                'processed_at': email['processed_at']
-            })
+        limit = min(max(int(args.get('limit', 50)), 1), MAX_PAGE_SIZE)
+        has_deadline = args.get('has_deadline')
+        has_deadline = parse_bool_param(has_deadline) if has_deadline else None
+        since = parse_time_param(args['since']) if args.get('since') else None
+        until = parse_time_param(args['until']) if args.get('until') else None
+        due_after = parse_time_param(args['due_after']) if args.get('due_after') else None
+        due_before = parse_time_param(args['due_before']) if args.get('due_before') else None
+        sort = args.get('sort', 'received')
+        if sort not in SORT_ORDERS:
+            raise ValueError(f"Expected sort to be one of {', '.join(SORT_ORDERS)}, got {sort!r}")
+    except ValueError as e:
         return jsonify({
-            'success': True,
-            'emails': email_list
-        })
+            'success': False,
+            'message': f'Invalid parameter: {str(e)}'
+        }), 400
+    fields = [f for f in args.get('fields', '').split(',') if f] or LIST_FIELDS
+
+    try:
+        etag = f"emails-{email_store.version()}"
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+            response.set_etag(etag)
+            return response
+        emails, next_cursor = email_store.query_emails(
+            account=args.get('account'), importance_level=args.get('importance'),
+            has_deadline=has_deadline, sender=args.get('sender'),
+            received_after=since, received_before=until,
+            due_after=due_after, due_before=due_before, sort=sort,
+            cursor=args.get('cursor'), limit=limit)
+    except ValueError:
+        return jsonify({
+            'success': False,
+            'message': 'Invalid cursor'
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
             'message': f'Error loading emails: {str(e)}'
         }), 500
 
+    response = jsonify({
+        'success': True,
+        'emails': [{field: email.get(field) for field in fields} for email in emails],
+        'next_cursor': next_cursor
+    })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+SEARCH_FIELDS = ('id', 'account', 'subject', 'from', 'importance_level', 'received_time')
+MAX_SEARCH_RESULTS = 100
+
+@app.route('/api/search')
+def search_emails():
+    """Full-text search over subject, sender, summary and body, best matches first.
+
+    Query parameters: q (all words must match, the last one as a prefix),
+    account and limit. Each result has an HTML snippet with the matched
+    words in <mark> tags.
+    """
+    query = request.args.get('q', '').strip()
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), MAX_SEARCH_RESULTS)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'message': f'Invalid parameter: {str(e)}'
+        }), 400
+    if not query:
+        return jsonify({
+            'success': False,
+            'message': 'Missing search query'
+        }), 400
+
+    try:
+        results = email_store.search(query, account=request.args.get('account'), limit=limit)
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': f'Error searching emails: {str(e)}'
+        }), 500
+    return jsonify({
+        'success': True,
+        'results': [dict({field: email.get(field) for field in SEARCH_FIELDS},
+                         snippet=snippet, score=round(score, 3))
+                    for email, snippet, score in results]
+    })
+
+@app.route('/metrics')
+def get_metrics():
+    """Pipeline stage timings, LLM usage and error counters in the Prometheus text format."""
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+@app.route('/api/accounts')
+def get_accounts():
+    return jsonify({
+        'success': True,
+        'accounts': list_accounts()
+    })
+
 @app.route('/api/email/<email_id>')
 def get_email_summary(email_id):
+    """Return one processed email with its body, fetched from Gmail the first time it is opened."""
     try:
-        emails = load_emails()
-        email = next((e for e in emails if e['id'] == email_id), None)
+        email = email_store.get_email(email_id, account=request.args.get('account'))
         if not email:
             return jsonify({
                 'success': False,
                 'message': 'Email not found'
             }), 404
+        email['body'] = load_email_body(email)
         return jsonify({
             'success': True,
             'email': email
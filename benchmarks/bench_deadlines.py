@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark deadline extraction.
+
+Runs src/deadlines.py over synthetic email bodies of increasing size and
+reports emails per second, and how many emails the old DEADLINE keyword
+rule (any "by", "before", "due" or "deadline") and the extractor flag.
+With --corpus, bodies are extracted from captured Gmail API messages
+(JSON files saved from messages().get(format='full')) and a few
+emails' deadlines are printed.
+
+Usage:
+    python benchmarks/bench_deadlines.py [--corpus DIR] [--repeat N] [--show N]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.deadlines import email_deadlines
+from src.keyword_matcher import KeywordMatcher
+
+LEGACY_RULE = KeywordMatcher({'DEADLINE': ['deadline', 'due', 'by', 'before']})
+WORDS = ('please review the attached invoice and the meeting notes sent by the team before '
+         'we sign the contract confirm the shipment close the account and update the report '
+         'for the quarterly review written by our partners').split()
+DEADLINE_PHRASES = ('Payment is due on March 3.', 'Please reply by Friday.',
+                    'The deadline for entries is October 23 at 5pm.', 'Your offer expires in 3 days.',
+                    'Submit the form no later than 11/30.', 'RSVP by 5pm tomorrow.',
+                    'Renew before Dec 31, 2026 to keep your plan.')
+DATE_HEADER = 'Thu, 15 Oct 2026 09:30:00 -0700'
+
+
+def synthetic_email(size_kb, rng, deadline_rate=0.2):
+    """A body of plain sentences, with a deadline phrase in about deadline_rate of emails."""
+    sentences = []
+    size = 0
+    while size < size_kb * 1024:
+        sentence = ' '.join(rng.choices(WORDS, k=rng.randint(8, 20))).capitalize() + '.'
+        sentences.append(sentence)
+        size += len(sentence) + 1
+    if rng.random() < deadline_rate:
+        sentences.insert(rng.randrange(len(sentences) + 1), rng.choice(DEADLINE_PHRASES))
+    return {'subject': 'Quarterly update', 'content': ' '.join(sentences),
+            'date_header': DATE_HEADER}
+
+
+def load_corpus(directory):
+    from benchmarks.bench_extraction import load_corpus as load_messages
+    from src.gmail_client import GmailClient
+    client = GmailClient()
+    emails = []
+    for message in load_messages(directory):
+        email_data = client.get_message_content(message)
+        if email_data:
+            emails.append(email_data)
+    return emails
+
+
+def run(emails, repeat):
+    """Return (emails per second, emails with deadlines)."""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        flagged = sum(1 for email_data in emails if email_deadlines(email_data))
+    elapsed = time.perf_counter() - started
+    return repeat * len(emails) / elapsed, flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--corpus', help='directory of captured Gmail message JSON files')
+    parser.add_argument('--sizes', default='1,5,20,50,200', help='synthetic body sizes in KB')
+    parser.add_argument('--emails', type=int, default=200, help='synthetic emails per size')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--show', type=int, default=5, help='emails whose deadlines are printed')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    if args.corpus:
+        groups = [('corpus', load_corpus(args.corpus))]
+    else:
+        groups = [(f'{size} KB', [synthetic_email(int(size), rng) for _ in range(args.emails)])
+                  for size in args.sizes.split(',')]
+
+    print(f"{'bodies':<10} {'emails/s':>10} {'per email':>12} {'old rule':>9} {'extracted':>10}")
+    for label, emails in groups:
+        if not emails:
+            print(f"{label:<10} no emails")
+            continue
+        rate, flagged = run(emails, args.repeat)
+        legacy = sum(1 for email_data in emails
+                     if LEGACY_RULE.categories(f"{email_data['subject']} {email_data['content']}"))
+        print(f"{label:<10} {rate:10.0f} {1000 / rate:9.3f} ms {legacy:9d} {flagged:10d}")
+
+    shown = 0
+    for email_data in groups[0][1]:
+        deadlines = email_deadlines(email_data)
+        if deadlines and shown < args.show:
+            print(f"\n{email_data['subject'][:60]!r} ({email_data.get('date_header')}): {deadlines}")
+            shown += 1
+
+
+if __name__ == '__main__':
+    main()
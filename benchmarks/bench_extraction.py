@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Benchmark MIME body extraction.
+
+Runs GmailClient's body extraction over a corpus of captured Gmail API
+messages (JSON files saved from messages().get(format='full')) and reports
+throughput and how much text ends up in the LLM prompt, compared with the
+previous naive tag-stripping implementation.
+
+Usage:
+    python benchmarks/bench_extraction.py [--corpus DIR] [--repeat N]
+
+Without --corpus a synthetic set of marketing-style HTML emails is used.
+"""
+
+import os
+import re
+import sys
+import json
+import html
+import time
+import base64
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.gmail_client import GmailClient
+
+
+def legacy_extract_text(part):
+    """The extraction used before src/text_extraction.py, kept for comparison."""
+    data = part.get('body', {}).get('data', '')
+    if not data:
+        return ''
+    decoded = base64.urlsafe_b64decode(data)
+    try:
+        text = decoded.decode('utf-8')
+    except UnicodeDecodeError:
+        text = decoded.decode('latin-1')
+    if 'html' in part.get('mimeType', '').lower():
+        text = re.sub(r'<[^>]+>', '', text)
+        text = html.unescape(text)
+    return text.strip()
+
+
+def legacy_extract(payload):
+    parts = []
+    if payload.get('body', {}).get('data'):
+        parts.append(legacy_extract_text(payload))
+    for part in payload.get('parts', []):
+        if 'parts' in part:
+            parts.extend(legacy_extract(part))
+        else:
+            parts.append(legacy_extract_text(part))
+    return [p for p in parts if p]
+
+
+def _encode(text, charset='utf-8'):
+    return base64.urlsafe_b64encode(text.encode(charset)).decode('ascii')
+
+
+def synthetic_message(index, html_kb=200):
+    """Build a marketing email with a heavy HTML part."""
+    style = '<style>' + ''.join(
+        f'.c{i} {{ color: #{i:06x}; padding: {i % 9}px; font-family: Arial; }}\n'
+        for i in range(400)) + '</style>'
+    row = ('<tr><td class="c1"><!--[if mso]><table><tr><td><![endif]-->'
+           '<a href="https://click.example.com/track?u=abcdef0123456789&id={i}">'
+           'Shop the sale on item {i} &amp; save 20%</a>'
+           '<img src="https://img.example.com/{i}.png" width="1" height="1">'
+           '<span style="display:none">&#847;&zwnj;&nbsp;</span></td></tr>\n')
+    rows = []
+    size = len(style)
+    i = 0
+    while size < html_kb * 1024:
+        rows.append(row.format(i=i))
+        size += len(rows[-1])
+        i += 1
+    markup = (f'<html><head><title>Sale {index}</title>{style}</head><body>'
+              f'<script>window.track({index});</script><table>{"".join(rows)}</table>'
+              '<p>You received this email because you subscribed. Unsubscribe here.</p>'
+              '</body></html>')
+    plain = f'Our big sale #{index} is on now. View it in your browser.'
+    html_part = {'mimeType': 'text/html',
+                 'headers': [{'name': 'Content-Type', 'value': 'text/html; charset="utf-8"'}],
+                 'body': {'data': _encode(markup)}}
+    headers = [{'name': 'Subject', 'value': f'Big sale #{index}'},
+               {'name': 'From', 'value': 'Shop <news@shop.example.com>'}]
+    if index % 2:
+        # Half the corpus is HTML-only, so the HTML converter is always exercised.
+        return {'id': f'synthetic-{index}', 'snippet': plain[:100],
+                'payload': dict(html_part, headers=headers)}
+    return {
+        'id': f'synthetic-{index}',
+        'snippet': plain[:100],
+        'payload': {
+            'mimeType': 'multipart/alternative',
+            'headers': headers,
+            'parts': [
+                {'mimeType': 'text/plain',
+                 'headers': [{'name': 'Content-Type', 'value': 'text/plain; charset="utf-8"'}],
+                 'body': {'data': _encode(plain)}},
+                html_part
+            ]
+        }
+    }
+
+
+def load_corpus(directory):
+    messages = []
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.json'):
+            with open(os.path.join(directory, name), 'r') as f:
+                messages.append(json.load(f))
+    return messages
+
+
+def run(label, extract, messages, repeat):
+    started = time.perf_counter()
+    output_chars = 0
+    for _ in range(repeat):
+        output_chars = 0
+        for message in messages:
+            output_chars += sum(len(text) for text in extract(message['payload']))
+    elapsed = time.perf_counter() - started
+    per_message_ms = elapsed / (repeat * len(messages)) * 1000
+    print(f"{label:<10} {per_message_ms:8.2f} ms/message  "
+          f"{repeat * len(messages) / elapsed:8.1f} messages/sec  "
+          f"{output_chars / len(messages) / 1024:8.1f} KB text/message")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--corpus', help='directory of captured Gmail message JSON files')
+    parser.add_argument('--messages', type=int, default=20, help='synthetic messages to generate')
+    parser.add_argument('--html-kb', type=int, default=200, help='size of each synthetic HTML part')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.corpus:
+        messages = load_corpus(args.corpus)
+    else:
+        messages = [synthetic_message(i, args.html_kb) for i in range(args.messages)]
+    if not messages:
+        print("No messages to benchmark.")
+        return
+
+    raw_kb = sum(len(json.dumps(m['payload'])) for m in messages) / len(messages) / 1024
+    print(f"{len(messages)} messages, {raw_kb:.1f} KB payload/message, {args.repeat} repeats\n")
+    client = GmailClient()
+    run('legacy', legacy_extract, messages, args.repeat)
+    run('current', client._extract_content_recursive, messages, args.repeat)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+"""
+Benchmark the sync-and-classify pipeline end to end, offline.
+
+Runs src.pipeline.sync_account against a synthetic mailbox served by a
+fake Gmail service, through the real GmailClient batching and MIME
+extraction, with LLMService talking to a local stub chat-completions
+server that answers after a configurable latency. Nothing touches the
+network or the app's database, so it can run in CI.
+
+Reports emails/sec, p50/p95 latency from an email being extracted to it
+being classified, seconds per pipeline stage, Gmail data downloaded and
+quota units spent, and peak RSS.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--messages N] [--mime plain|alternative|mixed]
+                                        [--html-kb KB] [--llm-latency-ms MS]
+                                        [--fetch-format metadata|full]
+                                        [--min-emails-per-sec N] [--max-p95-ms MS]
+
+--corpus DIR replays captured Gmail messages (as in bench_extraction.py)
+instead of synthetic ones. The --min/--max thresholds make the script
+exit with status 1 when a run is slower, for use as a CI check.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import base64
+import random
+import logging
+import argparse
+import tempfile
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.gmail_client import GmailClient
+from src.jobs import Job
+
+IMPORTANCE_LEVELS = ["Very Important", "Important", "Unimportant"]
+SENDERS = ['billing@vendor.example.com', 'alice@team.example.org', 'news@shop.example.com',
+           'bob@client.example.net', 'noreply@service.example.io', 'carol@school.example.edu']
+BULK_SENDERS = {'news@shop.example.com', 'noreply@service.example.io'}
+WORDS = ('please review the attached invoice before friday meeting project deadline update '
+         'report contract shipment order account security travel budget schedule interview '
+         'offer sale discount receipt renewal conference agenda proposal draft feedback').split()
+PROMO_WORDS = ('sale discount deal coupon newsletter shop now new arrivals trending free shipping '
+               'limited time collection season picks style gift save members exclusive').split()
+
+
+def _encode(text):
+    return base64.urlsafe_b64encode(text.encode('utf-8')).decode('ascii')
+
+
+def _part(mime_type, text):
+    return {'mimeType': mime_type,
+            'headers': [{'name': 'Content-Type', 'value': f'{mime_type}; charset="utf-8"'}],
+            'body': {'data': _encode(text), 'size': len(text)}}
+
+
+def synthetic_message(index, rng, mime='alternative', html_kb=20, senders=200):
+    """Build a Gmail API message (format='full') with the requested MIME structure.
+
+    Mail from BULK_SENDERS is promotional, with the labels and headers of
+    bulk mail.
+    """
+    address = SENDERS[index % len(SENDERS)]
+    words = PROMO_WORDS if address in BULK_SENDERS else WORDS
+    sentences = ['. '.join(' '.join(rng.choices(words, k=rng.randint(6, 14))).capitalize()
+                           for _ in range(rng.randint(3, 8)))]
+    plain = f"Hi,\n\n{sentences[0]}.\n\nThanks,\nSender {index % senders}"
+    row = '<tr><td style="padding:4px;font-family:Arial"><a href="https://t.example.com/{i}">{text}</a></td></tr>\n'
+    rows, size = [], 0
+    while size < html_kb * 1024:
+        rows.append(row.format(i=len(rows), text=' '.join(rng.choices(words, k=8))))
+        size += len(rows[-1])
+    markup = f'<html><body><p>{sentences[0]}</p><table>{"".join(rows)}</table></body></html>'
+
+    if mime == 'plain':
+        payload = _part('text/plain', plain)
+    elif mime == 'alternative':
+        payload = {'mimeType': 'multipart/alternative',
+                   'parts': [_part('text/plain', plain), _part('text/html', markup)]}
+    else:
+        # A forwarded-style message: alternative text, a nested message and an attachment
+        payload = {'mimeType': 'multipart/mixed', 'parts': [
+            {'mimeType': 'multipart/alternative',
+             'parts': [_part('text/plain', plain), _part('text/html', markup)]},
+            {'mimeType': 'message/rfc822', 'parts': [
+                {'mimeType': 'multipart/alternative',
+                 'parts': [_part('text/plain', plain[:200]), _part('text/html', markup[:4096])]}]},
+            {'mimeType': 'application/pdf', 'filename': f'invoice-{index}.pdf',
+             'body': {'attachmentId': f'att-{index}', 'size': 48213}}]}
+    sender = address.replace('@', f'{index % senders}@', 1)
+    labels = ['UNREAD', 'INBOX']
+    headers = [
+        {'name': 'Subject', 'value': ' '.join(rng.choices(words, k=6)).capitalize()},
+        {'name': 'From', 'value': f'Sender {index % senders} <{sender}>'},
+        {'name': 'Date', 'value': 'Mon, 1 Jan 2024 09:00:00 +0000'}]
+    if address in BULK_SENDERS:
+        labels.append('CATEGORY_PROMOTIONS')
+        headers.append({'name': 'List-Unsubscribe', 'value': f'<https://{address}/unsubscribe>'})
+    payload['headers'] = headers + payload.get('headers', [])
+    return {'id': f'm{index:07d}', 'threadId': f't{index:07d}', 'labelIds': labels,
+            'snippet': plain[:100], 'internalDate': str(1704099600000 + index * 60000),
+            'payload': payload}
+
+
+class _Request:
+    def __init__(self, execute, latency=0.0):
+        self._execute = execute
+        self.latency = latency
+
+    def execute(self):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._execute()
+
+
+class FakeBatch:
+    def __init__(self, service, callback):
+        self.service = service
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id):
+        self.requests.append((request_id, request))
+
+    def execute(self):
+        if self.service.latency:
+            time.sleep(self.service.latency)
+        for request_id, request in self.requests:
+            try:
+                self.callback(request_id, request._execute(), None)
+            except Exception as e:
+                self.callback(request_id, None, e)
+
+
+class FakeGmailService:
+    """Serves a list of Gmail messages through the subset of the API GmailClient uses."""
+
+    def __init__(self, messages, latency=0.0):
+        self._messages = {message['id']: message for message in messages}
+        self._sizes = {message['id']: len(json.dumps(message)) for message in messages}
+        self._order = [message['id'] for message in messages]
+        self.latency = latency  # Seconds per API round trip (one per batch)
+        self.bytes_served = 0
+        self._lock = threading.Lock()
+
+    def _serve(self, msg_id, msg_format, metadata_headers):
+        message = self._messages[msg_id]
+        if msg_format == 'metadata':
+            wanted = {name.lower() for name in metadata_headers or ()}
+            message = dict(message, payload={
+                'mimeType': message['payload']['mimeType'],
+                'headers': [header for header in message['payload']['headers']
+                            if header['name'].lower() in wanted]})
+            size = len(json.dumps(message))
+        else:
+            size = self._sizes[msg_id]
+        with self._lock:
+            self.bytes_served += size
+        return message
+
+    def users(self):
+        return self
+
+    def labels(self):
+        return self
+
+    def history(self):
+        raise NotImplementedError('Only full syncs are benchmarked')
+
+    def getProfile(self, userId):
+        return _Request(lambda: {'historyId': '1'}, self.latency)
+
+    def get(self, userId, id, format='full', metadataHeaders=None):
+        if id == 'INBOX':
+            return _Request(lambda: {'messagesUnread': len(self._order)}, self.latency)
+        return _Request(lambda: self._serve(id, format, metadataHeaders), self.latency)
+
+    def list(self, userId, q='', maxResults=100, pageToken=None):
+        start = int(pageToken or 0)
+        end = start + maxResults
+        page = {'messages': [{'id': msg_id} for msg_id in self._order[start:end]]}
+        if end < len(self._order):
+            page['nextPageToken'] = str(end)
+        return _Request(lambda: page, self.latency)
+
+    def messages(self):
+        return self
+
+    def new_batch_http_request(self, callback):
+        return FakeBatch(self, callback)
+
+
+class TimedGmailClient(GmailClient):
+    """Notes when each email comes out of MIME extraction, to measure per-email latency."""
+
+    def __init__(self, service, extracted_at):
+        super().__init__(service=service)
+        self.extracted_at = extracted_at
+
+    def get_message_content(self, message):
+        email_data = super().get_message_content(message)
+        self.extracted_at[message['id']] = time.perf_counter()
+        return email_data
+
+
+class TimedJob(Job):
+    def __init__(self):
+        super().__init__()
+        self.completed_at = {}
+
+    def add_email(self, email):
+        self.completed_at[email['id']] = time.perf_counter()
+        super().add_email(email)
+
+
+class StaticAccounts:
+    """Stands in for pipeline.gmail_accounts, handing out one prepared client."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def get_client(self, account, interactive=True):
+        return self.client
+
+    def quota_stats(self, account):
+        return {}
+
+
+def start_stub_llm(latency, jitter, seed=0):
+    """Start an OpenAI-style chat completions server on localhost; returns (server, url)."""
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+            prompt = request['messages'][-1]['content']
+            with rng_lock:
+                delay = max(0.0, latency * (1 + rng.uniform(-jitter, jitter)))
+                positions = re.findall(r'^Email (\d+):', prompt, re.MULTILINE)
+                levels = [rng.choice(IMPORTANCE_LEVELS) for _ in positions or [0]]
+            time.sleep(delay)
+            if positions:
+                answer = json.dumps([{'index': int(position), 'importance_level': level}
+                                     for position, level in zip(positions, levels)])
+            else:
+                answer = json.dumps({'importance_level': levels[0]})
+            body = json.dumps({
+                'choices': [{'message': {'role': 'assistant', 'content': answer}}],
+                'usage': {'prompt_tokens': len(prompt) // 4, 'completion_tokens': len(answer) // 4}
+            }).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}/v1/chat/completions'
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def use_private_state(pipeline, directory):
+    """Point the pipeline's stores and indexes at a scratch directory."""
+    from src.email_store import EmailStore
+    from src.classification_cache import ClassificationCache
+    from src.sender_profiles import SenderProfileIndex
+    from src.near_duplicates import NearDuplicateIndex
+    db_path = os.path.join(directory, 'bench.db')
+    pipeline.email_store = EmailStore(db_path)
+    pipeline.classification_cache = ClassificationCache(os.path.join(directory, 'llm_cache.json'))
+    pipeline.sender_profiles = SenderProfileIndex(db_path)
+    pipeline.near_duplicates = NearDuplicateIndex(db_path)
+
+
+def run(pipeline, messages, args, llm_url):
+    from src.llm_service import LLMService, create_session
+    from src.metrics import gmail_quota_units_total
+    extracted_at = {}
+    service = FakeGmailService(messages, args.gmail_latency_ms / 1000)
+    client = TimedGmailClient(service, extracted_at)
+    pipeline.gmail_accounts = StaticAccounts(client)
+    pipeline.GMAIL_FETCH_FORMAT = args.fetch_format
+    llm_service = LLMService(cache=pipeline.classification_cache,
+                             session=create_session(pool_size=args.concurrency))
+    llm_service.api_url = llm_url
+    job = TimedJob()
+    units_before = gmail_quota_units_total.value(method='messages.get')
+    started = time.perf_counter()
+    try:
+        result = pipeline.sync_account(job, 'default', llm_service, args.concurrency,
+                                       args.batch_size, force_full_sync=True)
+    finally:
+        llm_service.close()
+    elapsed = time.perf_counter() - started
+    quota_units = gmail_quota_units_total.value(method='messages.get') - units_before
+
+    latencies = sorted((job.completed_at[msg_id] - extracted_at[msg_id]) * 1000
+                       for msg_id in job.completed_at if msg_id in extracted_at)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0
+    stats = result['stats']
+    return {
+        'emails': stats['emails'],
+        'processed': stats['processed'],
+        'elapsed_seconds': round(elapsed, 3),
+        'emails_per_sec': round(stats['emails'] / elapsed, 2) if elapsed > 0 else 0.0,
+        'latency_ms': {'p50': round(statistics.median(latencies), 1) if latencies else 0.0,
+                       'p95': round(p95, 1)},
+        'stages': stats['stages'],
+        'llm_requests': stats['llm']['requests'],
+        'gmail_mb': round(service.bytes_served / (1024 * 1024), 2),
+        'gmail_quota_units': quota_units,
+        'tiers': stats.get('tiers'),
+        'peak_rss_mb': round(peak_rss_mb(), 1) if resource else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=500, help='synthetic messages to generate')
+    parser.add_argument('--mime', choices=('plain', 'alternative', 'mixed'), default='alternative',
+                        help='MIME structure of synthetic messages')
+    parser.add_argument('--html-kb', type=int, default=20, help='size of each synthetic HTML part')
+    parser.add_argument('--senders', type=int, default=200, help='distinct synthetic senders')
+    parser.add_argument('--corpus', help='directory of captured Gmail message JSON files')
+    parser.add_argument('--gmail-latency-ms', type=float, default=0.0,
+                        help='simulated Gmail round trip per call or batch')
+    parser.add_argument('--llm-latency-ms', type=float, default=50.0,
+                        help='stub LLM response time per request')
+    parser.add_argument('--llm-jitter', type=float, default=0.2,
+                        help='random +/- fraction of the LLM latency')
+    parser.add_argument('--fetch-format', choices=('metadata', 'full'), default='full',
+                        help='GMAIL_FETCH_FORMAT for the run')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--json', action='store_true', help='print the results as JSON')
+    parser.add_argument('--min-emails-per-sec', type=float,
+                        help='exit with status 1 if throughput is lower')
+    parser.add_argument('--max-p95-ms', type=float,
+                        help='exit with status 1 if p95 latency is higher')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    if args.corpus:
+        from benchmarks.bench_extraction import load_corpus
+        messages = load_corpus(args.corpus)
+    else:
+        rng = random.Random(42)
+        messages = [synthetic_message(i, rng, args.mime, args.html_kb, args.senders)
+                    for i in range(args.messages)]
+    if not messages:
+        print("No messages to benchmark.")
+        return 0
+
+    server, llm_url = start_stub_llm(args.llm_latency_ms / 1000, args.llm_jitter)
+    baseline_rss = peak_rss_mb()
+    with tempfile.TemporaryDirectory() as directory:
+        # The pipeline opens its database on import
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(directory, 'bench.db')
+        from src import pipeline
+        use_private_state(pipeline, directory)
+        results = run(pipeline, messages, args, llm_url)
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        payload_kb = sum(len(json.dumps(m['payload'])) for m in messages) / len(messages) / 1024
+        print(f"{len(messages)} messages ({args.mime if not args.corpus else 'corpus'}, "
+              f"{payload_kb:.1f} KB payload/message), LLM latency {args.llm_latency_ms:.0f} ms, "
+              f"concurrency {args.concurrency}, batch size {args.batch_size}, "
+              f"{args.fetch_format} fetch\n")
+        print(f"throughput  {results['emails_per_sec']:10.1f} emails/sec "
+              f"({results['emails']} emails in {results['elapsed_seconds']}s, "
+              f"{results['llm_requests']} LLM requests)")
+        print(f"latency     {results['latency_ms']['p50']:10.1f} ms p50  "
+              f"{results['latency_ms']['p95']:.1f} ms p95")
+        print(f"gmail       {results['gmail_mb']:10.2f} MB downloaded  "
+              f"{results['gmail_quota_units']} quota units")
+        if results['peak_rss_mb'] is not None:
+            print(f"peak RSS    {results['peak_rss_mb']:10.1f} MB (before the run: {baseline_rss:.1f} MB)")
+        print("stages      " + '  '.join(f"{stage} {seconds:.3f}s"
+                                          for stage, seconds in results['stages'].items()))
+
+    failures = []
+    if args.min_emails_per_sec is not None and results['emails_per_sec'] < args.min_emails_per_sec:
+        failures.append(f"throughput {results['emails_per_sec']} < {args.min_emails_per_sec} emails/sec")
+    if args.max_p95_ms is not None and results['latency_ms']['p95'] > args.max_p95_ms:
+        failures.append(f"p95 latency {results['latency_ms']['p95']} > {args.max_p95_ms} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark full-text search over processed emails.
+
+Builds an EmailStore in a temporary directory with a synthetic mailbox,
+then reports how long indexing took and the latency of a mix of
+/api/search-style queries (single words, several words and prefixes).
+
+Usage:
+    python benchmarks/bench_search.py [--emails N] [--queries N]
+"""
+
+import os
+import sys
+import time
+import random
+import itertools
+import argparse
+import tempfile
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.email_store import EmailStore
+
+TOPICS = ('invoice payment meeting project deadline report update review contract '
+          'shipment order delivery account security password travel flight hotel '
+          'budget quarterly schedule interview offer newsletter sale discount '
+          'receipt subscription renewal conference agenda proposal draft feedback').split()
+SENDERS = [('Billing', 'billing@vendor{}.example.com'), ('Alice Smith', 'alice@team{}.example.org'),
+           ('Newsletter', 'news@shop{}.example.com'), ('Bob Jones', 'bob@client{}.example.net')]
+QUERIES = ['invoice', 'meeting agenda', 'flight hotel', 'quart', 'password security',
+           'contract review draft', 'alice', 'renew', 'shipment delivery order', 'budget']
+SYLLABLES = 'ka lo mi ne ru sa te vo bi da fe gu ho ji pa'.split()
+
+
+def vocabulary(size, rng):
+    """Made-up words with Zipf-like frequencies, so that most words are rare as in real mail."""
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    words = sorted(words)
+    rng.shuffle(words)
+    return words, list(itertools.accumulate(1 / rank for rank in range(1, size + 1)))
+
+
+def synthetic_email(index, rng, words, weights):
+    name, address = rng.choice(SENDERS)
+    address = address.format(index % 500)
+    topics = rng.sample(TOPICS, 2)
+    subject = ' '.join(topics + rng.choices(words, cum_weights=weights, k=4)).capitalize()
+    body = rng.choices(words, cum_weights=weights, k=rng.randint(60, 300))
+    body[rng.randrange(len(body))] = topics[0]
+    return {
+        'id': f'msg{index:08d}',
+        'subject': subject,
+        'from': f'{name} <{address}>',
+        'from_name': name,
+        'from_email': address,
+        'summary': ' '.join(topics + rng.choices(words, cum_weights=weights, k=12)),
+        'importance_level': rng.choice(['VERY_IMPORTANT', 'IMPORTANT', 'UNIMPORTANT']),
+        'has_deadline': False,
+        'received_time': 1700000000000 + index * 60000,
+    }, ' '.join(body)
+
+
+def build(store, count, chunk=5000):
+    rng = random.Random(42)
+    words, weights = vocabulary(20000, rng)
+    started = time.perf_counter()
+    for start in range(0, count, chunk):
+        emails, bodies = [], {}
+        for index in range(start, min(start + chunk, count)):
+            email, body = synthetic_email(index, rng, words, weights)
+            emails.append(email)
+            bodies[email['id']] = body
+        store.apply_changes(upserts=emails, bodies=bodies)
+    return time.perf_counter() - started
+
+
+def run(store, queries, limit):
+    timings = []
+    hits = 0
+    for query in queries:
+        started = time.perf_counter()
+        hits += len(store.search(query, limit=limit))
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f"{len(queries)} queries, limit {limit}: p50 {statistics.median(timings):.2f} ms  "
+          f"p95 {p95:.2f} ms  max {timings[-1]:.2f} ms  ({hits / len(queries):.1f} results/query)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--emails', type=int, default=100000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = EmailStore(os.path.join(directory, 'bench.db'))
+        elapsed = build(store, args.emails)
+        print(f"Indexed {args.emails} emails in {elapsed:.1f}s "
+              f"({args.emails / elapsed:.0f} emails/sec)\n")
+        queries = [QUERIES[i % len(QUERIES)] for i in range(args.queries)]
+        run(store, queries, args.limit)
+
+
+if __name__ == '__main__':
+    main()
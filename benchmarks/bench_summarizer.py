@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark the extractive summarizer.
+
+Summarizes email bodies of increasing size with src/summarizer.py and
+the previous split-on-period summary, and reports the time per email.
+With --corpus, bodies are extracted from captured Gmail API messages
+(JSON files saved from messages().get(format='full')) and a few
+summaries are printed side by side.
+
+Usage:
+    python benchmarks/bench_summarizer.py [--corpus DIR] [--repeat N] [--show N]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.summarizer import summarize
+
+WORDS = ('please review the attached invoice before friday the meeting about the project '
+         'deadline moved and the quarterly report needs an update from your team so we can '
+         'sign the contract confirm the shipment and close the account security review').split()
+FOOTER = ('\n\n---\nYou are receiving this email because you subscribed. '
+          'Unsubscribe: https://example.com/unsubscribe?u=0123456789abcdef\n'
+          'This email was sent automatically with n8n')
+
+
+def legacy_summarize(content):
+    """The summary used before src/summarizer.py, kept for comparison."""
+    sentences = content.split('.')
+    sentences = [s.strip() for s in sentences if s.strip()]
+    if len(sentences) > 1:
+        summary = f"{sentences[0]}... {sentences[-1]}"
+    elif len(sentences) == 1:
+        summary = sentences[0]
+    else:
+        summary = "No content to summarize"
+    if len(summary) > 200:
+        summary = summary[:200] + "..."
+    return summary
+
+
+def synthetic_body(size_kb, rng):
+    """Paragraphs of sentences with links, a greeting, a sign-off and a footer."""
+    paragraphs = ['Hi Sam,']
+    size = 0
+    while size < size_kb * 1024:
+        paragraph = ' '.join(
+            ' '.join(rng.choices(WORDS, k=rng.randint(8, 20))).capitalize() + '.'
+            for _ in range(rng.randint(2, 5)))
+        if rng.random() < 0.3:
+            paragraph += f' Details: https://docs.example.com/item/{rng.randint(0, 99999)}'
+        paragraphs.append(paragraph)
+        size += len(paragraph)
+    paragraphs.append('Thanks,\nAlex')
+    return '\n\n'.join(paragraphs) + FOOTER
+
+
+def load_corpus(directory):
+    from benchmarks.bench_extraction import load_corpus as load_messages
+    from src.gmail_client import GmailClient
+    client = GmailClient()
+    bodies = []
+    for message in load_messages(directory):
+        email_data = client.get_message_content(message)
+        if email_data:
+            bodies.append(email_data['content'])
+    return bodies
+
+
+def run(label, summarizer, bodies, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for body in bodies:
+            summarizer(body)
+    elapsed = time.perf_counter() - started
+    return elapsed / (repeat * len(bodies)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--corpus', help='directory of captured Gmail message JSON files')
+    parser.add_argument('--sizes', default='1,5,20,50,200', help='synthetic body sizes in KB')
+    parser.add_argument('--emails', type=int, default=20, help='synthetic emails per size')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--show', type=int, default=3, help='summaries to print side by side')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    if args.corpus:
+        groups = [('corpus', load_corpus(args.corpus))]
+    else:
+        groups = [(f'{size} KB', [synthetic_body(int(size), rng) for _ in range(args.emails)])
+                  for size in args.sizes.split(',')]
+
+    print(f"{'bodies':<10} {'legacy':>14} {'extractive':>14}")
+    for label, bodies in groups:
+        if not bodies:
+            print(f"{label:<10} no bodies")
+            continue
+        legacy_ms = run(label, legacy_summarize, bodies, args.repeat)
+        current_ms = run(label, summarize, bodies, args.repeat)
+        print(f"{label:<10} {legacy_ms:11.3f} ms {current_ms:11.3f} ms")
+
+    bodies = groups[0][1]
+    for body in bodies[:args.show]:
+        print(f"\nlegacy:     {legacy_summarize(body)!r}\nextractive: {summarize(body)!r}")
+
+
+if __name__ == '__main__':
+    main()
@@ -11,24 +11,31 @@ TELEGRAM_TOKEN = os.getenv("TG_BOT_TOKEN")
 API_URL = "http://127.0.0.1:5000/api/emails"
 WEB_URL = "http://127.0.0.1:5000"
 
-def format_email_message(emails, level):
+MAX_EMAILS_PER_LEVEL = 20  # Keeps each reply well under Telegram's message size limit
+
+def format_email_message(emails):
     output = ""
     for email in emails:
-        importance = email.get("categories", [None])[0]
-        if importance and importance.lower() == level.lower():
-            subject = email.get("subject", "No subject")
-            sender = email.get("from", "Unknown sender")
-            output += f"📧 Subject: {subject}\n👤 From: {sender}\n\n"
+        subject = email.get("subject") or "No subject"
+        sender = email.get("from") or "Unknown sender"
+        output += f"📧 Subject: {subject}\n👤 From: {sender}\n\n"
     return output if output else "None found.\n"
 
-def get_emails_data():
+def get_emails_data(level=None):
+    """Fetch the newest emails of one importance level, with only the fields the bot shows.
+
+    Returns None if the server couldn't be reached.
+    """
+    params = {"fields": "subject,from", "limit": MAX_EMAILS_PER_LEVEL}
+    if level:
+        params["importance"] = level
     try:
-        response = requests.get(API_URL)
+        response = requests.get(API_URL, params=params)
         if response.status_code == 200:
             return response.json().get("emails", [])
     except Exception as e:
         print(f"Error fetching emails: {e}")
-    return []
+    return None
 
 # --------- Async Handlers ---------
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -37,14 +44,17 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     )
 
 async def get_emails(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    emails = get_emails_data()
-    if not emails:
-        await update.message.reply_text("⚠ No emails found or unable to fetch from server.")
+    emails = {level: get_emails_data(level) for level in ("Very Important", "Important", "Unimportant")}
+    if any(level_emails is None for level_emails in emails.values()):
+        await update.message.reply_text("⚠ Unable to fetch emails from server.")
+        return
+    if not any(emails.values()):
+        await update.message.reply_text("⚠ No emails found.")
         return
 
-    very_important = format_email_message(emails, "Very Important")
-    important = format_email_message(emails, "Important")
-    Unimportant = format_email_message(emails, "Unimportant")
+    very_important = format_email_message(emails["Very Important"])
+    important = format_email_message(emails["Important"])
+    Unimportant = format_email_message(emails["Unimportant"])
 
     await update.message.reply_text("📌 Very Important Emails:\n" + very_important, parse_mode='Markdown')
     await update.message.reply_text("📌 Important Emails:\n" + important, parse_mode='Markdown')
@@ -7,23 +7,85 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 # Credentials
 CREDENTIALS_DIR = os.path.join(BASE_DIR, 'credentials')
 CREDENTIALS_FILE = os.path.join(CREDENTIALS_DIR, 'credentials.json')
-TOKEN_FILE = os.path.join(CREDENTIALS_DIR, 'token.json')
+TOKEN_FILE = os.path.join(CREDENTIALS_DIR, 'token.json')  # Token of the 'default' account
+
+# Accounts: every other mailbox keeps its token in ACCOUNTS_DIR/<name>.token
+# (add one with: python -m src.accounts add <name>)
+DEFAULT_ACCOUNT = 'default'
+ACCOUNTS_DIR = os.path.join(CREDENTIALS_DIR, 'accounts')
+ACCOUNT_MAX_PARALLEL = 4  # Accounts synced at the same time
 
 # Gmail API settings
 SCOPES = ['https://www.googleapis.com/auth/gmail.readonly',
           'https://www.googleapis.com/auth/gmail.modify']
 
+# Gmail batch requests (the API accepts at most 100 calls per batch)
+GMAIL_BATCH_SIZE = 100
+GMAIL_BATCH_MAX_RETRIES = 5
+GMAIL_RETRY_BASE_DELAY = 1.0  # Seconds; doubled after every retry round
+GMAIL_QUOTA_UNITS_PER_SECOND = 250  # Gmail's per-user limit, enforced per account
+GMAIL_TOKEN_REFRESH_MARGIN = 300  # Seconds before expiry to refresh the access token
+GMAIL_DISCOVERY_CACHE_FILE = os.path.join(BASE_DIR, 'gmail_discovery_v1.json')
+# 'full' fetches every body up front: one Gmail call (5 quota units) per email.
+# 'metadata' fetches headers and snippets first and bodies only for emails that domain rules
+# and sender profiles don't settle (the detail view loads the rest on first open). It
+# downloads much less, but Gmail charges the same units for a metadata fetch, so it costs
+# more quota for every email that still needs its body; it only pays off on slow links for
+# mailboxes that domain rules and sender profiles mostly settle.
+GMAIL_FETCH_FORMAT = 'full'
+
 # Database settings
-DATABASE_URL = 'sqlite:///gmail_processor.db'
+# Resolved against BASE_DIR like the other state files, so the web app and a worker
+# started from any directory share one database; DATABASE_URL in the environment overrides it
+DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///' + os.path.join(BASE_DIR, 'gmail_processor.db'))
+
+# Logging (DEBUG logs every message fetched and classified)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOG_FORMAT = '%(asctime)s %(levelname)s [%(name)s] %(message)s'
 
 # Email processing settings
-MAX_EMAILS_TO_PROCESS = 10
-CHECK_INTERVAL_MINUTES = 15
+MAX_EMAILS_TO_PROCESS = None  # None processes every matching message
+GMAIL_LIST_PAGE_SIZE = 100  # Message IDs per list page (the API allows up to 500)
+PERSIST_BATCH_SIZE = 200  # Processed emails written to the database per transaction
+FETCH_RETRY_SYNCS = 5  # Syncs that retry an email that couldn't be fetched before dropping it
+CHECK_INTERVAL_MINUTES = 15  # How often the headless worker (python -m src.worker) syncs
+CHECK_INTERVAL_JITTER = 0.1  # Random +/- fraction of the interval added to each wait
+WORKER_LOCK_FILE = os.path.join(BASE_DIR, 'worker.lock')
+SYNC_LOCK_FILE = os.path.join(BASE_DIR, 'sync.lock')  # Held by the web app or worker while syncing
+
+# LLM classification settings
+LLM_MAX_CONCURRENCY = 4  # Max LLM requests in flight, shared fairly between accounts
+LLM_BODY_TOKEN_BUDGET = 600  # Body tokens kept per email after prompt compaction
+LLM_BATCH_MAX_EMAILS = 8  # Emails packed into one classification prompt
+LLM_BATCH_TOKEN_BUDGET = 3000  # Approximate prompt tokens per batched request
+LLM_CONNECT_TIMEOUT = 5  # Seconds to establish a connection to the LLM server
+LLM_READ_TIMEOUT = 120  # Seconds to wait for a completion before giving up
+LLM_MAX_RETRIES = 3  # Retries on connection errors, 429 and 5xx responses
+LLM_RETRY_BACKOFF = 0.5  # Seconds; doubled after every retry
+LLM_CACHE_FILE = os.path.join(BASE_DIR, 'llm_cache.json')
+LLM_CACHE_MAX_ENTRIES = 50000
+
+# Extractive summaries (src/summarizer.py)
+SUMMARY_MAX_SENTENCES = 2
+SUMMARY_MAX_CHARS = 300
+
+# Pre-classification: sender domains whose mail always gets a fixed importance
+# level without calling the LLM, e.g. {'news.example.com': 'Unimportant'}
+SENDER_DOMAIN_RULES = {}
+
+# Sender profiles: skip the LLM for senders whose recent mail was labelled consistently
+SENDER_PROFILE_MIN_SAMPLES = 5  # LLM labels needed before a sender can be trusted
+SENDER_PROFILE_CONFIDENCE = 0.9  # Share of recent labels that must agree
+SENDER_PROFILE_REVERIFY_RATE = 0.1  # Fraction of trusted emails still sent to the LLM
+SENDER_PROFILE_WINDOW = 20  # Recent labels considered per sender
+
+# Near-duplicates: reuse the label of an earlier, nearly identical email from the same sender and account
+NEAR_DUPLICATE_MAX_DISTANCE = 6  # Max differing SimHash bits (of 64) to count as a match
 
 # Categories for email classification
 CATEGORIES = {
     'IMPORTANT': ['urgent', 'important', 'critical', 'asap'],
-    'DEADLINE': ['deadline', 'due', 'by', 'before'],
+    'DEADLINE': ['deadline', 'due date', 'expires', 'no later than'],
     'ACTION_REQUIRED': ['action required', 'please respond', 'needs your attention'],
     'MEETING': ['meeting', 'schedule', 'appointment', 'call']
 }
@@ -0,0 +1,86 @@
+"""Gmail accounts processed by one deployment.
+
+The 'default' account uses TOKEN_FILE as before; every other account
+keeps its OAuth2 token in ACCOUNTS_DIR/<name>.token. Add an account with
+
+    python -m src.accounts add <name>
+"""
+import os
+import re
+import sys
+import threading
+from src.gmail_client import GmailClientManager, load_credentials
+from src.rate_limit import TokenBucket
+from config.config import (TOKEN_FILE, ACCOUNTS_DIR, DEFAULT_ACCOUNT,
+                           GMAIL_QUOTA_UNITS_PER_SECOND)
+
+ACCOUNT_NAME = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._@+-]*$')
+TOKEN_SUFFIX = '.token'
+
+
+def account_token_file(account):
+    if account == DEFAULT_ACCOUNT:
+        return TOKEN_FILE
+    if not ACCOUNT_NAME.match(account):
+        raise ValueError(f"Invalid account name: {account!r}")
+    return os.path.join(ACCOUNTS_DIR, account + TOKEN_SUFFIX)
+
+
+def list_accounts():
+    """Return the configured account names, 'default' first.
+
+    'default' is included when its token exists, or when no other account
+    is configured so that a fresh install still runs the consent flow.
+    """
+    accounts = []
+    if os.path.isdir(ACCOUNTS_DIR):
+        accounts = sorted(name[:-len(TOKEN_SUFFIX)] for name in os.listdir(ACCOUNTS_DIR)
+                          if name.endswith(TOKEN_SUFFIX) and ACCOUNT_NAME.match(name))
+    if os.path.exists(TOKEN_FILE) or not accounts:
+        accounts.insert(0, DEFAULT_ACCOUNT)
+    return accounts
+
+
+class AccountRegistry:
+    """One GmailClientManager and Gmail quota bucket per account, created on first use."""
+
+    def __init__(self, quota_units_per_second=GMAIL_QUOTA_UNITS_PER_SECOND):
+        self.quota_units_per_second = quota_units_per_second
+        self._managers = {}
+        self._lock = threading.Lock()
+
+    def get_client(self, account=DEFAULT_ACCOUNT, interactive=True):
+        with self._lock:
+            manager = self._managers.get(account)
+            if manager is None:
+                manager = self._managers[account] = GmailClientManager(
+                    account_token_file(account),
+                    quota=TokenBucket(self.quota_units_per_second))
+        return manager.get_client(interactive)
+
+    def quota_stats(self, account):
+        with self._lock:
+            manager = self._managers.get(account)
+        if not manager or not manager.quota:
+            return {}
+        return {'quota_wait_seconds': round(manager.quota.waited, 2)}
+
+
+def main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    if args[:1] == ['list']:
+        for account in list_accounts():
+            print(account)
+        return 0
+    if len(args) == 2 and args[0] == 'add':
+        token_file = account_token_file(args[1])
+        os.makedirs(os.path.dirname(token_file), exist_ok=True)
+        load_credentials(token_file)
+        print(f"Account {args[1]} is ready ({token_file})")
+        return 0
+    print("usage: python -m src.accounts list | add <name>")
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
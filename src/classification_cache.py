@@ -0,0 +1,134 @@
+import os
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from config.config import DEFAULT_ACCOUNT
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(text):
+    """Lowercase and collapse whitespace so trivially different copies share a key."""
+    return ' '.join((text or '').lower().split())
+
+
+class ClassificationCache:
+    """Disk-backed LRU cache of LLM classification results.
+
+    Each result is stored under two keys: the account and Gmail message ID,
+    and a hash of the normalized subject and body. Both are scoped by a namespace (model
+    name and prompt version), so changing either invalidates old entries.
+    """
+
+    def __init__(self, path, max_entries=50000):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._dirty = False
+        self.load()
+
+    @staticmethod
+    def _keys(namespace, subject, body, message_id=None, account=DEFAULT_ACCOUNT):
+        digest = hashlib.sha256(
+            f"{_normalize(subject)}\0{_normalize(body)}".encode('utf-8')).hexdigest()
+        keys = [f"{namespace}:content:{digest}"]
+        if message_id:
+            # Message IDs are only unique within one mailbox
+            keys.insert(0, f"{namespace}:id:{account}:{message_id}")
+        return keys
+
+    def get(self, namespace, subject, body, message_id=None, account=DEFAULT_ACCOUNT):
+        """Return the cached result for an email, or None on a miss."""
+        with self._lock:
+            for key in self._keys(namespace, subject, body, message_id, account):
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, namespace, subject, body, value, message_id=None, account=DEFAULT_ACCOUNT):
+        """Store a result for an email, evicting the least recently used entries."""
+        with self._lock:
+            for key in self._keys(namespace, subject, body, message_id, account):
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._dirty = True
+
+    def stats(self):
+        """Return hit/miss counters for this process."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'entries': len(self._entries)
+            }
+
+    def _read(self):
+        """Return the entries in the cache file, or None if there are none to read."""
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error("Could not load classification cache: %s", e)
+            return None
+
+    def _merge(self, entries):
+        """Combine entries from disk with the ones in memory, which count as more recent."""
+        merged = OrderedDict(entries)
+        for key, value in self._entries.items():
+            merged.pop(key, None)
+            merged[key] = value
+        while len(merged) > self.max_entries:
+            merged.popitem(last=False)
+        self._entries = merged
+
+    def load(self):
+        """Load cached entries from disk, least recently used first.
+
+        Entries already in memory are kept, so another process's saves can
+        be picked up at any time.
+        """
+        entries = self._read()
+        if entries is None:
+            return
+        with self._lock:
+            self._merge(entries)
+
+    def save(self):
+        """Write the cache to disk if it changed since the last save.
+
+        Entries another process saved in the meantime are merged in rather
+        than overwritten.
+        """
+        with self._lock:
+            if not self._dirty:
+                return
+            self._dirty = False
+        disk_entries = self._read() or []
+        with self._lock:
+            self._merge(disk_entries)
+            entries = list(self._entries.items())
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error("Could not save classification cache: %s", e)
+            with self._lock:
+                self._dirty = True
@@ -0,0 +1,234 @@
+"""Deterministic deadline extraction without an LLM call.
+
+Deadlines are dates that follow a cue phrase ("due", "deadline",
+"expires", "no later than", "by", ...). Absolute dates ("March 3",
+"3/14/2026", "2026-03-14") and relative ones ("tomorrow", "next Friday",
+"in 3 days", "end of month") are resolved against the email's Date
+header, in the sender's timezone, and returned as ISO 8601 timestamps.
+A date without a year is the next one on or after the Date header. A
+numeric date without a year ("3/14") needs a strong cue or a weekday
+before it, since after a weak cue it is as likely a fraction ("by 1/2").
+Cue phrases are scanned for first, so emails without any cost one fast
+regex pass.
+"""
+import re
+import calendar
+from datetime import datetime, time, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from dateutil.relativedelta import relativedelta
+
+MAX_SOURCE_CHARS = 20000  # Longer emails are scanned from their beginning
+CUE_WINDOW = 48  # Characters after a strong cue that may hold its date
+END_OF_DAY = time(23, 59)  # Time of a deadline that names only a day
+CLOSE_OF_BUSINESS = time(17, 0)
+
+_MONTHS = {name: number for number, name in enumerate(
+    ('jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'), 1)}
+_WEEKDAYS = {name: number for number, name in enumerate(
+    ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun'))}
+_NUMBERS = {'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+            'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'fourteen': 14, 'thirty': 30}
+
+_MONTH = (r'(?:jan(?:uary)?|feb(?:ruary)?|mar(?:ch)?|apr(?:il)?|may|june?|july?|aug(?:ust)?'
+          r'|sep(?:t(?:ember)?)?|oct(?:ober)?|nov(?:ember)?|dec(?:ember)?)\.?')
+_WEEKDAY = (r'(?:mon(?:day)?|tue(?:s(?:day)?)?|wed(?:nesday)?|thu(?:r(?:s(?:day)?)?)?'
+            r'|fri(?:day)?|sat(?:urday)?|sun(?:day)?)')
+
+# Strong cues may be a few words away from their date ("the deadline for
+# entries is Friday"); weak ones only count when the date follows at once,
+# so "by" on its own no longer marks an email as having a deadline. Cues are
+# matched after a literal space (in text with line breaks turned into
+# spaces), which lets the regex engine skip ahead between candidates.
+_CUE = re.compile(
+    r' (?:(?P<strong>due(?!\s+to\b)|deadline|expires?|expiring|expiration|no later than'
+    r'|not later than|last day|closes|cut-?off)|(?P<weak>by|before|until|till|on or before|ends?'
+    r'|rsvp))\b')
+_DATE = re.compile(
+    r'(?:(?P<on_wd>' + _WEEKDAY + r'),?\s+)?(?:'
+    r'(?P<iso_y>\d{4})-(?P<iso_m>\d{1,2})-(?P<iso_d>\d{1,2})\b'
+    r'|(?P<num_a>\d{1,2})/(?P<num_b>\d{1,2})(?:/(?P<num_y>\d{4}|\d{2}))?\b(?!\s+of\b)'
+    r'|(?P<md_m>' + _MONTH + r')\s+(?P<md_d>\d{1,2})(?:st|nd|rd|th)?\b(?:,?\s+(?P<md_y>\d{4})\b)?'
+    r'|(?:the\s+)?(?P<dm_d>\d{1,2})(?:st|nd|rd|th)?\s+(?:of\s+)?(?P<dm_m>' + _MONTH + r')'
+    r'(?:,?\s+(?P<dm_y>\d{4})\b)?'
+    r'|(?P<rel>today|tonight|tomorrow|eod|cob|close of business|end of (?:the )?(?:day|week|month))\b'
+    r'|(?:(?P<wd_mod>next|this|coming)\s+)?(?P<wd>' + _WEEKDAY + r')\b'
+    r'|(?:in|within)\s+(?P<count>\d{1,3}|an?|one|two|three|four|five|six|seven|eight|nine|ten'
+    r'|fourteen|thirty)\s+(?P<unit>hour|day|week|month)s?\b)')
+_TIME = re.compile(
+    r',?\s*(?:at\s+|by\s+|@\s*)?(?:(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?\s*(?P<ampm>[ap])\.?m\b\.?'
+    r'|(?P<hour24>[01]?\d|2[0-3]):(?P<minute24>[0-5]\d)\b|(?P<named>noon|midnight)\b)')
+# "by 5pm", "by 5pm Friday", "before noon on March 3"
+_LEADING_TIME_JOIN = re.compile(r',?\s*(?:on\s+|this\s+)?')
+_SENTENCE_BREAK = re.compile(r'[.!?]\s|\n\s*\n')
+_GAP = re.compile(r'[\s:,\-–—]*(?:(?:is|are|was|on|at|the|of|date|will|be|set|for)\s+)*')
+
+
+def reference_time(date_header='', received_time=None):
+    """Return the time relative dates are resolved against, as an aware datetime.
+
+    This is the email's Date header in the sender's timezone, else
+    received_time (epoch milliseconds, like Gmail's internalDate) in UTC,
+    else the current time.
+    """
+    if date_header:
+        try:
+            sent = parsedate_to_datetime(date_header)
+            return sent if sent.tzinfo else sent.replace(tzinfo=timezone.utc)
+        except (TypeError, ValueError, IndexError):
+            pass
+    try:
+        return datetime.fromtimestamp(int(received_time) / 1000, timezone.utc)
+    except (TypeError, ValueError, OverflowError, OSError):
+        return datetime.now(timezone.utc)
+
+
+def _year(text):
+    if not text:
+        return None
+    year = int(text)
+    return year + 2000 if year < 100 else year
+
+
+def _absolute(reference, year, month, day):
+    """Return the date, taking the first one on or after reference's day when no year was given."""
+    if year is not None:
+        return reference.replace(year=year, month=month, day=day)
+    for offset in range(9):  # February 29th may be eight years away
+        try:
+            candidate = reference.replace(year=reference.year + offset, month=month, day=day)
+        except ValueError:
+            continue
+        if candidate.date() >= reference.date():
+            return candidate
+    raise ValueError(f"No year has {month}/{day}")
+
+
+def _resolve_date(match, reference):
+    """Return (datetime, has_time) for a _DATE match; has_time is True when the time is exact."""
+    group = match.group
+    if group('iso_y'):
+        return _absolute(reference, int(group('iso_y')), int(group('iso_m')), int(group('iso_d'))), False
+    if group('num_a'):
+        first, second = int(group('num_a')), int(group('num_b'))
+        # Month first, as Gmail's users mostly write it, unless that can't be a month
+        month, day = (second, first) if first > 12 else (first, second)
+        return _absolute(reference, _year(group('num_y')), month, day), False
+    if group('md_m'):
+        return _absolute(reference, _year(group('md_y')),
+                         _MONTHS[group('md_m')[:3].lower()], int(group('md_d'))), False
+    if group('dm_m'):
+        return _absolute(reference, _year(group('dm_y')),
+                         _MONTHS[group('dm_m')[:3].lower()], int(group('dm_d'))), False
+    if group('rel'):
+        relative = ' '.join(group('rel').lower().split())
+        if relative == 'tomorrow':
+            return reference + timedelta(days=1), False
+        if relative in ('cob', 'close of business'):
+            return datetime.combine(reference.date(), CLOSE_OF_BUSINESS, reference.tzinfo), True
+        if relative.endswith('week'):
+            return reference + timedelta(days=(4 - reference.weekday()) % 7), False
+        if relative.endswith('month'):
+            last_day = calendar.monthrange(reference.year, reference.month)[1]
+            return reference.replace(day=last_day), False
+        return reference, False  # today, tonight, end of day
+    if group('wd'):
+        days = (_WEEKDAYS[group('wd')[:3].lower()] - reference.weekday()) % 7
+        if days == 0 and (group('wd_mod') or '').lower() == 'next':
+            days = 7
+        return reference + timedelta(days=days), False
+    count = group('count').lower()
+    count = int(count) if count.isdigit() else _NUMBERS[count]
+    unit = group('unit').lower()
+    if unit == 'hour':
+        return reference + timedelta(hours=count), True
+    if unit == 'month':
+        return reference + relativedelta(months=count), False
+    return reference + timedelta(days=count * (7 if unit == 'week' else 1)), False
+
+
+def _resolve_time(match):
+    if match.group('named'):
+        return time(12, 0) if match.group('named').lower() == 'noon' else time(23, 59)
+    if match.group('hour24'):
+        return time(int(match.group('hour24')), int(match.group('minute24')))
+    hour = int(match.group('hour'))
+    if not 1 <= hour <= 12:
+        raise ValueError(f"Invalid hour {hour}")
+    hour = hour % 12 + (12 if match.group('ampm').lower() == 'p' else 0)
+    return time(hour, int(match.group('minute') or 0))
+
+
+def _is_bare_number_date(match):
+    """Return True for a numeric date with neither a year nor a weekday, like "1/2"."""
+    return bool(match.group('num_a')) and not match.group('num_y') and not match.group('on_wd')
+
+
+def _deadline_at(text, position, reference, strong=True):
+    """Return the deadline starting at position, or None when no date or time starts there.
+
+    strong is False after a weak cue, where a bare numeric date doesn't count.
+    """
+    at_time = None
+    time_match = _TIME.match(text, position)
+    if time_match:
+        # A time ahead of its date, or alone: "by 5pm", "before noon on Friday"
+        at_time = _resolve_time(time_match)
+        join = _LEADING_TIME_JOIN.match(text, time_match.end())
+        date_match = _DATE.match(text, join.end())
+        if date_match and not strong and _is_bare_number_date(date_match):
+            date_match = None
+        if not date_match:
+            deadline = datetime.combine(reference.date(), at_time, reference.tzinfo)
+            return deadline + timedelta(days=1) if deadline < reference else deadline
+    else:
+        date_match = _DATE.match(text, position)
+        if not date_match or (not strong and _is_bare_number_date(date_match)):
+            return None
+    when, exact = _resolve_date(date_match, reference)
+    if at_time is None and not exact:
+        time_match = _TIME.match(text, date_match.end())
+        at_time = _resolve_time(time_match) if time_match else END_OF_DAY
+    if at_time is not None:
+        when = datetime.combine(when.date(), at_time, when.tzinfo)
+    return when
+
+
+def extract_deadlines(text, reference):
+    """Return the deadlines in text as sorted, distinct ISO 8601 timestamps.
+
+    reference is the aware datetime relative dates are resolved against
+    (see reference_time()); timestamps carry its UTC offset.
+    """
+    # Every pattern is written in lower case; both copies keep the same offsets
+    text = ' ' + (text or '')[:MAX_SOURCE_CHARS].lower()
+    spaced = text.replace('\n', ' ').replace('\r', ' ').replace('\t', ' ')
+    found = set()
+    for cue in _CUE.finditer(spaced):
+        position = _GAP.match(text, cue.end()).end()
+        try:
+            deadline = _deadline_at(text, position, reference, strong=bool(cue.group('strong')))
+            if deadline is None and cue.group('strong'):
+                # Look a few words further, within the same sentence
+                window = text[cue.end():cue.end() + CUE_WINDOW]
+                limit = _SENTENCE_BREAK.search(window)
+                end = cue.end() + (limit.start() if limit else len(window))
+                date_match = _DATE.search(text, position, end)
+                if date_match:
+                    deadline = _deadline_at(text, date_match.start(), reference)
+        except (ValueError, OverflowError):
+            continue  # "February 30th", "25pm"
+        if deadline is not None:
+            found.add(deadline.replace(second=0, microsecond=0))
+    return [deadline.isoformat() for deadline in sorted(found)]
+
+
+def email_deadlines(email_data):
+    """Return the deadlines in an email's subject and body, resolved against its Date header."""
+    reference = reference_time(email_data.get('date_header'), email_data.get('received_time'))
+    text = f"{email_data.get('subject', '')}\n{email_data.get('content', '')}"
+    return extract_deadlines(text, reference)
+
+
+def deadline_time(deadline):
+    """Turn a timestamp returned by extract_deadlines() into epoch milliseconds."""
+    return int(datetime.fromisoformat(deadline).timestamp() * 1000)
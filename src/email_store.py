@@ -0,0 +1,415 @@
+import re
+import html
+import json
+import sqlite3
+import threading
+from src.deadlines import deadline_time
+from config.config import DEFAULT_ACCOUNT
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS emails (
+    account TEXT NOT NULL DEFAULT 'default',
+    id TEXT NOT NULL,
+    importance_level TEXT,
+    has_deadline INTEGER NOT NULL DEFAULT 0,
+    received_time INTEGER,
+    processed_at TEXT,
+    sender TEXT,
+    deadline_time INTEGER,
+    data TEXT NOT NULL,
+    PRIMARY KEY (account, id)
+);
+CREATE INDEX IF NOT EXISTS idx_emails_id ON emails (id);
+CREATE INDEX IF NOT EXISTS idx_emails_importance ON emails (importance_level);
+CREATE INDEX IF NOT EXISTS idx_emails_has_deadline ON emails (has_deadline);
+CREATE INDEX IF NOT EXISTS idx_emails_received_time ON emails (received_time);
+CREATE INDEX IF NOT EXISTS idx_emails_sender ON emails (sender);
+CREATE INDEX IF NOT EXISTS idx_emails_deadline_time ON emails (deadline_time);
+CREATE INDEX IF NOT EXISTS idx_emails_sort ON emails (COALESCE(received_time, 0));
+CREATE INDEX IF NOT EXISTS idx_emails_account_sort ON emails (account, COALESCE(received_time, 0));
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Full-text index over emails, keyed by the emails rowid. Bodies aren't kept
+# in the emails table, so they are written here by the store's callers.
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS emails_fts USING fts5(
+    subject, sender, summary, body,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+CREATE TRIGGER IF NOT EXISTS emails_fts_delete AFTER DELETE ON emails BEGIN
+    DELETE FROM emails_fts WHERE rowid = old.rowid;
+END;
+"""
+
+# A NULL body keeps the one already indexed, so re-saving an email without
+# its body doesn't drop it from body searches
+INDEX_SQL = """
+INSERT OR REPLACE INTO emails_fts (rowid, subject, sender, summary, body)
+SELECT rowid, ?, ?, ?, COALESCE(?, (SELECT body FROM emails_fts WHERE rowid = emails.rowid), '')
+FROM emails WHERE account = ? AND id = ?
+"""
+
+SEARCH_BODY_MAX_CHARS = 20000  # Longer bodies are indexed up to this length
+SEARCH_RANK_WINDOW = 1000  # Most recent matches ranked per query
+# bm25 weights of subject, sender, summary and body
+RANK_FUNCTION = 'bm25(10.0, 5.0, 2.0, 1.0)'
+_SEARCH_TERM = re.compile(r'\w+')
+_MARK_START, _MARK_END = '\x02', '\x03'
+
+UPSERT_SQL = """
+INSERT INTO emails (account, id, importance_level, has_deadline, received_time, processed_at,
+                    sender, deadline_time, data)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (account, id) DO UPDATE SET
+    importance_level = excluded.importance_level,
+    has_deadline = excluded.has_deadline,
+    received_time = excluded.received_time,
+    processed_at = excluded.processed_at,
+    sender = excluded.sender,
+    deadline_time = excluded.deadline_time,
+    data = excluded.data
+"""
+
+# Bumped in the same transaction as every change to emails, for ETags
+BUMP_VERSION_SQL = """
+INSERT INTO sync_state (key, value) VALUES ('emails_version', '1')
+ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+"""
+
+SORT_KEY = 'COALESCE(received_time, 0)'
+SENDER_SQL = "lower(json_extract(data, '$.from_email'))"
+
+
+def sqlite_path_from_url(database_url):
+    """Turn a sqlite:///path URL (as in config.DATABASE_URL) into a file path."""
+    prefix = 'sqlite:///'
+    if not database_url.startswith(prefix):
+        raise ValueError(f"Unsupported database URL: {database_url}")
+    return database_url[len(prefix):]
+
+
+def _migrate(conn):
+    """Bring an emails table created by an older version up to the current schema.
+
+    Tables from before accounts existed are rebuilt with their rows
+    assigned to the default account.
+    """
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(emails)')]
+    if not columns:
+        return
+    if 'account' in columns:
+        if 'sender' not in columns:
+            with conn:
+                conn.execute('ALTER TABLE emails ADD COLUMN sender TEXT')
+                conn.execute(f'UPDATE emails SET sender = {SENDER_SQL}')
+        if 'deadline_time' not in columns:
+            # Emails saved before deadline extraction have no deadlines to backfill
+            with conn:
+                conn.execute('ALTER TABLE emails ADD COLUMN deadline_time INTEGER')
+        return
+    with conn:
+        conn.execute('ALTER TABLE emails RENAME TO emails_single_account')
+        for index in ('idx_emails_importance', 'idx_emails_has_deadline', 'idx_emails_received_time'):
+            conn.execute(f'DROP INDEX IF EXISTS {index}')
+    conn.executescript(SCHEMA)
+    with conn:
+        conn.execute(
+            'INSERT INTO emails (account, id, importance_level, has_deadline, received_time, '
+            'processed_at, sender, data) SELECT ?, id, importance_level, has_deadline, '
+            f'received_time, processed_at, {SENDER_SQL}, data FROM emails_single_account '
+            'ORDER BY rowid', (DEFAULT_ACCOUNT,))
+        conn.execute('DROP TABLE emails_single_account')
+
+
+def _earliest_deadline(email):
+    """Return the email's earliest deadline in epoch milliseconds, or None."""
+    times = []
+    for deadline in email.get('deadlines') or ():
+        try:
+            times.append(deadline_time(deadline))
+        except (TypeError, ValueError):
+            continue  # Free-text deadlines saved by older versions
+    return min(times, default=None)
+
+
+def _row_values(email):
+    received_time = email.get('received_time')
+    try:
+        received_time = int(received_time) if received_time else None
+    except (TypeError, ValueError):
+        received_time = None
+    return (
+        email.get('account') or DEFAULT_ACCOUNT,
+        email['id'],
+        email.get('importance_level'),
+        1 if email.get('has_deadline') else 0,
+        received_time,
+        email.get('processed_at'),
+        (email.get('from_email') or '').lower() or None,
+        _earliest_deadline(email),
+        json.dumps(email)
+    )
+
+
+def _search_text(email):
+    return (email.get('subject') or '',
+            ' '.join(filter(None, (email.get('from_name'), email.get('from_email')))),
+            email.get('summary') or '')
+
+
+def search_query(text):
+    """Turn free text into an FTS5 query matching every word, the last one as a prefix.
+
+    Returns None when text has no searchable words.
+    """
+    terms = _SEARCH_TERM.findall(text)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _snippet_html(snippet):
+    escaped = html.escape(snippet or '')
+    return escaped.replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>')
+
+
+def _email_from_row(row):
+    account, data = row
+    email = json.loads(data)
+    email.setdefault('account', account)
+    return email
+
+
+class EmailStore:
+    """SQLite storage for processed emails.
+
+    The database runs in WAL mode so the Flask request threads can read while
+    a processing run writes. Each thread gets its own connection. Emails are
+    keyed by (account, id), since message IDs are only unique per mailbox.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        conn = self._connection()
+        _migrate(conn)
+        conn.executescript(SCHEMA)
+        self._create_search_index(conn)
+
+    def _create_search_index(self, conn):
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'emails_fts'").fetchone()
+        conn.executescript(SEARCH_SCHEMA)
+        if not exists:
+            # Emails saved before search existed are indexed without bodies
+            with conn:
+                conn.execute(
+                    'INSERT INTO emails_fts (rowid, subject, sender, summary, body) '
+                    "SELECT rowid, COALESCE(json_extract(data, '$.subject'), ''), "
+                    "trim(COALESCE(json_extract(data, '$.from_name'), '') || ' ' || "
+                    "COALESCE(json_extract(data, '$.from_email'), '')), "
+                    "COALESCE(json_extract(data, '$.summary'), ''), '' FROM emails")
+
+    def _index_emails(self, conn, emails, bodies):
+        rows = []
+        for email in emails:
+            body = bodies.get(email['id']) if bodies else None
+            rows.append((*_search_text(email), body[:SEARCH_BODY_MAX_CHARS] if body else body,
+                         email.get('account') or DEFAULT_ACCOUNT, email['id']))
+        conn.executemany(INDEX_SQL, rows)
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def is_empty(self):
+        row = self._connection().execute('SELECT 1 FROM emails LIMIT 1').fetchone()
+        return row is None
+
+    def get_email(self, email_id, account=None):
+        """Look up a single email by ID, in any account unless one is given, or return None."""
+        if account:
+            row = self._connection().execute(
+                'SELECT account, data FROM emails WHERE account = ? AND id = ?',
+                (account, email_id)).fetchone()
+        else:
+            row = self._connection().execute(
+                'SELECT account, data FROM emails WHERE id = ? LIMIT 1', (email_id,)).fetchone()
+        return _email_from_row(row) if row else None
+
+    def apply_changes(self, upserts=(), deletes=(), account=DEFAULT_ACCOUNT, bodies=None):
+        """Insert or update emails and delete IDs of account in a single transaction.
+
+        bodies optionally maps email IDs to body text for the search index.
+        """
+        with self._connection() as conn:
+            conn.executemany('DELETE FROM emails WHERE account = ? AND id = ?',
+                             [(account, i) for i in deletes])
+            conn.executemany(UPSERT_SQL, [_row_values(e) for e in upserts])
+            self._index_emails(conn, upserts, bodies)
+            conn.execute(BUMP_VERSION_SQL)
+
+    def delete_missing(self, keep_ids, account=DEFAULT_ACCOUNT):
+        """Delete the stored emails of account whose IDs aren't in keep_ids, in a single transaction."""
+        with self._connection() as conn:
+            conn.execute('CREATE TEMP TABLE IF NOT EXISTS keep_ids (id TEXT PRIMARY KEY)')
+            conn.execute('DELETE FROM keep_ids')
+            conn.executemany('INSERT OR IGNORE INTO keep_ids (id) VALUES (?)',
+                             ((i,) for i in keep_ids))
+            conn.execute('DELETE FROM emails WHERE account = ? AND id NOT IN (SELECT id FROM keep_ids)',
+                         (account,))
+            conn.execute('DELETE FROM keep_ids')
+            conn.execute(BUMP_VERSION_SQL)
+
+    def get_body(self, email_id, account=DEFAULT_ACCOUNT):
+        """Return an email's body as indexed for search (at most SEARCH_BODY_MAX_CHARS), or None."""
+        row = self._connection().execute(
+            'SELECT emails_fts.body FROM emails JOIN emails_fts ON emails_fts.rowid = emails.rowid '
+            'WHERE emails.account = ? AND emails.id = ?', (account, email_id)).fetchone()
+        return row[0] if row else None
+
+    def mark_body_fetched(self, email_id, account=DEFAULT_ACCOUNT):
+        """Mark an email as having the only body it will get, so it isn't fetched again."""
+        with self._connection() as conn:
+            self._mark_body_fetched(conn, email_id, account)
+            conn.execute(BUMP_VERSION_SQL)
+
+    def _mark_body_fetched(self, conn, email_id, account):
+        conn.execute(
+            "UPDATE emails SET data = json_set(data, '$.body_fetched', json('true')) "
+            'WHERE account = ? AND id = ?', (account, email_id))
+
+    def save_body(self, email_id, body, account=DEFAULT_ACCOUNT):
+        """Store the body of an email processed without it, and mark the email as having it."""
+        with self._connection() as conn:
+            self._mark_body_fetched(conn, email_id, account)
+            conn.execute(
+                'UPDATE emails_fts SET body = ? '
+                'WHERE rowid = (SELECT rowid FROM emails WHERE account = ? AND id = ?)',
+                (body[:SEARCH_BODY_MAX_CHARS], account, email_id))
+            conn.execute(BUMP_VERSION_SQL)
+
+    def search(self, text, account=None, limit=20):
+        """Full-text search over subject, sender, summary and body, best matches first.
+
+        Only the SEARCH_RANK_WINDOW most recently stored matches are ranked,
+        so that words found in a large share of the mailbox stay fast.
+        Returns (email, snippet_html, score) tuples; the snippet is
+        HTML-escaped with matches wrapped in <mark>.
+        """
+        query = search_query(text)
+        if not query:
+            return []
+        conn = self._connection()
+        account_filter = 'AND emails.account = ?' if account else ''
+        params = [query] + ([account] if account else [])
+        matches = ('emails_fts JOIN emails ON emails.rowid = emails_fts.rowid'
+                   if account else 'emails_fts')
+        oldest = conn.execute(
+            f"SELECT emails_fts.rowid FROM {matches} WHERE emails_fts MATCH ? {account_filter} "
+            f"ORDER BY emails_fts.rowid DESC LIMIT 1 OFFSET ?",
+            params + [SEARCH_RANK_WINDOW - 1]).fetchone()
+        # ORDER BY rank lets FTS5 sort internally and run snippet() only on returned rows
+        rows = conn.execute(
+            f"SELECT emails.account, emails.data, "
+            f"snippet(emails_fts, -1, '{_MARK_START}', '{_MARK_END}', '…', 16), rank "
+            f"FROM emails_fts JOIN emails ON emails.rowid = emails_fts.rowid "
+            f"WHERE emails_fts MATCH ? {account_filter} AND emails_fts.rowid >= ? "
+            f"AND rank MATCH ? ORDER BY rank LIMIT ?",
+            params + [oldest[0] if oldest else 0, RANK_FUNCTION, limit]).fetchall()
+        return [(_email_from_row(row[:2]), _snippet_html(row[2]), -row[3]) for row in rows]
+
+    def version(self):
+        """Return a value that changes whenever the stored emails do."""
+        return self.get_state('emails_version', '0')
+
+    def query_emails(self, account=None, importance_level=None, has_deadline=None, sender=None,
+                     received_after=None, received_before=None, due_after=None, due_before=None,
+                     sort='received', cursor=None, limit=50):
+        """Return a page of emails matching the filters and the next page's cursor.
+
+        sender matches a full address, or every address at a domain when it
+        has no '@'. received_after, received_before, due_after and
+        due_before are epoch milliseconds, like Gmail's internalDate; the
+        due filters apply to an email's earliest deadline. sort='received'
+        lists the newest first, sort='deadline' only emails with deadlines,
+        soonest first. cursor is the value returned with the previous page;
+        it is None after the last page. Raises ValueError for a malformed
+        cursor or an unknown sort.
+        """
+        if sort == 'received':
+            sort_key, direction, after = SORT_KEY, 'DESC', '<'
+        elif sort == 'deadline':
+            sort_key, direction, after = 'deadline_time', 'ASC', '>'
+        else:
+            raise ValueError(f"Unknown sort {sort!r}")
+        conditions = []
+        params = []
+        if account:
+            conditions.append('account = ?')
+            params.append(account)
+        if importance_level:
+            conditions.append('importance_level = ?')
+            params.append(importance_level)
+        if has_deadline is not None:
+            conditions.append('has_deadline = ?')
+            params.append(1 if has_deadline else 0)
+        if sender:
+            sender = sender.lower()
+            if '@' in sender:
+                conditions.append('sender = ?')
+                params.append(sender)
+            else:
+                conditions.append('sender LIKE ? ESCAPE ?')
+                params.extend(['%@' + sender.replace('%', '\\%').replace('_', '\\_'), '\\'])
+        if received_after is not None:
+            conditions.append(f'{SORT_KEY} >= ?')
+            params.append(received_after)
+        if received_before is not None:
+            conditions.append(f'{SORT_KEY} < ?')
+            params.append(received_before)
+        if due_after is not None:
+            conditions.append('deadline_time >= ?')
+            params.append(due_after)
+        if due_before is not None:
+            conditions.append('deadline_time < ?')
+            params.append(due_before)
+        if sort == 'deadline':
+            conditions.append('deadline_time IS NOT NULL')
+        if cursor:
+            cursor_key, rowid = (int(part) for part in cursor.split(':'))
+            conditions.append(f'({sort_key}, rowid) {after} (?, ?)')
+            params.extend([cursor_key, rowid])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        rows = self._connection().execute(
+            f'SELECT account, data, {sort_key}, rowid FROM emails {where} '
+            f'ORDER BY {sort_key} {direction}, rowid {direction} LIMIT ?',
+            params + [limit + 1]).fetchall()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = f'{rows[-1][2]}:{rows[-1][3]}'
+        return [_email_from_row(row[:2]) for row in rows], next_cursor
+
+    def get_state(self, key, default=None):
+        row = self._connection().execute(
+            'SELECT value FROM sync_state WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_state(self, key, value):
+        with self._connection() as conn:
+            conn.execute(
+                'INSERT INTO sync_state (key, value) VALUES (?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value', (key, value))
@@ -1,95 +1,307 @@
 import os
-import pickle
-import base64
 import html
+import json
+import time
+import pickle
+import logging
+import tempfile
+import threading
 import email.utils
+from datetime import datetime, timedelta, timezone
+import httplib2
+import google_auth_httplib2
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
-from config.config import SCOPES, CREDENTIALS_FILE, TOKEN_FILE
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+from src.text_extraction import extract_part_text
+from src import metrics
+from config.config import (SCOPES, CREDENTIALS_FILE, TOKEN_FILE, GMAIL_BATCH_SIZE,
+                           GMAIL_BATCH_MAX_RETRIES, GMAIL_RETRY_BASE_DELAY,
+                           GMAIL_DISCOVERY_CACHE_FILE, GMAIL_TOKEN_REFRESH_MARGIN)
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+TRACKED_LABELS = {'UNREAD', 'INBOX'}
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+DISCOVERY_URL = 'https://gmail.googleapis.com/$discovery/rest?version=v1'
+# Headers read by get_message_content, requested when fetching format='metadata'
+METADATA_HEADERS = ['Subject', 'From', 'Date', 'List-Unsubscribe', 'Precedence', 'Auto-Submitted']
+# Quota units charged by Gmail per call (https://developers.google.com/gmail/api/reference/quota)
+QUOTA_UNITS = {'messages.list': 5, 'messages.get': 5, 'messages.modify': 5,
+               'history.list': 2, 'labels.get': 1, 'getProfile': 1}
+
+def _retry_after(error):
+    """Return the delay requested by a retryable Gmail error, or None if it shouldn't be retried."""
+    if not isinstance(error, HttpError):
+        return None
+    status = error.resp.status
+    if status == 403 and any(reason in str(error.content) for reason in RATE_LIMIT_REASONS):
+        status = 429
+    if status not in RETRYABLE_STATUSES:
+        return None
+    try:
+        return float(error.resp.get('retry-after', 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+def load_credentials(token_file=TOKEN_FILE, credentials_file=CREDENTIALS_FILE, interactive=True):
+    """Load saved OAuth2 credentials, refreshing or running the consent flow when needed.
+
+    With interactive=False a missing or unrefreshable token raises
+    RuntimeError instead of opening a browser for consent.
+    """
+    creds = None
+    if os.path.exists(token_file):
+        with open(token_file, 'rb') as token:
+            creds = pickle.load(token)
+
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+        elif not interactive:
+            raise RuntimeError(f"No usable Gmail token in {token_file}; authorize the account first")
+        else:
+            flow = InstalledAppFlow.from_client_secrets_file(credentials_file, SCOPES)
+            creds = flow.run_local_server(port=0)
+        save_credentials(creds, token_file)
+    return creds
+
+def save_credentials(creds, token_file=TOKEN_FILE):
+    with open(token_file, 'wb') as token:
+        pickle.dump(creds, token)
+
+def load_discovery_document(cache_file=GMAIL_DISCOVERY_CACHE_FILE):
+    """Return the parsed Gmail discovery document, caching it in cache_file.
+
+    The copy bundled with googleapiclient is used when available, otherwise
+    it is downloaded once.
+    """
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error("Ignoring unreadable discovery cache %s: %s", cache_file, e)
+
+    document = discovery_cache.get_static_doc('gmail', 'v1')
+    if document is None:
+        response, content = httplib2.Http(timeout=30).request(DISCOVERY_URL)
+        if response.status != 200:
+            raise RuntimeError(f'Could not fetch the Gmail discovery document: HTTP {response.status}')
+        document = content.decode('utf-8')
+    try:
+        directory = os.path.dirname(os.path.abspath(cache_file))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(document)
+        os.replace(tmp_path, cache_file)
+    except OSError as e:
+        logger.error("Could not cache the discovery document: %s", e)
+    return json.loads(document)
 
 class GmailClient:
-    def __init__(self):
-        self.service = None
-        self.creds = None
+    def __init__(self, service=None, creds=None, quota=None):
+        self.service = service
+        self.creds = creds
+        self.quota = quota  # Optional TokenBucket of the account's Gmail quota units
 
-    def authenticate(self):
-        """Handles the OAuth2 authentication flow."""
-        if os.path.exists(TOKEN_FILE):
-            with open(TOKEN_FILE, 'rb') as token:
-                self.creds = pickle.load(token)
-
-        if not self.creds or not self.creds.valid:
-            if self.creds and self.creds.expired and self.creds.refresh_token:
-                self.creds.refresh(Request())
-            else:
-                flow = InstalledAppFlow.from_client_secrets_file(
-                    CREDENTIALS_FILE, SCOPES)
-                self.creds = flow.run_local_server(port=0)
+    def _spend(self, method, calls=1):
+        units = QUOTA_UNITS[method] * calls
+        metrics.gmail_quota_units_total.inc(units, method=method)
+        if self.quota:
+            self.quota.acquire(units)
 
-            with open(TOKEN_FILE, 'wb') as token:
-                pickle.dump(self.creds, token)
+    def authenticate(self):
+        """Handles the OAuth2 authentication flow.
 
+        Builds a private service for this client; long-running code should
+        share one through GmailClientManager instead.
+        """
+        self.creds = load_credentials()
         self.service = build('gmail', 'v1', credentials=self.creds)
         return self.service
 
     def list_messages(self, query='', max_results=10):
         """List messages in the user's mailbox."""
+        return list(self.iter_messages(query, page_size=max_results, limit=max_results))
+
+    def iter_messages(self, query='', page_size=100, limit=None):
+        """Lazily yield messages matching query, following page tokens as needed.
+
+        Stops after limit messages when limit is set. Raises if a page can't
+        be listed, after yielding the messages of the pages before it.
+        """
+        page_token = None
+        count = 0
+        while True:
+            max_results = page_size if limit is None else min(page_size, limit - count)
+            self._spend('messages.list')
+            try:
+                results = self.service.users().messages().list(
+                    userId='me', q=query, maxResults=max_results,
+                    pageToken=page_token).execute()
+            except Exception as e:
+                logger.error("Listing messages failed: %s", e)
+                metrics.errors_total.inc(stage='list')
+                raise
+            for message in results.get('messages', []):
+                yield message
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return
+
+    def count_unread_inbox(self):
+        """Get the number of unread messages in the inbox, or None if unavailable."""
+        self._spend('labels.get')
+        try:
+            label = self.service.users().labels().get(userId='me', id='INBOX').execute()
+            return label.get('messagesUnread')
+        except Exception as e:
+            logger.error("Reading the inbox label failed: %s", e)
+            return None
+
+    def get_history_id(self):
+        """Get the mailbox's current historyId."""
+        self._spend('getProfile')
         try:
-            results = self.service.users().messages().list(
-                userId='me', q=query, maxResults=max_results).execute()
-            messages = results.get('messages', [])
-            return messages
+            profile = self.service.users().getProfile(userId='me').execute()
+            return profile.get('historyId')
         except Exception as e:
-            print(f'An error occurred: {e}')
-            return []
+            logger.error("Reading the mailbox profile failed: %s", e)
+            return None
+
+    def get_history_changes(self, start_history_id):
+        """Get unread inbox messages added and removed since start_history_id.
+
+        Returns (added_ids, removed_ids, history_id), where history_id is the
+        mailbox's latest historyId, or None when start_history_id has expired
+        and a full resync is needed.
+        """
+        changes = {}
+        history_id = start_history_id
+        page_token = None
+        while True:
+            self._spend('history.list')
+            try:
+                results = self.service.users().history().list(
+                    userId='me', startHistoryId=start_history_id, pageToken=page_token,
+                    historyTypes=['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved']
+                ).execute()
+            except HttpError as e:
+                if e.resp.status == 404:
+                    logger.info("History ID %s has expired", start_history_id)
+                    return None
+                raise
+            history_id = results.get('historyId', history_id)
+
+            for record in results.get('history', []):
+                for item in record.get('messagesAdded', []):
+                    message = item['message']
+                    if TRACKED_LABELS.issubset(message.get('labelIds', [])):
+                        changes[message['id']] = 'added'
+                for item in record.get('messagesDeleted', []):
+                    changes[item['message']['id']] = 'removed'
+                for item in record.get('labelsAdded', []):
+                    message = item['message']
+                    if TRACKED_LABELS.issubset(message.get('labelIds', [])):
+                        changes[message['id']] = 'added'
+                for item in record.get('labelsRemoved', []):
+                    if TRACKED_LABELS.intersection(item.get('labelIds', [])):
+                        changes[item['message']['id']] = 'removed'
+
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                break
+
+        added_ids = [msg_id for msg_id, change in changes.items() if change == 'added']
+        removed_ids = [msg_id for msg_id, change in changes.items() if change == 'removed']
+        return added_ids, removed_ids, history_id
 
     def get_message(self, msg_id):
         """Get a specific message by ID."""
+        self._spend('messages.get')
         try:
             message = self.service.users().messages().get(
                 userId='me', id=msg_id, format='full').execute()
             return message
         except Exception as e:
-            print(f'An error occurred: {e}')
+            logger.error("Fetching a message failed: %s", e)
             return None
 
-    def _extract_text_from_part(self, part):
-        """Extract text content from a message part."""
-        try:
-            mime_type = part.get('mimeType', '')
-            body = part.get('body', {})
-            data = body.get('data', '')
+    def get_messages_batch(self, msg_ids, msg_format='full'):
+        """Get several messages using Gmail batch requests.
 
-            if not data:
-                return ''
+        Returns the messages in the same order as msg_ids, with None for any
+        message that could not be fetched. Rate-limited and transient failures
+        are retried with exponential backoff, honouring Retry-After. With
+        msg_format='metadata' only the headers in METADATA_HEADERS, the
+        labels and the snippet are downloaded.
+        """
+        options = {'metadataHeaders': METADATA_HEADERS} if msg_format == 'metadata' else {}
+        msg_ids = list(msg_ids)
+        messages = {}
+        remaining = list(dict.fromkeys(msg_ids))
+        delay = GMAIL_RETRY_BASE_DELAY
 
-            # Decode base64 content
-            try:
-                decoded_data = base64.urlsafe_b64decode(data)
-                text = decoded_data.decode('utf-8')
-            except UnicodeDecodeError:
-                # Try different encodings
-                for encoding in ['latin-1', 'cp1252', 'iso-8859-1']:
-                    try:
-                        text = decoded_data.decode(encoding)
-                        break
-                    except UnicodeDecodeError:
-                        continue
+        for attempt in range(GMAIL_BATCH_MAX_RETRIES + 1):
+            retry_ids = []
+            retry_after = 0.0
+
+            def callback(request_id, response, exception):
+                nonlocal retry_after
+                if exception is None:
+                    messages[request_id] = response
+                    return
+                wait = _retry_after(exception)
+                if wait is None:
+                    logger.error("Fetching message %s failed: %s", request_id, exception)
                 else:
-                    text = decoded_data.decode('utf-8', errors='replace')
+                    retry_ids.append(request_id)
+                    retry_after = max(retry_after, wait)
 
-            # Clean HTML content if it's HTML
-            if 'html' in mime_type.lower():
-                import re
-                text = re.sub(r'<[^>]+>', '', text)
-                text = html.unescape(text)
+            for start in range(0, len(remaining), GMAIL_BATCH_SIZE):
+                chunk = remaining[start:start + GMAIL_BATCH_SIZE]
+                self._spend('messages.get', len(chunk))
+                batch = self.service.new_batch_http_request(callback=callback)
+                for msg_id in chunk:
+                    batch.add(self.service.users().messages().get(
+                        userId='me', id=msg_id, format=msg_format, **options), request_id=msg_id)
+                try:
+                    batch.execute()
+                except Exception as e:
+                    wait = _retry_after(e)
+                    if wait is None:
+                        logger.error("Batch request failed: %s", e)
+                        continue
+                    retry_ids.extend(msg_id for msg_id in chunk
+                                     if msg_id not in messages and msg_id not in retry_ids)
+                    retry_after = max(retry_after, wait)
 
-            return text.strip()
+            if not retry_ids:
+                break
+            if attempt == GMAIL_BATCH_MAX_RETRIES:
+                logger.error("Giving up on %d messages after %d retries", len(retry_ids), attempt)
+                break
+            time.sleep(max(delay, retry_after))
+            delay *= 2
+            remaining = retry_ids
 
+        return [messages.get(msg_id) for msg_id in msg_ids]
+
+    def _extract_text_from_part(self, part):
+        """Extract text content from a message part."""
+        try:
+            return extract_part_text(part)
         except Exception as e:
-            print(f"Error extracting text from part: {e}")
+            logger.error("Error extracting text from part: %s", e)
             return ''
 
     def _extract_content_recursive(self, payload):
@@ -104,7 +316,14 @@ class GmailClient:
 
         # Check for multipart content
         if 'parts' in payload:
-            for part in payload['parts']:
+            parts = payload['parts']
+            if payload.get('mimeType', '').lower() == 'multipart/alternative':
+                # Alternatives carry the same message; keep only one of them
+                # so the text isn't sent to the LLM twice.
+                plain = [p for p in parts if p.get('mimeType', '').lower() == 'text/plain'
+                         and p.get('body', {}).get('data')]
+                parts = plain[:1] or parts[-1:]
+            for part in parts:
                 mime_type = part.get('mimeType', '')
 
                 # Skip attachments and images
@@ -135,6 +354,9 @@ class GmailClient:
             subject = 'No Subject'
             date_header = ''
             from_header = ''
+            list_unsubscribe = ''
+            precedence = ''
+            auto_submitted = ''
             for header in headers:
                 header_name = header['name'].lower()
                 if header_name == 'subject':
@@ -143,6 +365,12 @@ class GmailClient:
                     date_header = header['value']
                 elif header_name == 'from':
                     from_header = header['value']
+                elif header_name == 'list-unsubscribe':
+                    list_unsubscribe = header['value']
+                elif header_name == 'precedence':
+                    precedence = header['value']
+                elif header_name == 'auto-submitted':
+                    auto_submitted = header['value']
 
             # Parse sender's name and email
             from_name, from_email = email.utils.parseaddr(from_header)
@@ -152,7 +380,8 @@ class GmailClient:
             if content_parts:
                 content = '\n\n'.join(content_parts)
             else:
-                content = message.get('snippet', '')
+                # Gmail HTML-escapes snippets; this is all there is with format='metadata'
+                content = html.unescape(message.get('snippet', ''))
 
             content = content.strip()
             if not content:
@@ -167,11 +396,15 @@ class GmailClient:
                 'from_name': from_name,        # Sender's name only
                 'from_email': from_email,      # Sender's email only
                 'date_header': date_header,
-                'received_time': message.get('internalDate', '')
+                'received_time': message.get('internalDate', ''),
+                'label_ids': message.get('labelIds', []),
+                'list_unsubscribe': list_unsubscribe,   # Bulk-mail signals used for routing
+                'precedence': precedence,
+                'auto_submitted': auto_submitted
             }
 
         except Exception as e:
-            print(f"Error extracting message content: {e}")
+            logger.error("Error extracting message content: %s", e)
             # Fallback: return basic info with snippet
             try:
                 headers = message.get('payload', {}).get('headers', [])
@@ -194,6 +427,7 @@ class GmailClient:
 
     def mark_as_read(self, msg_id):
         """Mark a message as read by removing the UNREAD label."""
+        self._spend('messages.modify')
         try:
             self.service.users().messages().modify(
                 userId='me',
@@ -202,5 +436,58 @@ class GmailClient:
             ).execute()
             return True
         except Exception as e:
-            print(f'An error occurred: {e}')
+            logger.error("Marking a message as read failed: %s", e)
             return False
+
+class GmailClientManager:
+    """Process-wide, thread-safe source of an authenticated GmailClient.
+
+    Credentials are loaded and the service is built from the cached
+    discovery document once; get_client() after that only checks the
+    token, refreshing it ahead of expiry. httplib2 connections are not
+    thread-safe, so every request runs on an http object owned by the
+    calling thread.
+    """
+
+    def __init__(self, token_file=TOKEN_FILE, credentials_file=CREDENTIALS_FILE,
+                 refresh_margin=GMAIL_TOKEN_REFRESH_MARGIN, quota=None):
+        self.token_file = token_file
+        self.credentials_file = credentials_file
+        self.quota = quota
+        self.refresh_margin = timedelta(seconds=refresh_margin)
+        self._client = None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def get_client(self, interactive=True):
+        """Return the shared client; interactive=False fails rather than run the consent flow."""
+        with self._lock:
+            if self._client is None:
+                creds = load_credentials(self.token_file, self.credentials_file, interactive)
+                service = build_from_document(
+                    load_discovery_document(), credentials=creds,
+                    requestBuilder=self._build_request)
+                self._client = GmailClient(service, creds, self.quota)
+            else:
+                self._refresh_if_expiring(self._client.creds)
+            return self._client
+
+    def _refresh_if_expiring(self, creds):
+        if not creds.refresh_token:
+            return
+        now = datetime.now(timezone.utc).replace(tzinfo=None)  # google-auth uses naive UTC
+        if creds.valid and creds.expiry and creds.expiry - now > self.refresh_margin:
+            return
+        creds.refresh(Request())
+        save_credentials(creds, self.token_file)
+
+    def _thread_http(self):
+        http = getattr(self._local, 'http', None)
+        if http is None:
+            http = self._local.http = google_auth_httplib2.AuthorizedHttp(
+                self._client.creds, http=httplib2.Http())
+        return http
+
+    def _build_request(self, http, *args, **kwargs):
+        # Ignore the service's shared http and use this thread's own
+        return HttpRequest(self._thread_http(), *args, **kwargs)
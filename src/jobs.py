@@ -0,0 +1,151 @@
+import time
+import uuid
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+REPLAY_EMAILS = 500  # Most recent processed emails a job keeps for (re)connecting streams
+
+
+class Job:
+    """A background processing run and its progress counters."""
+
+    def __init__(self, replay_emails=REPLAY_EMAILS):
+        self.id = uuid.uuid4().hex
+        self.status = 'running'
+        self.started_at = time.time()
+        self.finished_at = None
+        self.total = None  # Expected number of emails, when known
+        self.counters = {'fetched': 0, 'classified': 0, 'failed': 0}
+        self.result = None
+        self.error = None
+        # The most recent processed emails in completion order, for streaming;
+        # older ones are in the email store
+        self.emails = deque(maxlen=replay_emails)
+        self.published = 0  # Emails added so far; the next one gets this index
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    def increment(self, counter, amount=1):
+        with self._lock:
+            self.counters[counter] += amount
+
+    def add_email(self, email):
+        """Publish a processed email to anyone streaming this job."""
+        with self._changed:
+            self.emails.append(email)
+            self.published += 1
+            self._changed.notify_all()
+
+    def wait_for_emails(self, start, timeout=None):
+        """Wait until emails from index start on are available or the job finishes.
+
+        Returns (first, new_emails, still_running), where first is the index
+        of the first email returned. It is past start when those emails have
+        already left the replay buffer.
+        """
+        with self._changed:
+            if self.published <= start and self.status == 'running':
+                self._changed.wait(timeout)
+            first = max(start, self.published - len(self.emails))
+            emails = list(self.emails)[first - self.published:] if first < self.published else []
+            return first, emails, self.status == 'running'
+
+    def add_total(self, count):
+        """Add count expected emails, e.g. for one of several accounts; None means unknown."""
+        if count is None:
+            return
+        with self._lock:
+            self.total = (self.total or 0) + count
+
+    def is_running(self):
+        return self.status == 'running'
+
+    def finish(self, result=None):
+        """Mark the job completed with result and wake anyone streaming it."""
+        self._set_status('completed', result=result)
+
+    def fail(self, error):
+        """Mark the job failed with an error message and wake anyone streaming it."""
+        self._set_status('failed', error=error)
+
+    def _set_status(self, status, result=None, error=None):
+        with self._changed:
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+            self._changed.notify_all()
+
+    def to_dict(self):
+        with self._lock:
+            counters = dict(self.counters)
+            total = self.total
+            finished_at = self.finished_at
+        elapsed = (finished_at or time.time()) - self.started_at
+        done = counters['classified'] + counters['failed']
+        eta = None
+        if self.status == 'running' and total and done and elapsed > 0:
+            eta = round(max(total - done, 0) / (done / elapsed), 1)
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'total': total,
+            **counters,
+            'elapsed_seconds': round(elapsed, 1),
+            'eta_seconds': eta,
+            'result': self.result,
+            'error': self.error
+        }
+
+
+class JobManager:
+    """Runs processing jobs on a background thread, one at a time.
+
+    Starting a job while another is running returns the running job, so
+    repeated requests join it instead of starting duplicates.
+    """
+
+    def __init__(self, max_finished_jobs=20):
+        self.max_finished_jobs = max_finished_jobs
+        self._jobs = {}
+        self._current = None
+        self._lock = threading.Lock()
+
+    def start(self, target, *args, **kwargs):
+        """Start target(job, *args, **kwargs) in the background.
+
+        Returns (job, created), where created is False when an existing
+        running job was returned instead.
+        """
+        with self._lock:
+            if self._current and self._current.is_running():
+                return self._current, False
+            job = Job()
+            self._jobs[job.id] = job
+            self._current = job
+            self._prune()
+        thread = threading.Thread(target=self._run, args=(job, target, args, kwargs))
+        thread.daemon = True
+        thread.start()
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job, target, args, kwargs):
+        try:
+            result = target(job, *args, **kwargs)
+            job.finish(result)
+        except Exception as e:
+            logger.exception("Job %s failed: %s", job.id, e)
+            job.fail(str(e))
+
+    def _prune(self):
+        finished = [job for job in self._jobs.values() if not job.is_running()]
+        finished.sort(key=lambda job: job.started_at)
+        for job in finished[:-self.max_finished_jobs or None]:
+            del self._jobs[job.id]
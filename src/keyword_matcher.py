@@ -0,0 +1,62 @@
+import re
+
+# Endings a keyword may carry and still match: "meetings", "scheduled", "calling"
+INFLECTIONS = r'(?:s|es|d|ed|ing)?'
+
+
+class KeywordMatcher:
+    """Match many keywords against text in a single pass.
+
+    The keywords are merged into a prefix trie which is compiled into one
+    regular expression, so the regex engine walks the shared prefixes once
+    per position (the same idea as Aho-Corasick) instead of scanning the
+    text once per keyword. Plural and inflected forms of a keyword (see
+    INFLECTIONS) count as the keyword itself.
+    """
+
+    def __init__(self, keywords_by_category):
+        self._categories = {}
+        for category, keywords in keywords_by_category.items():
+            for keyword in keywords:
+                self._categories.setdefault(keyword.lower(), set()).add(category)
+        if self._categories:
+            pattern = (r'\b(' + self._trie_pattern(self._build_trie(self._categories)) + ')'
+                       + INFLECTIONS + r'\b')
+            self._pattern = re.compile(pattern, re.IGNORECASE)
+        else:
+            self._pattern = None
+
+    @staticmethod
+    def _build_trie(keywords):
+        trie = {}
+        for keyword in keywords:
+            node = trie
+            for char in keyword:
+                node = node.setdefault(char, {})
+            node[''] = True  # End of a keyword
+        return trie
+
+    @classmethod
+    def _trie_pattern(cls, node):
+        ends_here = '' in node
+        branches = [re.escape(char) + cls._trie_pattern(child)
+                    for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and not ends_here:
+            return branches[0]
+        pattern = '(?:' + '|'.join(branches) + ')'
+        return pattern + '?' if ends_here else pattern
+
+    def find(self, text):
+        """Return the set of keywords found in text, in the form they were given."""
+        if not self._pattern or not text:
+            return set()
+        return {match.group(1).lower() for match in self._pattern.finditer(text)}
+
+    def categories(self, text):
+        """Return the set of categories whose keywords appear in text."""
+        found = set()
+        for keyword in self.find(text):
+            found |= self._categories.get(keyword, set())
+        return found
@@ -1,19 +1,32 @@
 import requests
 import json
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import nullcontext
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from src import metrics
+from config.config import (LLM_BATCH_TOKEN_BUDGET, LLM_BATCH_MAX_EMAILS, LLM_MAX_CONCURRENCY,
+                           LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT, LLM_MAX_RETRIES,
+                           LLM_RETRY_BACKOFF, DEFAULT_ACCOUNT)
 
-class LLMService:
-    def __init__(self):
-        self.api_url = "http://127.0.0.1:1234/v1/chat/completions"
-        self.model = "deepseek-chat"  # Change to match your loaded LM Studio model
-        self.api_key = "dummy-key"    # LM Studio ignores this, but keep for interface compatibility
+logger = logging.getLogger(__name__)
 
-    def classify_email_importance(self, subject, body):
-        prompt = (
+# Bump whenever the classification prompt changes so cached results are invalidated.
+PROMPT_VERSION = "1"
+
+IMPORTANCE_LEVELS = ["Very Important", "Important", "Unimportant"]
+
+LABEL_DEFINITIONS = (
     "You are an expert email assistant. For each email, classify its importance as one of:\n"
     "- \"Unimportant\": Social invitations, newsletters, advertisements, or emails that do not require any action or have no significant impact.\n"
     "- \"Important\": Emails that require action soon, involve deadlines, reminders, bills, appointments, or are work-related but not life-changing.\n"
     "- \"Very Important\": Life-changing, urgent, or highly time-sensitive emails such as job offers, university acceptance, legal notices, or critical health/family matters.\n"
-    "Return only a JSON object with the field importance_level. Do not explain your answer.\n\n"
+)
+
+FEW_SHOT_EXAMPLES = (
     "Example 1:\n"
     "Subject: Distant Friend's Wedding\n"
     "Body: Hey, just letting you know my wedding is next month. Would love to see you there!\n"
@@ -62,19 +75,176 @@ class LLMService:
     "Subject: Scholarship Awarded\n"
     "Body: Congratulations! You have been awarded a full scholarship for your studies.\n"
     "Output: {\"importance_level\": \"Very Important\"}\n\n"
-    "Now classify this email:\n"
-    f"Subject: {subject}\n"
-    f"Body: {body}\n"
-    "Output:"
-        )
+)
+
+SINGLE_EMAIL_INSTRUCTIONS = "Return only a JSON object with the field importance_level. Do not explain your answer.\n\n"
+
+BATCH_INSTRUCTIONS = (
+    "You will be given several numbered emails. Return only a JSON array with one object per email, "
+    "each with the fields index and importance_level, for example "
+    "[{\"index\": 0, \"importance_level\": \"Important\"}]. Do not explain your answer.\n\n"
+)
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
 
+def create_session(pool_size=LLM_MAX_CONCURRENCY, max_retries=LLM_MAX_RETRIES,
+                   backoff=LLM_RETRY_BACKOFF):
+    """Create a keep-alive HTTP session that retries connection errors, 429 and 5xx responses."""
+    retry = Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=0,  # A read timeout means the model is stuck; retrying would only wait again
+        status=max_retries,
+        backoff_factor=backoff,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['POST']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def estimate_tokens(text):
+    """Rough token count for budgeting prompts (about four characters per token)."""
+    return len(text) // 4 + 1
+
+
+class LLMService:
+    def __init__(self, cache=None, batch_token_budget=LLM_BATCH_TOKEN_BUDGET,
+                 batch_max_emails=LLM_BATCH_MAX_EMAILS,
+                 timeout=(LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT), session=None, slot=None):
+        self.api_url = "http://127.0.0.1:1234/v1/chat/completions"
+        self.model = "deepseek-chat"  # Change to match your loaded LM Studio model
+        self.api_key = "dummy-key"    # LM Studio ignores this, but keep for interface compatibility
+        self.cache = cache            # Optional ClassificationCache shared across runs
+        self.batch_token_budget = batch_token_budget
+        self.batch_max_emails = batch_max_emails
+        self.timeout = timeout        # (connect, read) seconds
+        self.session = session or create_session()
+        self.slot = slot              # Optional callable returning a context manager held per request
+        self._usage_lock = threading.Lock()
+        self.usage = {'requests': 0, 'errors': 0, 'emails': 0, 'cache_hits': 0,
+                      'prompt_tokens': 0, 'completion_tokens': 0}
+        self._latencies = deque(maxlen=1000)  # Seconds per call, most recent calls only
+
+    @property
+    def cache_namespace(self):
+        return f"{self.model}:{PROMPT_VERSION}"
+
+    def classify_email_importance(self, subject, body, message_id=None, account=DEFAULT_ACCOUNT):
+        """Return the email's importance level, or None if the LLM gave no usable answer.
+
+        Only real answers are cached, so a failed email is asked about again
+        next time.
+        """
+        if self.cache:
+            cached = self.cache.get(self.cache_namespace, subject, body, message_id, account)
+            if cached:
+                self._count_cache_hit()
+                return cached
+        return self._classify_uncached(subject, body, message_id, account)
+
+    def _classify_uncached(self, subject, body, message_id, account):
+        """Ask the LLM about an email already missed in the cache, caching a real answer."""
+        try:
+            importance = self._request_importance(subject, body)
+        except Exception as e:
+            logger.error("LLM call failed: %s", e)
+            metrics.errors_total.inc(stage='classify')
+            return None
+
+        if self.cache:
+            self.cache.put(self.cache_namespace, subject, body, importance, message_id, account)
+        return importance
+
+    def classify_batch(self, emails):
+        """Classify several emails, packing them into shared prompts.
+
+        emails is a list of dicts with subject, body and optionally id and
+        account. The few-shot prefix is sent once per request and requests
+        are sized to batch_token_budget. Emails whose result can't be parsed
+        from a batch response are retried with single-email calls. Returns
+        importance levels in input order, with None for emails the LLM
+        couldn't classify.
+        """
+        results = [None] * len(emails)
+        pending = []
+        for index, email in enumerate(emails):
+            cached = None
+            if self.cache:
+                cached = self.cache.get(self.cache_namespace, email.get('subject', ''),
+                                        email.get('body', ''), email.get('id'),
+                                        email.get('account', DEFAULT_ACCOUNT))
+            if cached:
+                self._count_cache_hit()
+                results[index] = cached
+            else:
+                pending.append(index)
+
+        for batch in self._pack_batches(emails, pending):
+            parsed = {}
+            if len(batch) > 1:
+                try:
+                    parsed = self._request_batch([emails[i] for i in batch])
+                except Exception as e:
+                    logger.error("Batched LLM call failed, falling back to single calls: %s", e)
+            for position, index in enumerate(batch):
+                email = emails[index]
+                importance = parsed.get(position)
+                if importance is None:
+                    # The cache was already checked above; a second lookup would count another miss
+                    results[index] = self._classify_uncached(
+                        email.get('subject', ''), email.get('body', ''), email.get('id'),
+                        email.get('account', DEFAULT_ACCOUNT))
+                    continue
+                results[index] = importance
+                if self.cache:
+                    self.cache.put(self.cache_namespace, email.get('subject', ''),
+                                   email.get('body', ''), importance, email.get('id'),
+                                   email.get('account', DEFAULT_ACCOUNT))
+        return results
+
+    def _count_cache_hit(self):
+        with self._usage_lock:
+            self.usage['cache_hits'] += 1
+        metrics.llm_cache_hits_total.inc()
+
+    def _pack_batches(self, emails, indices):
+        """Group email indices into batches that fit the prompt token budget."""
+        prefix_tokens = estimate_tokens(LABEL_DEFINITIONS + BATCH_INSTRUCTIONS + FEW_SHOT_EXAMPLES)
+        batches = []
+        batch, batch_tokens = [], prefix_tokens
+        for index in indices:
+            email = emails[index]
+            tokens = estimate_tokens(email.get('subject', '')) + estimate_tokens(email.get('body', '')) + 8
+            if batch and (batch_tokens + tokens > self.batch_token_budget
+                          or len(batch) >= self.batch_max_emails):
+                batches.append(batch)
+                batch, batch_tokens = [], prefix_tokens
+            batch.append(index)
+            batch_tokens += tokens
+        if batch:
+            batches.append(batch)
+        return batches
+
+    def _chat(self, prompt, max_tokens, emails=1):
+        """Send a chat completion request and return the model's answer text."""
         payload = {
             "model": self.model,
             "messages": [
                 {"role": "system", "content": "You are an expert email assistant."},
                 {"role": "user", "content": prompt}
             ],
-            "max_tokens": 50,
+            "max_tokens": max_tokens,
             "temperature": 0.2
         }
 
@@ -83,24 +253,115 @@ class LLMService:
             "Authorization": f"Bearer {self.api_key}"
         }
 
-        try:
-            response = requests.post(self.api_url, headers=headers, json=payload)
-            response.raise_for_status()
-            result = response.json()
-            answer = result['choices'][0]['message']['content'].strip()
-            # Try to parse the JSON from the model's output
+        with self.slot() if self.slot else nullcontext():
+            started = time.perf_counter()
             try:
-                importance = json.loads(answer)["importance_level"]
-                return importance
+                response = self.session.post(self.api_url, headers=headers, json=payload,
+                                             timeout=self.timeout)
+                response.raise_for_status()
+                result = response.json()
             except Exception:
-                # Fallback: extract label manually
-                for label in ["Very Important", "Important", "Unimportant"]:
-                    if label in answer:
-                        return label
-                return "Unimportant"
-        except Exception as e:
-            print(f"[ERROR] LLM call failed: {e}")
-            return "Unimportant"
+                latency = time.perf_counter() - started
+                with self._usage_lock:
+                    self.usage['errors'] += 1
+                    self._latencies.append(latency)
+                metrics.llm_requests_total.inc(status='error')
+                metrics.llm_request_seconds.observe(latency)
+                raise
+
+        latency = time.perf_counter() - started
+        usage = result.get('usage') or {}
+        prompt_tokens = usage.get('prompt_tokens', estimate_tokens(prompt))
+        completion_tokens = usage.get('completion_tokens', 0)
+        with self._usage_lock:
+            self._latencies.append(latency)
+            self.usage['requests'] += 1
+            self.usage['emails'] += emails
+            self.usage['prompt_tokens'] += prompt_tokens
+            self.usage['completion_tokens'] += completion_tokens
+        metrics.llm_requests_total.inc(status='ok')
+        metrics.llm_request_seconds.observe(latency)
+        metrics.llm_tokens_total.inc(prompt_tokens, kind='prompt')
+        metrics.llm_tokens_total.inc(completion_tokens, kind='completion')
+
+        return result['choices'][0]['message']['content'].strip()
+
+    def _request_importance(self, subject, body):
+        """Ask the model for an importance level; raises if the request fails."""
+        prompt = (
+            LABEL_DEFINITIONS +
+            SINGLE_EMAIL_INSTRUCTIONS +
+            FEW_SHOT_EXAMPLES +
+            "Now classify this email:\n"
+            f"Subject: {subject}\n"
+            f"Body: {body}\n"
+            "Output:"
+        )
+        answer = self._chat(prompt, max_tokens=50)
+        # Try to parse the JSON from the model's output
+        try:
+            importance = json.loads(answer)["importance_level"]
+            if importance in IMPORTANCE_LEVELS:
+                return importance
+        except Exception:
+            pass
+        # Fallback: extract label manually
+        for label in IMPORTANCE_LEVELS:
+            if label in answer:
+                return label
+        raise ValueError(f"No importance level in the model's answer: {answer[:100]!r}")
+
+    def _request_batch(self, emails):
+        """Classify a batch in one request; returns {position: importance} for parsed entries."""
+        numbered = ''.join(
+            f"Email {index}:\nSubject: {email.get('subject', '')}\nBody: {email.get('body', '')}\n\n"
+            for index, email in enumerate(emails)
+        )
+        prompt = (
+            LABEL_DEFINITIONS +
+            BATCH_INSTRUCTIONS +
+            FEW_SHOT_EXAMPLES +
+            "Now classify these emails:\n\n" +
+            numbered +
+            "Output:"
+        )
+        answer = self._chat(prompt, max_tokens=20 + 20 * len(emails), emails=len(emails))
+
+        # Models sometimes wrap the array in prose or code fences.
+        start, end = answer.find('['), answer.rfind(']')
+        if start == -1 or end < start:
+            return {}
+        try:
+            items = json.loads(answer[start:end + 1])
+        except ValueError:
+            return {}
+
+        parsed = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            index = item.get('index')
+            importance = item.get('importance_level')
+            if isinstance(index, int) and 0 <= index < len(emails) and importance in IMPORTANCE_LEVELS:
+                parsed[index] = importance
+        return parsed
+
+    def close(self):
+        """Close pooled connections to the LLM server."""
+        self.session.close()
+
+    def usage_stats(self):
+        """Return request, token and latency counters accumulated by this service."""
+        with self._usage_lock:
+            stats = dict(self.usage)
+            latencies = sorted(self._latencies)
+        stats['latency_ms'] = {
+            'p50': round(_percentile(latencies, 0.50) * 1000, 1),
+            'p95': round(_percentile(latencies, 0.95) * 1000, 1),
+            'max': round(latencies[-1] * 1000, 1) if latencies else 0.0,
+            'mean': round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0
+        }
+        return stats
 
 # Example usage
 if __name__ == "__main__":
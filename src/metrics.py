@@ -0,0 +1,219 @@
+"""Process-wide pipeline metrics, exposed in the Prometheus text format at /metrics.
+
+Counters and histograms are kept in memory by the process that does the
+work, so the web app reports the runs it started. The headless worker
+logs each run's stage timings instead.
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers a cached lookup up to a slow LLM call or a large Gmail batch
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+STAGES = ('list', 'fetch', 'extract', 'classify', 'summarize', 'deadlines', 'persist')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """A monotonically increasing value per label combination."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+
+
+class Histogram:
+    """Observations counted into cumulative buckets per label combination."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, count=1, **labels):
+        """Record value, count times (e.g. a batch's per-email share for every email)."""
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            series[index] += count
+            series[-1] += value * count
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def summary(self, **labels):
+        """Return (count, sum) of the observations with these labels."""
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            return (sum(series[:-1]), series[-1]) if series else (0, 0.0)
+
+    def samples(self):
+        with self._lock:
+            series_items = sorted((key, list(series)) for key, series in self._series.items())
+        for key, series in series_items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series[:-1]):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', _format_value(bound))])
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{labels} {_format_value(series[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Return every metric in the Prometheus text exposition format."""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+email_stage_seconds = REGISTRY.register(Histogram(
+    'inboxintel_email_stage_seconds',
+    'Time spent on one email in each pipeline stage (batched stages are split evenly)',
+    ['stage']))
+run_stage_seconds = REGISTRY.register(Histogram(
+    'inboxintel_run_stage_seconds', 'Total time one account sync spent in each pipeline stage',
+    ['stage']))
+run_seconds = REGISTRY.register(Histogram(
+    'inboxintel_run_seconds', 'Wall-clock time of one account sync', ['sync_mode']))
+runs_total = REGISTRY.register(Counter(
+    'inboxintel_runs_total', 'Account syncs by outcome', ['status']))
+emails_total = REGISTRY.register(Counter(
+    'inboxintel_emails_total', 'Emails processed, by the tier that classified them',
+    ['classified_by']))
+errors_total = REGISTRY.register(Counter(
+    'inboxintel_errors_total', 'Failures by pipeline stage', ['stage']))
+llm_requests_total = REGISTRY.register(Counter(
+    'inboxintel_llm_requests_total', 'LLM chat completion requests by outcome', ['status']))
+llm_request_seconds = REGISTRY.register(Histogram(
+    'inboxintel_llm_request_seconds', 'LLM chat completion latency, including retries'))
+llm_tokens_total = REGISTRY.register(Counter(
+    'inboxintel_llm_tokens_total', 'LLM tokens used', ['kind']))
+llm_cache_hits_total = REGISTRY.register(Counter(
+    'inboxintel_llm_cache_hits_total', 'Classifications answered from the LLM cache'))
+gmail_quota_units_total = REGISTRY.register(Counter(
+    'inboxintel_gmail_quota_units_total', 'Gmail API quota units spent', ['method']))
+
+
+class StageTimer:
+    """Times pipeline stages, recording each one in the per-email histogram.
+
+    One StageTimer per account sync also adds up the run's time per stage;
+    finish() records those totals in the per-run histogram. Stages may be
+    timed from several threads at once.
+    """
+
+    def __init__(self):
+        self._totals = dict.fromkeys(STAGES, 0.0)
+        self._lock = threading.Lock()
+
+    def record(self, stage, seconds, emails=1):
+        if emails:
+            email_stage_seconds.observe(seconds / emails, count=emails, stage=stage)
+        with self._lock:
+            self._totals[stage] = self._totals.get(stage, 0.0) + seconds
+
+    @contextmanager
+    def stage(self, stage, emails=1):
+        """Time the block as work on emails emails in stage."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started, emails)
+
+    def timed_iter(self, stage, items):
+        """Yield from items, timing each step of the iteration as one email's worth of stage."""
+        iterator = iter(items)
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.record(stage, time.perf_counter() - started, emails=0)
+                return
+            self.record(stage, time.perf_counter() - started)
+            yield item
+
+    def totals(self):
+        with self._lock:
+            return {stage: round(seconds, 3) for stage, seconds in self._totals.items()}
+
+    def finish(self):
+        with self._lock:
+            totals = dict(self._totals)
+        for stage, seconds in totals.items():
+            run_stage_seconds.observe(seconds, stage=stage)
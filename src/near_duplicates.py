@@ -0,0 +1,186 @@
+import hashlib
+import re
+import sqlite3
+import threading
+from config.config import DEFAULT_ACCOUNT
+
+FINGERPRINT_BITS = 64
+SHINGLE_SIZE = 1
+MIN_SHINGLES = 8  # Shorter texts fingerprint too unreliably to match on
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS near_duplicates (
+    account TEXT NOT NULL DEFAULT 'default',
+    message_id TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    fingerprint INTEGER NOT NULL,
+    importance_level TEXT NOT NULL,
+    PRIMARY KEY (account, message_id)
+);
+"""
+
+_WORD = re.compile(r'[a-z]+|\d+')
+
+
+def _feature_hash(feature):
+    return int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def simhash(text):
+    """Return a 64-bit SimHash of text, or None if it is too short to fingerprint.
+
+    Numbers are replaced by a placeholder first, so variants that differ
+    only in order numbers, dates or amounts get the same fingerprint.
+    """
+    words = ['0' if word[0].isdigit() else word for word in _WORD.findall(text.lower())]
+    if len(words) < SHINGLE_SIZE + MIN_SHINGLES - 1:
+        return None
+    weights = {}
+    for i in range(len(words) - SHINGLE_SIZE + 1):
+        feature = _feature_hash(' '.join(words[i:i + SHINGLE_SIZE]))
+        weights[feature] = weights.get(feature, 0) + 1
+    total = sum(weights.values())
+    fingerprint = 0
+    for bit in range(FINGERPRINT_BITS):
+        mask = 1 << bit
+        if 2 * sum(weight for feature, weight in weights.items() if feature & mask) > total:
+            fingerprint |= mask
+    return fingerprint
+
+
+def _migrate(conn):
+    """Rebuild a table created by an older version up to the current schema.
+
+    Rows from before accounts existed are assigned to the default account,
+    and the summaries older versions stored are dropped.
+    """
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(near_duplicates)')]
+    if not columns or ('account' in columns and 'summary' not in columns):
+        return
+    account = 'account' if 'account' in columns else '?'
+    with conn:
+        conn.execute('ALTER TABLE near_duplicates RENAME TO near_duplicates_old')
+    conn.executescript(SCHEMA)
+    with conn:
+        conn.execute(
+            'INSERT INTO near_duplicates (account, message_id, sender, fingerprint, importance_level) '
+            f'SELECT {account}, message_id, sender, fingerprint, importance_level '
+            'FROM near_duplicates_old', () if account == 'account' else (DEFAULT_ACCOUNT,))
+        conn.execute('DROP TABLE near_duplicates_old')
+
+
+def _to_signed(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class NearDuplicateIndex:
+    """Finds earlier emails whose SimHash is within max_distance bits of a new one.
+
+    Fingerprints are split into max_distance + 1 bands and indexed by
+    account, sender and band value. Two fingerprints within max_distance bits must
+    agree exactly on at least one band, so a lookup only compares the few
+    entries from the same account and sender sharing a band instead of scanning the
+    whole index.
+    """
+
+    def __init__(self, db_path, max_distance=6):
+        self.db_path = db_path
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        width = FINGERPRINT_BITS // bands
+        self._bands = [(i * width, width if i < bands - 1 else FINGERPRINT_BITS - i * width)
+                       for i in range(bands)]
+        self._buckets = {}
+        self._entries = {}
+        self._pending = []
+        self._lock = threading.Lock()
+        self._load()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        _migrate(conn)
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _load(self):
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                'SELECT account, message_id, sender, fingerprint, importance_level '
+                'FROM near_duplicates')
+            for account, message_id, sender, fingerprint, importance_level in rows:
+                self._index((account, message_id), sender, fingerprint & ((1 << 64) - 1),
+                            importance_level)
+        finally:
+            conn.close()
+
+    def _band_keys(self, account, sender, fingerprint):
+        return [(account, sender, i, (fingerprint >> shift) & ((1 << width) - 1))
+                for i, (shift, width) in enumerate(self._bands)]
+
+    def _index(self, key, sender, fingerprint, importance_level):
+        self._entries[key] = (fingerprint, importance_level)
+        for band_key in self._band_keys(key[0], sender, fingerprint):
+            self._buckets.setdefault(band_key, []).append(key)
+
+    def lookup(self, sender, fingerprint, account=DEFAULT_ACCOUNT):
+        """Return the closest earlier email from sender in account as a dict, or None if none is close enough."""
+        if fingerprint is None or not sender:
+            return None
+        best = None
+        best_distance = self.max_distance + 1
+        with self._lock:
+            for band_key in self._band_keys(account, sender, fingerprint):
+                for key in self._buckets.get(band_key, ()):
+                    distance = bin(self._entries[key][0] ^ fingerprint).count('1')
+                    if distance < best_distance:
+                        best, best_distance = key, distance
+            if best is None:
+                return None
+            _, importance_level = self._entries[best]
+        return {'account': best[0], 'message_id': best[1], 'importance_level': importance_level,
+                'distance': best_distance}
+
+    def add(self, message_id, sender, fingerprint, importance_level, account=DEFAULT_ACCOUNT):
+        """Index an email's classification for later lookups.
+
+        Only the label is kept: fingerprints ignore numbers, so a match may
+        be about a different order, amount or date.
+        """
+        if fingerprint is None or not sender or not message_id or not importance_level:
+            return
+        with self._lock:
+            if (account, message_id) in self._entries:
+                return
+            self._index((account, message_id), sender, fingerprint, importance_level)
+            self._pending.append((account, message_id, sender, _to_signed(fingerprint),
+                                  importance_level))
+
+    def flush(self):
+        """Write entries added since the last flush to the database."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    'INSERT OR IGNORE INTO near_duplicates '
+                    '(account, message_id, sender, fingerprint, importance_level) '
+                    'VALUES (?, ?, ?, ?, ?)', pending)
+        finally:
+            conn.close()
+
+    def reload(self):
+        """Flush pending entries and re-read the table, picking up other processes' writes."""
+        self.flush()
+        with self._lock:
+            self._buckets = {}
+            self._entries = {}
+            self._load()
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries)}
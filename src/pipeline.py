@@ -0,0 +1,737 @@
+"""Sync-and-classify pipeline shared by the web app and the headless worker.
+
+Nothing here imports Flask, so the worker starts quickly and stays small.
+"""
+import time
+import json
+import os
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from datetime import datetime
+from src.accounts import AccountRegistry, list_accounts
+from src.lock_file import LockFile
+from src.llm_service import LLMService, create_session
+from src.rate_limit import FairShare
+from src.classification_cache import ClassificationCache
+from src.email_store import EmailStore, sqlite_path_from_url, SEARCH_BODY_MAX_CHARS
+from src.prompt_compaction import compact_email_body
+from src.summarizer import summarize
+from src.deadlines import email_deadlines
+from src.keyword_matcher import KeywordMatcher
+from src.pre_classifier import PreClassifier
+from src.tiered_classifier import TieredClassifier
+from src.sender_profiles import SenderProfileIndex
+from src.near_duplicates import NearDuplicateIndex, simhash
+from src import metrics
+from src.metrics import StageTimer
+from config.config import (MAX_EMAILS_TO_PROCESS, LLM_MAX_CONCURRENCY,
+                           GMAIL_BATCH_SIZE, GMAIL_LIST_PAGE_SIZE,
+                           LLM_BATCH_MAX_EMAILS, LLM_BODY_TOKEN_BUDGET, LLM_CACHE_FILE,
+                           LLM_CACHE_MAX_ENTRIES, DATABASE_URL, SENDER_DOMAIN_RULES,
+                           SENDER_PROFILE_MIN_SAMPLES, SENDER_PROFILE_CONFIDENCE,
+                           SENDER_PROFILE_REVERIFY_RATE, SENDER_PROFILE_WINDOW,
+                           NEAR_DUPLICATE_MAX_DISTANCE, DEFAULT_ACCOUNT, ACCOUNT_MAX_PARALLEL,
+                           SUMMARY_MAX_SENTENCES, SUMMARY_MAX_CHARS, GMAIL_FETCH_FORMAT,
+                           CATEGORIES, FETCH_RETRY_SYNCS, PERSIST_BATCH_SIZE, SYNC_LOCK_FILE,
+                           BASE_DIR)
+
+logger = logging.getLogger(__name__)
+
+gmail_accounts = AccountRegistry()
+classification_cache = ClassificationCache(LLM_CACHE_FILE, LLM_CACHE_MAX_ENTRIES)
+category_matcher = KeywordMatcher(CATEGORIES)
+pre_classifier = PreClassifier(SENDER_DOMAIN_RULES)
+sender_profiles = SenderProfileIndex(
+    sqlite_path_from_url(DATABASE_URL), SENDER_PROFILE_MIN_SAMPLES, SENDER_PROFILE_CONFIDENCE,
+    SENDER_PROFILE_REVERIFY_RATE, SENDER_PROFILE_WINDOW)
+near_duplicates = NearDuplicateIndex(sqlite_path_from_url(DATABASE_URL), NEAR_DUPLICATE_MAX_DISTANCE)
+
+MAX_GROUP_EMAILS = 32  # Emails handed to a worker at once when tiers settle most of them
+
+DATA_FILE = os.path.join(BASE_DIR, 'emails_data.json')  # Imported into the database once
+
+email_store = EmailStore(sqlite_path_from_url(DATABASE_URL))
+
+def import_legacy_emails():
+    """Move emails saved by older versions in emails_data.json into the database."""
+    if not os.path.exists(DATA_FILE) or not email_store.is_empty():
+        return
+    try:
+        with open(DATA_FILE, 'r') as f:
+            emails = json.load(f)
+        email_store.apply_changes(upserts=emails)
+        logger.info("Imported %d emails from %s", len(emails), DATA_FILE)
+    except Exception as e:
+        logger.error("Could not import %s: %s", DATA_FILE, e)
+
+def simple_categorize_email(subject, content):
+    found = category_matcher.categories(f"{subject} {content}")
+    return [category for category in CATEGORIES if category in found]
+
+def simple_summarize_email(content):
+    return summarize(content, SUMMARY_MAX_SENTENCES, SUMMARY_MAX_CHARS)
+
+def prepare_prompt_body(email_data):
+    """Return the compacted body used in classification prompts, computing it once per email."""
+    if 'prompt_body' not in email_data:
+        prompt_body, original_tokens, compacted_tokens = compact_email_body(
+            email_data.get('content', ''), LLM_BODY_TOKEN_BUDGET)
+        email_data['prompt_body'] = prompt_body
+        email_data['prompt_tokens_saved'] = original_tokens - compacted_tokens
+    return email_data['prompt_body']
+
+def email_fingerprint(email_data):
+    """Return the SimHash of the email's subject and compacted body, computing it once per email."""
+    if 'fingerprint' not in email_data:
+        email_data['fingerprint'] = simhash(
+            f"{email_data.get('subject', '')}\n{prepare_prompt_body(email_data)}")
+    return email_data['fingerprint']
+
+def find_near_duplicate(email_data):
+    """Classification tier: reuse the label of a nearly identical earlier email from the same sender.
+
+    Only the label is reused. The email is still summarized from its own
+    body, since near-duplicates often differ in order numbers or dates.
+    """
+    match = near_duplicates.lookup(SenderProfileIndex.sender_key(email_data),
+                                   email_fingerprint(email_data),
+                                   email_data.get('account', DEFAULT_ACCOUNT))
+    if not match:
+        return None
+    email_data['duplicate_of'] = match['message_id']
+    return match['importance_level']
+
+def remember_near_duplicate(email_data, record):
+    """Index an email the LLM labelled, so later near-duplicates can reuse its result."""
+    if record.get('classified_by') != 'llm' or not record.get('importance_level'):
+        return  # A failed or borrowed label must not spread to other emails
+    near_duplicates.add(email_data.get('id'), SenderProfileIndex.sender_key(email_data),
+                        email_fingerprint(email_data), record.get('importance_level'),
+                        email_data.get('account', DEFAULT_ACCOUNT))
+
+def process_email_with_llm(email_data, llm_service, importance_level=None, classified_by='llm',
+                           timer=None):
+    """Process a single email with LLM-powered analysis.
+
+    Pass importance_level when the email was already classified, either in
+    an LLM batch or by a cheaper tier named by classified_by. When the LLM
+    gives no usable answer the email is kept without an importance level and
+    classified_by is 'unclassified'.
+    """
+    if not email_data:
+        return None
+    timer = timer or StageTimer()
+
+    subject = email_data.get('subject', '')
+    content = email_data.get('content', '')
+    sender = email_data.get('from', '')
+    from_name = email_data.get('from_name', '')
+    from_email = email_data.get('from_email', '')
+
+    logger.debug("Processing email with LLM: %s", subject[:50])
+
+    if importance_level is None and classified_by == 'llm':
+        with timer.stage('classify'):
+            importance_level = llm_service.classify_email_importance(
+                subject, prepare_prompt_body(email_data), message_id=email_data.get('id'),
+                account=email_data.get('account', DEFAULT_ACCOUNT))
+    if importance_level is None:
+        classified_by = 'unclassified'
+    with timer.stage('summarize'):
+        summary = simple_summarize_email(content)
+    with timer.stage('deadlines'):
+        deadlines = email_deadlines(email_data)
+    important_links = []
+    attachments_mentioned = []
+
+    logger.debug("LLM Analysis - Importance: %s, summary: %s", importance_level, summary[:100])
+
+    return {
+        'id': email_data.get('id'),
+        'subject': subject,
+        'from': sender,
+        'from_name': from_name,
+        'from_email': from_email,
+        'importance_level': importance_level,
+        'deadlines': deadlines,
+        'summary': summary,
+        'important_links': important_links,
+        'attachments_mentioned': attachments_mentioned,
+        'is_important': importance_level == 'Very Important',
+        'has_deadline': bool(deadlines),
+        'classified_by': classified_by,
+        'duplicate_of': email_data.get('duplicate_of'),
+        'body_fetched': email_data.get('body_fetched', True),
+        'received_time': email_data.get('received_time', ''),
+        'prompt_tokens_saved': email_data.get('prompt_tokens_saved', 0),
+        'processed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+def process_email_simple(email_data, timer=None):
+    if not email_data:
+        return None
+    timer = timer or StageTimer()
+    subject = email_data.get('subject', '')
+    content = email_data.get('content', '')
+    sender = email_data.get('from', '')
+    from_name = email_data.get('from_name', '')
+    from_email = email_data.get('from_email', '')
+    with timer.stage('classify'):
+        categories = simple_categorize_email(subject, content)
+    with timer.stage('summarize'):
+        summary = simple_summarize_email(content)
+    with timer.stage('deadlines'):
+        deadlines = email_deadlines(email_data)
+    return {
+        'id': email_data.get('id'),
+        'subject': subject,
+        'from': sender,
+        'from_name': from_name,
+        'from_email': from_email,
+        'categories': categories,
+        'deadlines': deadlines,
+        'summary': summary,
+        'is_important': 'IMPORTANT' in categories,
+        'has_deadline': bool(deadlines),
+        'body_fetched': email_data.get('body_fetched', True),
+        'received_time': email_data.get('received_time', ''),
+        'processed_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    }
+
+def stream_emails_data(gmail_client, msg_ids, timer=None, msg_format='full',
+                       account=DEFAULT_ACCOUNT):
+    """Yield extracted email data for a stream of message IDs of account.
+
+    IDs are fetched in Gmail batches as soon as a batch fills up, so a
+    mailbox listing can still be paging while earlier emails are processed
+    and only one batch of messages is held in memory at a time. With
+    msg_format='metadata' each email's content is its snippet until
+    fetch_bodies() replaces it.
+    """
+    timer = timer or StageTimer()
+
+    def fetch(batch_ids):
+        logger.debug("Fetching %d messages in a batch", len(batch_ids))
+        with timer.stage('fetch', emails=len(batch_ids)):
+            messages = gmail_client.get_messages_batch(batch_ids, msg_format)
+        for message in messages:
+            if not message:
+                metrics.errors_total.inc(stage='fetch')
+                continue
+            logger.debug("Processing message ID: %s", message['id'])
+            with timer.stage('extract'):
+                email_data = gmail_client.get_message_content(message)
+            if email_data:
+                email_data['body_fetched'] = msg_format == 'full'
+                email_data['account'] = account
+                yield email_data
+            else:
+                metrics.errors_total.inc(stage='extract')
+
+    batch_ids = []
+    for msg_id in msg_ids:
+        batch_ids.append(msg_id)
+        if len(batch_ids) >= GMAIL_BATCH_SIZE:
+            yield from fetch(batch_ids)
+            batch_ids = []
+    if batch_ids:
+        yield from fetch(batch_ids)
+
+def fetch_bodies(gmail_client, emails, timer=None, bodies=None):
+    """Replace the snippets of emails fetched as metadata with their full bodies, in one batch.
+
+    Emails whose message can't be fetched keep their snippet. bodies
+    optionally collects the fetched bodies by ID for the search index.
+    """
+    emails = [email_data for email_data in emails if not email_data.get('body_fetched', True)]
+    if not emails:
+        return
+    timer = timer or StageTimer()
+    with timer.stage('fetch', emails=len(emails)):
+        messages = gmail_client.get_messages_batch([email_data['id'] for email_data in emails])
+    for email_data, message in zip(emails, messages):
+        if not message:
+            metrics.errors_total.inc(stage='fetch')
+            continue
+        with timer.stage('extract'):
+            full_data = gmail_client.get_message_content(message)
+        if not full_data:
+            metrics.errors_total.inc(stage='extract')
+            continue
+        email_data['content'] = full_data['content']
+        email_data['body_fetched'] = True
+        # Drop anything computed from the snippet
+        email_data.pop('prompt_body', None)
+        email_data.pop('fingerprint', None)
+        if bodies is not None:
+            bodies[email_data['id']] = full_data['content'][:SEARCH_BODY_MAX_CHARS]
+
+def process_email_safely(email_data, llm_service, use_llm, importance_level=None, classified_by='llm',
+                         timer=None):
+    """Process one email, isolating failures so a bad message doesn't abort the run."""
+    try:
+        if use_llm:
+            return process_email_with_llm(email_data, llm_service, importance_level, classified_by,
+                                          timer)
+        return process_email_simple(email_data, timer)
+    except Exception as e:
+        logger.error("Failed to process email %s: %s", email_data.get('id'), e)
+        metrics.errors_total.inc(stage='process')
+        return None
+
+def run_tier(classify, email_data, timer):
+    """Run a TieredClassifier method on one email, returning (None, None) if it fails."""
+    try:
+        with timer.stage('classify'):
+            return classify(email_data)
+    except Exception as e:
+        logger.error("Pre-classification failed for %s: %s", email_data.get('id'), e)
+        metrics.errors_total.inc(stage='classify')
+        return None, None
+
+def process_batch_safely(batch, llm_service, use_llm, classifier=None, timer=None,
+                         load_bodies=None, decided=None):
+    """Process a batch of emails.
+
+    Emails are first offered to the cheap tiers of classifier; the rest are
+    classified with one shared LLM prompt when possible. decided optionally
+    holds the (importance_level, tier) the first tiers already gave each
+    email, as process_emails_concurrently() does, so they aren't run again.
+    For emails fetched as metadata, load_bodies (see fetch_bodies()) is
+    called with those the header-only tiers couldn't decide, before the
+    other tiers and the LLM see them.
+    """
+    timer = timer or StageTimer()
+    importance_levels = [None] * len(batch)
+    classified_by = ['llm'] * len(batch)
+
+    def run_tiers(indexes, classify):
+        for index in indexes:
+            set_tier(index, *run_tier(classify, batch[index], timer))
+
+    def set_tier(index, level, tier):
+        if tier:
+            importance_levels[index], classified_by[index] = level, tier
+
+    if decided is not None:
+        for index, (level, tier) in enumerate(decided):
+            set_tier(index, level, tier)
+    elif use_llm and classifier:
+        run_tiers(range(len(batch)),
+                  classifier.classify_headers if load_bodies else classifier.classify)
+    if use_llm and load_bodies:
+        undecided = [index for index, level in enumerate(importance_levels) if level is None]
+        try:
+            load_bodies([batch[index] for index in undecided])
+        except Exception as e:
+            logger.error("Fetching message bodies failed: %s", e)
+            metrics.errors_total.inc(stage='fetch')
+        if classifier:
+            run_tiers(undecided, classifier.classify_body)
+
+    pending = [index for index, level in enumerate(importance_levels) if level is None]
+    if use_llm and classifier:
+        classifier.defer(len(pending))
+    if use_llm and len(pending) > 1:
+        try:
+            with timer.stage('classify', emails=len(pending)):
+                levels = llm_service.classify_batch([
+                    {'id': batch[i].get('id'), 'account': batch[i].get('account', DEFAULT_ACCOUNT),
+                     'subject': batch[i].get('subject', ''),
+                     'body': prepare_prompt_body(batch[i])}
+                    for i in pending
+                ])
+            for index, level in zip(pending, levels):
+                importance_levels[index] = level
+                if level is None:
+                    classified_by[index] = 'unclassified'  # Already retried on its own
+        except Exception as e:
+            logger.error("Batch classification failed, classifying individually: %s", e)
+            metrics.errors_total.inc(stage='classify')
+    records = [process_email_safely(email_data, llm_service, use_llm, level, tier, timer)
+               for email_data, level, tier in zip(batch, importance_levels, classified_by)]
+    if use_llm and classifier:
+        # Only real LLM answers teach the tiers; failures would read as Unimportant
+        for index in pending:
+            if records[index] and records[index]['classified_by'] == 'llm':
+                classifier.observe(batch[index], records[index])
+    return records
+
+def process_emails_concurrently(emails, llm_service, use_llm, max_in_flight=LLM_MAX_CONCURRENCY,
+                                batch_size=1, classifier=None, timer=None, load_bodies=None):
+    """Yield processed emails in input order with at most max_in_flight LLM requests running.
+
+    When a TieredClassifier is given, its tiers get the first chance at
+    each email as it arrives, and only the emails they leave undecided
+    count towards a batch: with batch_size > 1, each group of batch_size
+    undecided emails is classified through LLMService.classify_batch, and
+    the emails the tiers settled ride along with it. load_bodies is passed
+    on to process_batch_safely. A failed email yields None instead of
+    raising.
+    """
+    max_in_flight = max(1, max_in_flight)
+    batch_size = max(1, batch_size)
+    timer = timer or StageTimer()
+    pending = deque()
+    first_tiers = None
+    if use_llm and classifier:
+        first_tiers = classifier.classify_headers if load_bodies else classifier.classify
+
+    def batches():
+        batch, decided, undecided = [], [], 0
+        for email_data in emails:
+            result = run_tier(first_tiers, email_data, timer) if first_tiers else (None, None)
+            batch.append(email_data)
+            decided.append(result)
+            undecided += result[1] is None
+            # Settled emails don't wait long for a full batch of undecided ones
+            if undecided >= batch_size or len(batch) >= max(batch_size, MAX_GROUP_EMAILS):
+                yield batch, decided
+                batch, decided, undecided = [], [], 0
+        if batch:
+            yield batch, decided
+
+    with ThreadPoolExecutor(max_workers=max_in_flight) as executor:
+        for batch, decided in batches():
+            pending.append(executor.submit(
+                process_batch_safely, batch, llm_service, use_llm, classifier, timer, load_bodies,
+                decided if first_tiers else None))
+            # Allow one extra window of queued work so a slow head-of-line batch
+            # doesn't leave workers idle, but never buffer the whole run.
+            if len(pending) >= max_in_flight * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def counted(items, job, counter):
+    """Pass items through unchanged, counting them on job as they go by."""
+    for item in items:
+        job.increment(counter)
+        yield item
+
+def requested(msg_ids, seen):
+    """Pass message IDs through unchanged, appending each to seen."""
+    for msg_id in msg_ids:
+        seen.append(msg_id)
+        yield msg_id
+
+def listed_ids(messages, listing):
+    """Yield the IDs of a message listing, setting listing['complete'] to False if it breaks off.
+
+    The emails listed before the error are still processed, but the run
+    must not treat them as the whole mailbox.
+    """
+    try:
+        for message in messages:
+            yield message['id']
+    except Exception:
+        listing['complete'] = False
+
+def collect_bodies(emails_data, bodies):
+    """Pass emails through unchanged, keeping their bodies by ID for the search index.
+
+    Emails fetched as metadata only have a snippet; fetch_bodies() adds
+    their bodies if it fetches them.
+    """
+    for email_data in emails_data:
+        body = email_data.get('content')
+        if body and email_data.get('body_fetched', True):
+            bodies[email_data['id']] = body[:SEARCH_BODY_MAX_CHARS]
+        yield email_data
+
+def load_email_body(email):
+    """Return the body of a stored email, fetching it from Gmail and storing it on first use.
+
+    Emails processed from metadata only have their snippet until then. A
+    body already in the search index is returned without asking Gmail, and
+    an email whose fetch fails keeps what is stored and isn't fetched
+    again. This runs inside web requests, so an account without a usable
+    token fails instead of starting the OAuth consent flow.
+    """
+    account = email.get('account') or DEFAULT_ACCOUNT
+    stored = email_store.get_body(email['id'], account)
+    if email.get('body_fetched') or stored:
+        return stored
+    try:
+        gmail_client = gmail_accounts.get_client(account, interactive=False)
+        message = gmail_client.get_message(email['id'])
+        email_data = gmail_client.get_message_content(message) if message else None
+    except Exception as e:
+        logger.error("[%s] Could not fetch the body of %s: %s", account, email['id'], e)
+        email_data = None
+    email['body_fetched'] = True
+    if not email_data:
+        email_store.mark_body_fetched(email['id'], account)
+        return stored
+    email_store.save_body(email['id'], email_data['content'], account)
+    return email_data['content'][:SEARCH_BODY_MAX_CHARS]
+
+def history_state_key(account):
+    # The default account keeps the key used before accounts existed
+    return 'history_id' if account == DEFAULT_ACCOUNT else f'history_id:{account}'
+
+def retry_state_key(account):
+    return f'fetch_retries:{account}'
+
+def next_retries(retries, requested_ids, done_ids, keep_others, account):
+    """Return the {message ID: failed syncs} to retry next time, dropping IDs out of attempts.
+
+    Requested IDs not in done_ids failed this time. keep_others keeps the
+    earlier retries this run didn't ask for.
+    """
+    requested_ids = set(requested_ids)
+    pending = {msg_id: count for msg_id, count in retries.items()
+               if keep_others and msg_id not in requested_ids}
+    for msg_id in requested_ids - done_ids:
+        count = retries.get(msg_id, 0) + 1
+        if count < FETCH_RETRY_SYNCS:
+            pending[msg_id] = count
+        else:
+            logger.warning("[%s] Giving up on message %s after %d syncs", account, msg_id, count)
+    return pending
+
+def sync_account(job, account, llm_service, concurrency, batch_size, force_full_sync=False):
+    """Sync one account's mailbox and classify its new mail, reporting progress on job."""
+    use_llm = llm_service.api_key is not None
+    tiers = [('rules', pre_classifier.classify), ('sender_profile', sender_profiles.predict),
+             ('near_duplicate', find_near_duplicate)]
+    body_tiers = ['near_duplicate']
+    if GMAIL_FETCH_FORMAT == 'metadata':
+        # Tiers that only read headers go first, so fewer bodies need fetching. The keyword
+        # rules wait for the body: an escalation keyword past the snippet must still count.
+        tiers = [('domain_rules', pre_classifier.classify_domain),
+                 ('sender_profile', sender_profiles.predict), ('rules', pre_classifier.classify),
+                 ('near_duplicate', find_near_duplicate)]
+        body_tiers = ['rules', 'near_duplicate']
+    classifier = TieredClassifier(tiers, observers=[sender_profiles.observe, remember_near_duplicate],
+                                  body_tiers=body_tiers)
+    gmail_client = gmail_accounts.get_client(account)
+    timer = StageTimer()
+    bodies = {}
+    load_bodies = None
+    if GMAIL_FETCH_FORMAT == 'metadata':
+        load_bodies = partial(fetch_bodies, gmail_client, timer=timer, bodies=bodies)
+    run_started = time.perf_counter()
+
+    listing = {'complete': True}
+    requested_ids = []
+    # Emails whose fetch failed in earlier syncs; the history ID moved past them
+    retries = json.loads(email_store.get_state(retry_state_key(account)) or '{}')
+    changes = None
+    last_history_id = email_store.get_state(history_state_key(account))
+    if last_history_id and not force_full_sync:
+        logger.info("[%s] Fetching changes since history ID %s", account, last_history_id)
+        with timer.stage('list', emails=0):
+            changes = gmail_client.get_history_changes(last_history_id)
+    if changes is not None:
+        sync_mode = 'incremental'
+        added_ids, removed_ids, history_id = changes
+        logger.info("[%s] %d added, %d removed, %d to retry", account, len(added_ids),
+                    len(removed_ids), len(retries))
+        removed = set(removed_ids)
+        added_ids = list(dict.fromkeys(
+            added_ids + [msg_id for msg_id in retries if msg_id not in removed]))
+        job.add_total(len(added_ids))
+        emails_data = stream_emails_data(gmail_client, requested(added_ids, requested_ids), timer,
+                                         GMAIL_FETCH_FORMAT, account)
+    else:
+        sync_mode = 'full'
+        removed_ids = []
+        # Record the history ID before listing so that mail arriving
+        # mid-run is picked up by the next incremental sync.
+        with timer.stage('list', emails=0):
+            history_id = gmail_client.get_history_id()
+            unread = gmail_client.count_unread_inbox()
+        if unread is not None and MAX_EMAILS_TO_PROCESS is not None:
+            unread = min(unread, MAX_EMAILS_TO_PROCESS)
+        job.add_total(unread)
+        logger.info("[%s] Streaming unread messages", account)
+        msg_ids = listed_ids(timer.timed_iter('list', gmail_client.iter_messages(
+            'is:unread in:inbox', page_size=GMAIL_LIST_PAGE_SIZE, limit=MAX_EMAILS_TO_PROCESS)),
+            listing)
+        emails_data = stream_emails_data(gmail_client, requested(msg_ids, requested_ids), timer,
+                                         GMAIL_FETCH_FORMAT, account)
+
+    logger.info("[%s] Processing emails with concurrency %d, batch size %d",
+                account, concurrency, batch_size)
+    started = time.perf_counter()
+    total = 0
+    prompt_tokens_saved = 0
+    stored_ids = set()
+    unclassified_ids = set()  # Stored, but the LLM gave no answer
+    unsaved = []
+
+    def persist(deletes=()):
+        # Emails are saved as they come so memory stays flat however large the mailbox is
+        with timer.stage('persist', emails=len(unsaved)):
+            email_store.apply_changes(
+                upserts=unsaved, deletes=deletes, account=account,
+                bodies={e['id']: bodies.pop(e['id']) for e in unsaved if e['id'] in bodies})
+        unsaved.clear()
+
+    for processed_data in process_emails_concurrently(
+            collect_bodies(counted(emails_data, job, 'fetched'), bodies), llm_service, use_llm,
+            max_in_flight=concurrency, batch_size=batch_size, classifier=classifier, timer=timer,
+            load_bodies=load_bodies):
+        total += 1
+        if processed_data:
+            processed_data['account'] = account
+            stored_ids.add(processed_data['id'])
+            if processed_data.get('classified_by') == 'unclassified':
+                unclassified_ids.add(processed_data['id'])
+            prompt_tokens_saved += processed_data.get('prompt_tokens_saved', 0)
+            unsaved.append(processed_data)
+            metrics.emails_total.inc(classified_by=processed_data.get('classified_by', 'simple'))
+            job.add_email(processed_data)
+            job.increment('classified')
+            if len(unsaved) >= PERSIST_BATCH_SIZE:
+                persist()
+        else:
+            job.increment('failed')
+    elapsed = time.perf_counter() - started
+    stats = {
+        'emails': total,
+        'processed': len(stored_ids),
+        'failed': total - len(stored_ids),
+        'concurrency': concurrency,
+        'batch_size': batch_size,
+        'elapsed_seconds': round(elapsed, 3),
+        'emails_per_sec': round(total / elapsed, 2) if elapsed > 0 else 0.0,
+        'prompt_tokens_saved': prompt_tokens_saved,
+        'llm': llm_service.usage_stats(),
+        'gmail': gmail_accounts.quota_stats(account)
+    }
+    if use_llm:
+        stats['tiers'] = classifier.stats(cache_hits=stats['llm']['cache_hits'])
+    llm_tokens = stats['llm']['prompt_tokens'] + stats['llm']['completion_tokens']
+    stats['llm']['tokens_per_sec'] = round(llm_tokens / elapsed, 1) if elapsed > 0 else 0.0
+    logger.info("[%s] Throughput: %s emails/sec (%d emails in %ss)",
+                account, stats['emails_per_sec'], stats['emails'], stats['elapsed_seconds'])
+    persist(deletes=removed_ids)
+    with timer.stage('persist', emails=0):
+        if sync_mode == 'full' and listing['complete']:
+            # Whatever the listing didn't include is no longer unread in the inbox. An
+            # incomplete listing says nothing about the emails it didn't reach.
+            email_store.delete_missing(requested_ids, account=account)
+        # Emails that couldn't be fetched, processed or classified are retried by the
+        # next sync; incremental syncs would otherwise never see them again
+        retries = next_retries(retries, requested_ids, stored_ids - unclassified_ids,
+                               not listing['complete'], account)
+        email_store.set_state(retry_state_key(account), json.dumps(retries))
+        if history_id and listing['complete']:
+            email_store.set_state(history_state_key(account), history_id)
+        elif not listing['complete']:
+            logger.warning("[%s] Mailbox listing was incomplete; keeping the last history ID",
+                           account)
+    timer.finish()
+    metrics.run_seconds.observe(time.perf_counter() - run_started, sync_mode=sync_mode)
+    stats['stages'] = timer.totals()
+    logger.info("[%s] Seconds per stage: %s", account,
+                ', '.join(f"{stage} {seconds}" for stage, seconds in stats['stages'].items()))
+    return {
+        'sync_mode': sync_mode,
+        'complete': listing['complete'],
+        'processed': len(stored_ids),
+        'retry': len(retries),
+        'removed': len(removed_ids),
+        'stats': stats
+    }
+
+def run_processing(job, options):
+    """Sync every account's mailbox in parallel and classify new mail, reporting progress on job.
+
+    options may name the accounts to sync; by default all configured
+    accounts are. The accounts share one LLM connection pool, and its
+    LLM_MAX_CONCURRENCY request slots are split fairly between them.
+
+    The web app and the worker each take SYNC_LOCK_FILE for the run, so
+    they never sync the same mailboxes at once; a run that finds it taken
+    fails straight away. Once it holds the lock, a run re-reads the LLM
+    cache and the sender and near-duplicate indexes the other may have
+    written to.
+    """
+    lock = LockFile(SYNC_LOCK_FILE)
+    if not lock.acquire():
+        raise RuntimeError("Another sync is already running (the web app or the worker)")
+    try:
+        # The other process may have classified mail since this one last looked
+        classification_cache.load()
+        sender_profiles.reload()
+        near_duplicates.reload()
+        return _run_processing(job, options)
+    finally:
+        lock.release()
+
+def _run_processing(job, options):
+    # More emails in flight than the shared pool has LLM slots would only queue up threads
+    concurrency = min(max(int(options.get('concurrency', LLM_MAX_CONCURRENCY)), 1),
+                      LLM_MAX_CONCURRENCY)
+    batch_size = int(options.get('batch_size', LLM_BATCH_MAX_EMAILS))
+    force_full_sync = bool(options.get('full_sync', False))
+    configured = list_accounts()
+    accounts = options.get('accounts') or configured
+    unknown = [account for account in accounts if account not in configured]
+    if unknown:
+        raise ValueError(f"Unknown accounts: {', '.join(unknown)}")
+
+    logger.debug("Initializing LLM service")
+    session = create_session(pool_size=LLM_MAX_CONCURRENCY)
+    llm_slots = FairShare(LLM_MAX_CONCURRENCY)
+    llm_services = {
+        account: LLMService(cache=classification_cache, session=session,
+                            slot=partial(llm_slots.slot, account))
+        for account in accounts
+    }
+    use_llm = all(service.api_key is not None for service in llm_services.values())
+    if use_llm:
+        logger.info("Using LLM-powered processing")
+    else:
+        logger.info("API key not found, using simple processing")
+
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=min(len(accounts), ACCOUNT_MAX_PARALLEL)) as executor:
+            futures = {
+                account: executor.submit(sync_account, job, account, llm_services[account],
+                                         concurrency, batch_size, force_full_sync)
+                for account in accounts
+            }
+            for account, future in futures.items():
+                try:
+                    results[account] = future.result()
+                    metrics.runs_total.inc(status='completed')
+                except Exception as e:
+                    logger.exception("[%s] Processing failed: %s", account, e)
+                    metrics.runs_total.inc(status='failed')
+                    results[account] = {'error': str(e)}
+    finally:
+        session.close()
+        classification_cache.save()
+        sender_profiles.flush()
+        near_duplicates.flush()
+
+    failed = [account for account, result in results.items() if 'error' in result]
+    if len(failed) == len(accounts):
+        raise RuntimeError(results[failed[0]]['error'])
+
+    processing_method = "LLM-powered" if use_llm else "Simple"
+    processed = sum(result.get('processed', 0) for result in results.values())
+    removed = sum(result.get('removed', 0) for result in results.values())
+    message = f'Processed {processed} emails'
+    if removed:
+        message += f' and removed {removed}'
+    if len(accounts) > 1:
+        message += f' across {len(accounts) - len(failed)} accounts'
+    message += f' using {processing_method} analysis'
+    if failed:
+        message += f" ({', '.join(failed)} failed)"
+    return {
+        'message': message,
+        'method': processing_method,
+        'accounts': results,
+        'cache': classification_cache.stats(),
+        'sender_profiles': sender_profiles.stats(),
+        'near_duplicates': near_duplicates.stats()
+    }
@@ -0,0 +1,85 @@
+import re
+from src.keyword_matcher import KeywordMatcher
+
+# Gmail's own category tabs; mail filed here is rarely something we must act on.
+BULK_LABELS = {'CATEGORY_PROMOTIONS', 'CATEGORY_SOCIAL', 'CATEGORY_FORUMS'}
+BULK_PRECEDENCE = {'bulk', 'list', 'junk'}
+AUTOMATED_SENDER = re.compile(
+    r'^(?:no-?reply|do-?not-?reply|newsletters?|news|marketing|promo(?:tions)?|deals|offers'
+    r'|notifications?|updates|digest|info|hello)\b', re.IGNORECASE)
+
+# Phrases that can make even bulk mail important; their presence sends the
+# email on to the LLM instead of deciding it here.
+ESCALATION_KEYWORDS = [
+    'urgent', 'asap', 'immediately', 'action required', 'overdue', 'past due', 'final notice',
+    'deadline', 'due date', 'expires', 'expiring', 'suspended', 'security alert',
+    'unusual sign-in', 'verify your', 'password', 'invoice', 'payment', 'legal', 'court',
+    'offer letter', 'interview', 'accepted', 'admission', 'scholarship', 'appointment',
+    'emergency', 'hospital'
+]
+PROMOTIONAL_KEYWORDS = [
+    'sale', 'discount', 'deal', 'deals', 'coupon', 'promo code', 'free shipping', 'newsletter',
+    'webinar', 'limited time', 'shop now', 'new arrivals', 'recommended for you', 'digest',
+    'weekly roundup', 'trending', 'followers', 'liked your', 'new connection'
+]
+
+
+class PreClassifier:
+    """Cheap first-stage classifier for mail that obviously doesn't need the LLM.
+
+    Uses configured sender-domain rules, Gmail category labels, bulk-mail
+    headers (List-Unsubscribe, Precedence, Auto-Submitted) and keywords.
+    Returns an importance level only for high-confidence cases and None for
+    anything ambiguous.
+    """
+
+    def __init__(self, domain_rules=None):
+        self.domain_rules = {domain.lower(): level for domain, level in (domain_rules or {}).items()}
+        self.matcher = KeywordMatcher({
+            'escalate': ESCALATION_KEYWORDS,
+            'promotional': PROMOTIONAL_KEYWORDS
+        })
+
+    def _domain_rule(self, from_email):
+        domain = from_email.rpartition('@')[2].lower()
+        # Match the domain itself or any parent domain (mail.example.com -> example.com).
+        while domain:
+            if domain in self.domain_rules:
+                return self.domain_rules[domain]
+            domain = domain.partition('.')[2]
+        return None
+
+    def classify_domain(self, email_data):
+        """Return the importance level of a configured sender-domain rule, or None.
+
+        Unlike classify(), this reads only the From header, so it suits
+        emails whose body hasn't been fetched yet.
+        """
+        return self._domain_rule(email_data.get('from_email', '') or '')
+
+    def classify(self, email_data):
+        """Return an importance level for obvious cases, or None to defer to the LLM."""
+        from_email = email_data.get('from_email', '') or ''
+        level = self._domain_rule(from_email)
+        if level:
+            return level
+
+        text = f"{email_data.get('subject', '')}\n{email_data.get('content') or email_data.get('snippet', '')}"
+        categories = self.matcher.categories(text)
+        if 'escalate' in categories:
+            return None
+
+        labels = set(email_data.get('label_ids') or [])
+        precedence = (email_data.get('precedence') or '').strip().lower()
+        auto_submitted = (email_data.get('auto_submitted') or '').strip().lower()
+        is_bulk = (
+            bool(labels & BULK_LABELS)
+            or bool(email_data.get('list_unsubscribe'))
+            or precedence in BULK_PRECEDENCE
+            or (auto_submitted not in ('', 'no'))
+        )
+        automated_sender = bool(AUTOMATED_SENDER.match(from_email.partition('@')[0]))
+
+        if is_bulk and (automated_sender or 'promotional' in categories or labels & BULK_LABELS):
+            return 'Unimportant'
+        return None
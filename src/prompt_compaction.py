@@ -0,0 +1,87 @@
+import re
+from urllib.parse import urlsplit
+from src.llm_service import estimate_tokens
+
+# Headers that introduce quoted history in replies and forwards; everything
+# from the first match onwards is dropped.
+_REPLY_HEADER = re.compile(
+    r'^(?:On\b.{0,200}\bwrote:\s*$'
+    r'|-{2,}\s*Original Message\s*-{2,}'
+    r'|-{2,}\s*Forwarded message\s*-{2,}'
+    r'|_{10,}\s*$'
+    r'|From:.*\n(?:.*\n)?(?:Sent|Date):)',
+    re.MULTILINE | re.IGNORECASE)
+_QUOTED_LINE = re.compile(r'^[ \t]*>.*\n?', re.MULTILINE)
+_SIGNATURE = re.compile(r'^(?:-- ?|Sent from my \w+.*)$', re.MULTILINE)
+# Phrases that mark a short line as footer boilerplate.
+_BOILERPLATE_CUE = re.compile(
+    r'unsubscribe|manage (?:your )?(?:email )?preferences|view (?:it |this email )?in (?:your |a )?browser'
+    r'|you are receiving this|you received this (?:email|message)|this (?:email|message) was sent'
+    r'|privacy policy|all rights reserved|confidential(?:ity)? notice'
+    r'|intended (?:solely )?for the (?:use of the )?(?:named )?recipient'
+    r'|do not reply to this email|sent automatically',
+    re.IGNORECASE)
+# Every cue contains one of these; checking them first skips the regex for most lines.
+_BOILERPLATE_KEYWORDS = ('unsubscribe', 'preferences', 'browser', 'receiv', 'sent', 'privacy',
+                         'rights', 'confidential', 'intended', 'reply')
+BOILERPLATE_MAX_LINE = 300
+_URL = re.compile(r'https?://[^\s<>")\]]+', re.IGNORECASE)
+_BLANK_LINES = re.compile(r'\n\s*\n+')
+
+TRUNCATION_MARKER = '\n[...]\n'
+
+
+def _shorten_url(match):
+    try:
+        host = urlsplit(match.group(0)).hostname
+    except ValueError:
+        host = None
+    return f'[link:{host or "link"}]'
+
+
+def is_boilerplate(line):
+    """Return True for a short line that reads like footer boilerplate."""
+    if len(line) > BOILERPLATE_MAX_LINE:
+        return False
+    lowered = line.lower()
+    return (any(keyword in lowered for keyword in _BOILERPLATE_KEYWORDS)
+            and bool(_BOILERPLATE_CUE.search(line)))
+
+
+def strip_boilerplate(text):
+    """Remove quoted reply history, the signature and footer boilerplate lines from text."""
+    reply = _REPLY_HEADER.search(text)
+    if reply and reply.start() > 0:
+        text = text[:reply.start()]
+    text = _QUOTED_LINE.sub('', text)
+    signature = _SIGNATURE.search(text)
+    if signature and signature.start() > 0:
+        text = text[:signature.start()]
+    return '\n'.join(line for line in text.split('\n') if not is_boilerplate(line))
+
+
+def compact_email_body(text, token_budget, head_fraction=0.7):
+    """Shrink an email body for the classification prompt.
+
+    Strips quoted reply history, signatures and footer boilerplate,
+    collapses URLs to their host name and, if the result is still over
+    token_budget, keeps the head and tail of the text.
+
+    Returns (compacted_text, original_tokens, compacted_tokens).
+    """
+    text = text or ''
+    original_tokens = estimate_tokens(text)
+
+    compacted = _URL.sub(_shorten_url, strip_boilerplate(text))
+    compacted = _BLANK_LINES.sub('\n\n', compacted).strip()
+    if not compacted:
+        # Everything looked like boilerplate; the original is better than nothing.
+        compacted = text.strip()
+
+    max_chars = token_budget * 4
+    if len(compacted) > max_chars:
+        head = int(max_chars * head_fraction)
+        tail = max_chars - head - len(TRUNCATION_MARKER)
+        compacted = compacted[:head] + TRUNCATION_MARKER + (compacted[-tail:] if tail > 0 else '')
+
+    return compacted, original_tokens, estimate_tokens(compacted)
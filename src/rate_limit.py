@@ -0,0 +1,85 @@
+import time
+import itertools
+import threading
+from contextlib import contextmanager
+
+
+class TokenBucket:
+    """Blocks callers so that on average at most `rate` units are spent per second.
+
+    Up to `capacity` units can be spent in a burst. A request for more than
+    capacity waits for a full bucket and then leaves it in debt, so large
+    Gmail batches still respect the average rate.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0  # Total seconds callers spent blocked
+
+    def acquire(self, units=1):
+        needed = min(units, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (needed - self._tokens) / self.rate)
+            # Reserve the units now and sleep off the whole deficit once;
+            # re-checking after the sleep would chase float remainders.
+            self._tokens -= units
+            self.waited += wait
+        if wait:
+            time.sleep(wait)
+
+
+class FairShare:
+    """Shares a fixed number of slots between keys, e.g. LLM requests between accounts.
+
+    When a slot frees up it goes to the waiting key that currently holds
+    the fewest slots, oldest request first, so a key with a long queue of
+    work can't starve the others.
+    """
+
+    def __init__(self, slots):
+        self.slots = slots
+        self._active = {}
+        self._waiting = []
+        self._tickets = itertools.count()
+        self._changed = threading.Condition()
+
+    def _next(self):
+        return min(self._waiting, key=lambda item: (self._active.get(item[1], 0), item[0]))
+
+    def acquire(self, key):
+        with self._changed:
+            ticket = (next(self._tickets), key)
+            self._waiting.append(ticket)
+            while sum(self._active.values()) >= self.slots or self._next() != ticket:
+                self._changed.wait()
+            self._waiting.remove(ticket)
+            self._active[key] = self._active.get(key, 0) + 1
+            self._changed.notify_all()
+
+    @property
+    def waiting(self):
+        """Number of callers currently blocked in acquire()."""
+        with self._changed:
+            return len(self._waiting)
+
+    def release(self, key):
+        with self._changed:
+            self._active[key] -= 1
+            if not self._active[key]:
+                del self._active[key]
+            self._changed.notify_all()
+
+    @contextmanager
+    def slot(self, key):
+        self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release(key)
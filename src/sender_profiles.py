@@ -0,0 +1,148 @@
+import random
+import sqlite3
+import threading
+from collections import deque
+from config.config import DEFAULT_ACCOUNT
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sender_observations (
+    account TEXT NOT NULL DEFAULT 'default',
+    message_id TEXT NOT NULL,
+    sender TEXT NOT NULL,
+    importance_level TEXT NOT NULL,
+    PRIMARY KEY (account, message_id)
+);
+CREATE INDEX IF NOT EXISTS idx_sender_observations_sender ON sender_observations (sender);
+"""
+
+
+def _migrate(conn):
+    """Rebuild a table from before accounts existed, assigning its rows to the default account."""
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(sender_observations)')]
+    if not columns or 'account' in columns:
+        return
+    with conn:
+        conn.execute('ALTER TABLE sender_observations RENAME TO sender_observations_single_account')
+        conn.execute('DROP INDEX IF EXISTS idx_sender_observations_sender')
+    conn.executescript(SCHEMA)
+    with conn:
+        conn.execute(
+            'INSERT INTO sender_observations (account, message_id, sender, importance_level) '
+            'SELECT ?, message_id, sender, importance_level FROM sender_observations_single_account '
+            'ORDER BY rowid', (DEFAULT_ACCOUNT,))
+        conn.execute('DROP TABLE sender_observations_single_account')
+
+
+class SenderProfileIndex:
+    """Remembers the importance levels the LLM gave each sender's mail, per account.
+
+    When a sender's recent labels agree closely enough, predict() returns
+    that label so the LLM can be skipped. A random sample of those emails
+    is still sent to the LLM to re-verify the profile, and only the most
+    recent `window` labels count, so a sender whose mail changes character
+    loses its trust quickly.
+    """
+
+    def __init__(self, db_path, min_samples=5, confidence=0.9, reverify_rate=0.1, window=20):
+        self.db_path = db_path
+        self.min_samples = min_samples
+        self.confidence = confidence
+        self.reverify_rate = reverify_rate
+        self.window = window
+        self._profiles = {}
+        self._seen = set()
+        self._pending = []
+        self._random = random.Random()
+        self._lock = threading.Lock()
+        self._load()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        _migrate(conn)
+        conn.executescript(SCHEMA)
+        return conn
+
+    def _load(self):
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                'SELECT account, message_id, sender, importance_level FROM sender_observations '
+                'ORDER BY rowid')
+            for account, message_id, sender, importance_level in rows:
+                self._seen.add((account, message_id))
+                self._profile(account, sender).append(importance_level)
+        finally:
+            conn.close()
+
+    def _profile(self, account, sender):
+        profile = self._profiles.get((account, sender))
+        if profile is None:
+            profile = self._profiles[(account, sender)] = deque(maxlen=self.window)
+        return profile
+
+    @staticmethod
+    def sender_key(email_data):
+        return (email_data.get('from_email') or '').strip().lower()
+
+    def _trusted_label(self, labels):
+        if len(labels) < self.min_samples:
+            return None
+        top = max(set(labels), key=labels.count)
+        if labels.count(top) / len(labels) < self.confidence:
+            return None
+        return top
+
+    def predict(self, email_data):
+        """Return the sender's usual importance level in this account if it is trusted, else None."""
+        sender = self.sender_key(email_data)
+        account = email_data.get('account') or DEFAULT_ACCOUNT
+        if not sender:
+            return None
+        with self._lock:
+            label = self._trusted_label(self._profiles.get((account, sender), ()))
+            if label and self._random.random() < self.reverify_rate:
+                return None  # Let the LLM re-verify this sender now and then
+            return label
+
+    def observe(self, email_data, record):
+        """Record the importance level the LLM assigned to one of the sender's emails."""
+        sender = self.sender_key(email_data)
+        account = email_data.get('account') or DEFAULT_ACCOUNT
+        message_id = email_data.get('id')
+        importance_level = record.get('importance_level')
+        if not sender or not message_id or not importance_level:
+            return
+        with self._lock:
+            if (account, message_id) in self._seen:
+                return
+            self._seen.add((account, message_id))
+            self._profile(account, sender).append(importance_level)
+            self._pending.append((account, message_id, sender, importance_level))
+
+    def flush(self):
+        """Write observations recorded since the last flush to the database."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        conn = self._connect()
+        try:
+            with conn:
+                conn.executemany(
+                    'INSERT OR IGNORE INTO sender_observations '
+                    '(account, message_id, sender, importance_level) VALUES (?, ?, ?, ?)', pending)
+        finally:
+            conn.close()
+
+    def reload(self):
+        """Flush pending observations and re-read the table, picking up other processes' writes."""
+        self.flush()
+        with self._lock:
+            self._profiles = {}
+            self._seen = set()
+            self._load()
+
+    def stats(self):
+        with self._lock:
+            trusted = sum(1 for labels in self._profiles.values() if self._trusted_label(labels))
+            return {'senders': len(self._profiles), 'trusted_senders': trusted}
@@ -0,0 +1,147 @@
+"""Extractive email summaries without an LLM call.
+
+Sentences are scored by the cosine similarity of their TF-IDF vector to
+the whole email's (a centroid summary), with a bonus for appearing early,
+and the best ones are returned in their original order. Footer
+boilerplate, greetings, sign-offs and link-only lines never make it in.
+"""
+import re
+import numpy as np
+from src.prompt_compaction import strip_boilerplate, is_boilerplate
+
+NO_CONTENT = "No content to summarize"
+
+# URLs and <...> link or address brackets. Each branch starts with a plain
+# character so that the regex engine can skip ahead between candidates.
+_URL = re.compile(r'[hHwW<](?:(?<=[hH])ttps?://\S+|(?<=[wW])ww\.\S+|(?<=<)[^\s>]+>)')
+_DECORATION = re.compile(r'^[ \t\-_=*~#|•·]+', re.MULTILINE)
+# Sentence ends: terminal punctuation followed by whitespace and an uppercase
+# letter, digit or quote, or a line break before a blank line or a bullet.
+_SENTENCE_END = re.compile(
+    r'([.!?…]["\')\]]*)\s+(?=["\'(\[]?[A-Z0-9])|\n\s*\n|\n(?=\s*(?:[-*•]|\d+[.)])\s)')
+# Abbreviations whose trailing period doesn't end a sentence
+_ABBREVIATION = re.compile(
+    r'\b(?:Mr|Mrs|Ms|Dr|Prof|Sr|Jr|St|Inc|Ltd|Co|Corp|vs|etc|e\.g|i\.e|approx|No|Vol|Fig'
+    r'|Jan|Feb|Mar|Apr|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec|[A-Z])\.$')
+_GREETING = re.compile(
+    r'^(?:hi|hello|hey|dear|greetings|good (?:morning|afternoon|evening))\b[^.!?]{0,40}[,!:]?$'
+    r'|^(?:thanks?|thank you|cheers|best|regards|kind regards|best regards|sincerely|warm regards)\b.{0,40}$',
+    re.IGNORECASE)
+_WORD = re.compile(r'[^\W\d_]+')
+
+STOP_WORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own same she
+should so some such than that the their theirs them themselves then there these they this those
+through to too under until up very was we were what when where which while who whom why will with
+would you your yours yourself yourselves also get got please let us may might must shall
+""".split())
+
+MIN_SENTENCE_WORDS = 4
+MAX_SOURCE_CHARS = 20000  # Longer emails are summarized from their beginning
+POSITION_WEIGHT = 0.3  # Extra score for the first sentences, fading over the first few
+FRAGMENT_WEIGHT = 0.5  # Score kept by lines without closing punctuation (headings, addresses)
+
+
+def iter_sentences(text):
+    """Yield the sentences of cleaned text, keeping abbreviations and decimals intact."""
+    pending = ''
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        end = match.end(1) if match.group(1) else match.start()
+        piece = text[start:end]
+        start = match.end()
+        if match.group(1) and _ABBREVIATION.search(piece, max(0, len(piece) - 8)):
+            pending += piece + ' '
+            continue
+        sentence = ' '.join((pending + piece).split())
+        pending = ''
+        if sentence:
+            yield sentence
+    sentence = ' '.join((pending + text[start:]).split())
+    if sentence:
+        yield sentence
+
+
+def _clean(text):
+    text = strip_boilerplate(text.replace('\r\n', '\n').replace('\r', '\n'))
+    text = _URL.sub(' ', text)
+    return _DECORATION.sub('', text)
+
+
+def _candidates(text):
+    """Return the sentences worth considering for a summary, in order."""
+    candidates = []
+    for sentence in iter_sentences(_clean(text[:MAX_SOURCE_CHARS])):
+        if len(sentence.split()) < MIN_SENTENCE_WORDS:
+            continue
+        if _GREETING.match(sentence) or is_boilerplate(sentence):
+            continue
+        candidates.append(sentence)
+    return candidates
+
+
+def score_sentences(sentences):
+    """Score sentences by TF-IDF cosine similarity to the document centroid.
+
+    Early sentences get a bonus and fragments without closing punctuation a
+    penalty.
+    """
+    vocabulary = {}
+    rows, columns = [], []
+    for row, sentence in enumerate(sentences):
+        for word in _WORD.findall(sentence.lower()):
+            if word not in STOP_WORDS and len(word) > 1:
+                rows.append(row)
+                columns.append(vocabulary.setdefault(word, len(vocabulary)))
+    count = len(sentences)
+    if not vocabulary:
+        return np.zeros(count)
+    rows = np.asarray(rows)
+    columns = np.asarray(columns)
+
+    # Term frequencies per (sentence, term) pair, from one flat key per token
+    keys, term_counts = np.unique(rows * len(vocabulary) + columns, return_counts=True)
+    pair_rows, pair_columns = np.divmod(keys, len(vocabulary))
+    document_frequency = np.bincount(pair_columns, minlength=len(vocabulary))
+    idf = np.log((1 + count) / (1 + document_frequency)) + 1
+    weights = (1 + np.log(term_counts)) * idf[pair_columns]
+
+    norms = np.sqrt(np.bincount(pair_rows, weights=weights ** 2, minlength=count))
+    centroid = np.bincount(pair_columns, weights=weights, minlength=len(vocabulary))
+    similarity = np.bincount(pair_rows, weights=weights * centroid[pair_columns], minlength=count)
+    scores = similarity / np.maximum(norms * np.linalg.norm(centroid), 1e-12)
+    scores *= 1 + POSITION_WEIGHT * np.exp(-np.arange(count) / 3)
+    complete = np.fromiter((sentence[-1] in '.!?…"\')' for sentence in sentences), bool, count)
+    return np.where(complete, scores, scores * FRAGMENT_WEIGHT)
+
+
+def summarize(text, max_sentences=2, max_chars=300):
+    """Return an extractive summary of an email body of at most max_chars characters."""
+    sentences = _candidates(text or '')
+    if not sentences:
+        fallback = ' '.join(_clean((text or '')[:MAX_SOURCE_CHARS]).split())
+        if not fallback:
+            return NO_CONTENT
+        return fallback if len(fallback) <= max_chars else fallback[:max_chars].rsplit(' ', 1)[0] + '...'
+
+    if len(sentences) > max_sentences:
+        ranked = np.argsort(-score_sentences(sentences), kind='stable')
+        chosen = []
+        length = 0
+        for index in ranked:
+            # Skip a sentence that would overflow if a shorter one can still fit
+            if chosen and length + len(sentences[index]) > max_chars:
+                continue
+            chosen.append(index)
+            length += len(sentences[index]) + 1
+            if len(chosen) >= max_sentences:
+                break
+        sentences = [sentences[index] for index in sorted(chosen)]
+
+    summary = ' '.join(sentences)
+    if len(summary) > max_chars:
+        summary = summary[:max_chars].rsplit(' ', 1)[0] + '...'
+    return summary
@@ -0,0 +1,70 @@
+import re
+import html
+import base64
+import codecs
+
+# Elements whose contents are never visible text, plus HTML comments.
+_INVISIBLE = re.compile(
+    r'<!--.*?-->|<(script|style|head|title|noscript|template|svg)\b[^>]*>.*?</\1\s*>',
+    re.IGNORECASE | re.DOTALL)
+# Tags that start a new line of visible text.
+_LINE_BREAKS = re.compile(
+    r'<\s*(?:br|hr|/?(?:p|div|tr|li|ul|ol|table|blockquote|section|article|h[1-6]))\b[^>]*>',
+    re.IGNORECASE)
+_TAGS = re.compile(r'<[^>]*>')
+# Runs of horizontal whitespace, including the invisible characters marketing
+# mail pads its preheader with.
+_SPACES = re.compile(r'[ \t\r\f\v\u00a0\u034f\u200b-\u200d\u2060\ufeff]+')
+_BLANK_LINES = re.compile(r'\n(?: ?\n)+')
+_CHARSET = re.compile(r'charset\s*=\s*["\']?([\w.:-]+)', re.IGNORECASE)
+
+
+def html_to_text(markup):
+    """Convert an HTML body to plain text, dropping style, script and comment blocks."""
+    text = _INVISIBLE.sub(' ', markup)
+    text = _LINE_BREAKS.sub('\n', text)
+    text = _TAGS.sub('', text)
+    text = html.unescape(text)
+    return normalize_whitespace(text)
+
+
+def normalize_whitespace(text):
+    """Collapse runs of spaces and blank lines."""
+    text = _SPACES.sub(' ', text)
+    text = '\n'.join(line.strip() for line in text.split('\n'))
+    return _BLANK_LINES.sub('\n\n', text).strip()
+
+
+def part_charset(part):
+    """Return the charset declared in a message part's Content-Type header, if any."""
+    for header in part.get('headers', []):
+        if header.get('name', '').lower() == 'content-type':
+            match = _CHARSET.search(header.get('value', ''))
+            if match:
+                return match.group(1)
+    return None
+
+
+def decode_bytes(data, charset=None):
+    """Decode bytes using the declared charset, falling back to UTF-8 then cp1252."""
+    if charset:
+        try:
+            codecs.lookup(charset)
+            return data.decode(charset, errors='replace')
+        except LookupError:
+            pass
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('cp1252', errors='replace')
+
+
+def extract_part_text(part):
+    """Decode a Gmail API message part's body into plain text."""
+    data = part.get('body', {}).get('data', '')
+    if not data:
+        return ''
+    text = decode_bytes(base64.urlsafe_b64decode(data), part_charset(part))
+    if 'html' in part.get('mimeType', '').lower():
+        return html_to_text(text)
+    return normalize_whitespace(text)
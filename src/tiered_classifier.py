@@ -0,0 +1,77 @@
+import threading
+
+
+class TieredClassifier:
+    """Runs cheap classification tiers in order before anything reaches the LLM.
+
+    Each tier is a (name, function) pair; the function takes the email data
+    and returns an importance level, or None to pass the email on. Counts
+    of which tier decided each email are kept for run stats. Observers are
+    called with (email_data, record) for every email the LLM classified,
+    where record is the processed email, so tiers can learn from it.
+
+    Tiers named in body_tiers read the email body. When emails are fetched
+    without bodies, classify_headers() runs the tiers before the first of
+    them, and classify_body() the rest once the body has been fetched.
+    """
+
+    def __init__(self, tiers, observers=(), body_tiers=()):
+        self.tiers = list(tiers)
+        self.observers = list(observers)
+        names = [name for name, _ in self.tiers]
+        self._header_tiers = next(
+            (index for index, name in enumerate(names) if name in set(body_tiers)), len(names))
+        self.counts = {}
+        self.deferred = 0  # Emails no tier could decide, passed on to LLMService
+        self._lock = threading.Lock()
+
+    def classify(self, email_data):
+        """Return (importance_level, tier_name), or (None, None) if no tier decided."""
+        return self._classify(email_data, self.tiers)
+
+    def classify_headers(self, email_data):
+        """Like classify(), running only the tiers that don't need the body."""
+        return self._classify(email_data, self.tiers[:self._header_tiers])
+
+    def classify_body(self, email_data):
+        """Like classify(), running only the tiers classify_headers() skipped."""
+        return self._classify(email_data, self.tiers[self._header_tiers:])
+
+    def _classify(self, email_data, tiers):
+        for name, tier in tiers:
+            importance_level = tier(email_data)
+            if importance_level:
+                self.record(name)
+                return importance_level, name
+        return None, None
+
+    def observe(self, email_data, record):
+        """Report an LLM-classified email to the observers."""
+        for observer in self.observers:
+            observer(email_data, record)
+
+    def record(self, tier_name, count=1):
+        with self._lock:
+            self.counts[tier_name] = self.counts.get(tier_name, 0) + count
+
+    def defer(self, count=1):
+        """Record emails that were passed on to the LLM."""
+        with self._lock:
+            self.deferred += count
+
+    def stats(self, cache_hits=0):
+        """Return per-tier counts and the fraction of traffic each tier handled.
+
+        Deferred emails are split into 'cache' and 'llm' using the LLM
+        service's cache hit count.
+        """
+        with self._lock:
+            counts = dict(self.counts)
+            deferred = self.deferred
+        counts['cache'] = min(cache_hits, deferred)
+        counts['llm'] = deferred - counts['cache']
+        total = sum(counts.values())
+        return {
+            name: {'count': count, 'fraction': round(count / total, 3) if total else 0.0}
+            for name, count in counts.items()
+        }
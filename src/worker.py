@@ -0,0 +1,109 @@
+"""Headless sync-and-classify worker.
+
+Runs the same pipeline as the web app's Process button on a schedule:
+
+    python -m src.worker            # every CHECK_INTERVAL_MINUTES until stopped
+    python -m src.worker --once     # one run, for cron
+"""
+import argparse
+import logging
+import random
+import signal
+import sys
+import threading
+import time
+from src.jobs import Job
+from src.lock_file import LockFile
+from src.pipeline import import_legacy_emails, run_processing
+from config.config import (CHECK_INTERVAL_MINUTES, CHECK_INTERVAL_JITTER, WORKER_LOCK_FILE,
+                           LLM_MAX_CONCURRENCY, LLM_BATCH_MAX_EMAILS, LOG_LEVEL, LOG_FORMAT)
+
+logger = logging.getLogger(__name__)
+
+
+def run_once(options):
+    """Run the pipeline once, returning True if it succeeded."""
+    job = Job()
+    started = time.time()
+    try:
+        result = run_processing(job, options)
+    except Exception as e:
+        job.fail(str(e))
+        logger.error("Processing run failed: %s", e)
+        return False
+    job.finish(result)
+    logger.info("%s (%.1fs)", result['message'], time.time() - started)
+    for account, account_result in result['accounts'].items():
+        if 'error' in account_result:
+            logger.info("  %s: failed: %s", account, account_result['error'])
+        else:
+            logger.info("  %s: %s sync, %s emails/sec", account, account_result['sync_mode'],
+                        account_result['stats']['emails_per_sec'])
+    return True
+
+
+def next_delay(interval, jitter, elapsed):
+    """Seconds to wait before the next run, keeping runs interval apart on average.
+
+    A run that overran the interval is followed immediately by the next one
+    instead of overlapping it.
+    """
+    delay = interval * (1 + random.uniform(-jitter, jitter))
+    return max(0.0, delay - elapsed)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sync and classify Gmail without the web UI.')
+    parser.add_argument('--once', action='store_true', help='run once and exit (for cron)')
+    parser.add_argument('--interval', type=float, default=CHECK_INTERVAL_MINUTES,
+                        help='minutes between runs (default: %(default)s)')
+    parser.add_argument('--jitter', type=float, default=CHECK_INTERVAL_JITTER,
+                        help='random +/- fraction of the interval (default: %(default)s)')
+    parser.add_argument('--full-sync', action='store_true',
+                        help='start with a full sync instead of an incremental one')
+    parser.add_argument('--concurrency', type=int, default=LLM_MAX_CONCURRENCY)
+    parser.add_argument('--batch-size', type=int, default=LLM_BATCH_MAX_EMAILS)
+    parser.add_argument('--account', action='append', dest='accounts',
+                        help='sync only this account (repeatable; default: all accounts)')
+    parser.add_argument('--lock-file', default=WORKER_LOCK_FILE)
+    parser.add_argument('--log-level', default=LOG_LEVEL,
+                        help='DEBUG, INFO, WARNING or ERROR (default: %(default)s, from LOG_LEVEL)')
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format=LOG_FORMAT)
+
+    lock = LockFile(args.lock_file)
+    if not lock.acquire():
+        logger.error("Another worker holds %s; exiting", args.lock_file)
+        return 2
+
+    stopping = threading.Event()
+
+    def request_stop(signum, frame):
+        if stopping.is_set():
+            raise KeyboardInterrupt  # Second signal: don't wait for the current run
+        logger.info("Stopping after the current run...")
+        stopping.set()
+
+    signal.signal(signal.SIGINT, request_stop)
+    signal.signal(signal.SIGTERM, request_stop)
+
+    options = {'concurrency': args.concurrency, 'batch_size': args.batch_size,
+               'full_sync': args.full_sync, 'accounts': args.accounts}
+    try:
+        import_legacy_emails()
+        while True:
+            started = time.monotonic()
+            succeeded = run_once(options)
+            if args.once:
+                return 0 if succeeded else 1
+            options['full_sync'] = False
+            delay = next_delay(args.interval * 60, args.jitter, time.monotonic() - started)
+            logger.info("Next run in %.1f minutes", delay / 60)
+            if stopping.wait(delay):
+                return 0
+    finally:
+        lock.release()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,12 +3,18 @@ class EmailProcessor {
         this.initializeElements();
         this.bindEvents();
         this.currentEmails = [];
+        this.nextCursor = null;
+        this.pageSize = 50;
+        // Only what the list view renders; details are fetched per email
+        this.listFields = 'id,account,subject,from_name,from_email,importance_level,has_deadline';
+        this.pollIntervalMs = 1000;
     }
 
     initializeElements() {
         this.summarizeBtn = document.getElementById('summarizeBtn');
         this.status = document.getElementById('status');
         this.loading = document.getElementById('loading');
+        this.loadingText = document.getElementById('loadingText');
         this.emailsSection = document.getElementById('emailsSection');
         this.emailsList = document.getElementById('emailsList');
         this.emailCount = document.getElementById('emailCount');
@@ -45,12 +51,18 @@ class EmailProcessor {
             const data = await response.json();
 
             if (data.success) {
-                this.currentEmails = data.emails;
-                const methodBadge = data.method === 'LLM-powered' 
-                    ? '<span class="method-badge llm-badge">🤖 LLM-Powered</span>' 
-                    : '<span class="method-badge simple-badge">📝 Basic Processing</span>';
-                this.updateStatus(`${data.message} ${methodBadge}`, 'success');
-                this.displayEmails();
+                const job = window.EventSource
+                    ? await this.streamJob(data.job_id)
+                    : await this.pollJob(data.job_id);
+                if (job.status === 'completed') {
+                    const methodBadge = job.result.method === 'LLM-powered' 
+                        ? '<span class="method-badge llm-badge">🤖 LLM-Powered</span>' 
+                        : '<span class="method-badge simple-badge">📝 Basic Processing</span>';
+                    this.updateStatus(`${job.result.message} ${methodBadge}`, 'success');
+                    await this.loadEmails();
+                } else {
+                    this.updateStatus(`Error: ${job.error}`, 'error');
+                }
             } else {
                 this.updateStatus(`Error: ${data.message}`, 'error');
             }
@@ -62,34 +74,139 @@ class EmailProcessor {
         }
     }
 
-    displayEmails(emailsToShow = null) {
-        const emails = emailsToShow || this.currentEmails;
-        
+    streamJob(jobId) {
+        // Append each email as soon as the server finishes it, instead of
+        // waiting for the whole run
+        return new Promise((resolve, reject) => {
+            const source = new EventSource(`/api/process-emails/stream?job_id=${jobId}`);
+            this.currentEmails = [];
+            this.showLoading(false);
+            this.emailsList.innerHTML = '';
+            this.emailsSection.style.display = 'block';
+            this.emailDetail.style.display = 'none';
+
+            source.addEventListener('email', event => {
+                const email = JSON.parse(event.data);
+                this.currentEmails.push(email);
+                this.emailsList.appendChild(this.createEmailItem(email));
+                this.emailCount.textContent = `Processed ${this.currentEmails.length} email${this.currentEmails.length > 1 ? 's' : ''} so far...`;
+            });
+            source.addEventListener('progress', event => {
+                this.updateStatus(this.formatProgress(JSON.parse(event.data)), 'info');
+            });
+            source.addEventListener('done', event => {
+                source.close();
+                resolve(JSON.parse(event.data));
+            });
+            source.onerror = () => {
+                // EventSource reconnects on its own while the connection is
+                // still recoverable; give up only once it has closed
+                if (source.readyState === EventSource.CLOSED) {
+                    reject(new Error('Lost connection to the processing stream'));
+                }
+            };
+        });
+    }
+
+    async pollJob(jobId) {
+        // Poll the background job until it finishes, showing progress as we go
+        while (true) {
+            const response = await fetch(`/api/jobs/${jobId}`);
+            const data = await response.json();
+            if (!data.success) {
+                throw new Error(data.message);
+            }
+
+            const job = data.job;
+            if (job.status !== 'running') {
+                return job;
+            }
+
+            this.loadingText.textContent = this.formatProgress(job);
+            await new Promise(resolve => setTimeout(resolve, this.pollIntervalMs));
+        }
+    }
+
+    formatProgress(job) {
+        const done = job.classified + job.failed;
+        const total = job.total ? ` of ${job.total}` : '';
+        const eta = job.eta_seconds !== null ? `, about ${Math.ceil(job.eta_seconds)}s left` : '';
+        const failed = job.failed ? `, ${job.failed} failed` : '';
+        return `Fetched ${job.fetched}, classified ${done}${total}${failed}${eta}`;
+    }
+
+    filtersActive() {
+        return this.importanceFilter.value !== 'ALL' || this.deadlineFilter.value !== 'ALL';
+    }
+
+    async loadEmails(append = false) {
+        // Filtering and paging happen on the server; only one page of the
+        // fields the list shows is transferred at a time
+        const params = new URLSearchParams({ fields: this.listFields, limit: this.pageSize });
+        if (this.importanceFilter.value !== 'ALL') {
+            params.set('importance', this.importanceFilter.value);
+        }
+        if (this.deadlineFilter.value === 'WITH_DEADLINES') {
+            params.set('has_deadline', 'true');
+        } else if (this.deadlineFilter.value === 'NO_DEADLINES') {
+            params.set('has_deadline', 'false');
+        }
+        if (append && this.nextCursor) {
+            params.set('cursor', this.nextCursor);
+        }
+
+        try {
+            const response = await fetch(`/api/emails?${params}`);
+            const data = await response.json();
+            if (!data.success) {
+                this.updateStatus(`Error loading emails: ${data.message}`, 'error');
+                return;
+            }
+            this.currentEmails = append ? this.currentEmails.concat(data.emails) : data.emails;
+            this.nextCursor = data.next_cursor;
+            this.displayEmails();
+        } catch (error) {
+            this.updateStatus(`Network error: ${error.message}`, 'error');
+        }
+    }
+
+    displayEmails() {
+        const emails = this.currentEmails;
+
         if (emails.length === 0) {
-            this.emailCount.textContent = emailsToShow ? 'No emails match the current filters.' : 'No unread emails found.';
+            this.emailCount.textContent = this.filtersActive() ? 'No emails match the current filters.' : 'No unread emails found.';
             this.emailsList.innerHTML = '<div class="no-emails">All caught up! No unread emails to process.</div>';
         } else {
-            const filterText = emailsToShow && emailsToShow.length !== this.currentEmails.length 
-                ? ` (${emails.length} of ${this.currentEmails.length} shown)`
-                : '';
-            this.emailCount.textContent = `Found ${emails.length} unread email${emails.length > 1 ? 's' : ''}${filterText}:`;
+            const more = this.nextCursor ? ' (more below)' : '';
+            this.emailCount.textContent = `Showing ${emails.length} email${emails.length > 1 ? 's' : ''}${more}:`;
             this.emailsList.innerHTML = '';
 
             emails.forEach(email => {
                 const emailItem = this.createEmailItem(email);
                 this.emailsList.appendChild(emailItem);
             });
+
+            if (this.nextCursor) {
+                const loadMoreBtn = document.createElement('button');
+                loadMoreBtn.className = 'btn btn-secondary load-more-btn';
+                loadMoreBtn.innerHTML = '<i class="fas fa-chevron-down"></i> Load more';
+                loadMoreBtn.addEventListener('click', () => {
+                    loadMoreBtn.disabled = true;
+                    this.loadEmails(true);
+                });
+                this.emailsList.appendChild(loadMoreBtn);
+            }
         }
 
         this.emailsSection.style.display = 'block';
         this.emailDetail.style.display = 'none';
-        this.filtersSection.style.display = this.currentEmails.length > 0 ? 'block' : 'none';
+        this.filtersSection.style.display = emails.length > 0 || this.filtersActive() ? 'block' : 'none';
     }
 
     createEmailItem(email) {
         const item = document.createElement('div');
         item.className = 'email-item';
-        item.addEventListener('click', () => this.showEmailDetail(email.id));
+        item.addEventListener('click', () => this.showEmailDetail(email.id, email.account));
 
         const badges = [];
         
@@ -120,11 +237,12 @@ class EmailProcessor {
         return item;
     }
 
-    async showEmailDetail(emailId) {
+    async showEmailDetail(emailId, account) {
         this.showLoading(true);
 
         try {
-            const response = await fetch(`/api/email/${emailId}`);
+            const query = account ? `?account=${encodeURIComponent(account)}` : '';
+            const response = await fetch(`/api/email/${encodeURIComponent(emailId)}${query}`);
             const data = await response.json();
 
             if (data.success) {
@@ -224,6 +342,17 @@ class EmailProcessor {
                 </div>
             </div>
 
+            ${email.body ? `
+            <div class="detail-section">
+                <div class="detail-label">
+                    <i class="fas fa-envelope-open-text"></i> Message
+                </div>
+                <div class="detail-value">
+                    <div class="body-text">${this.escapeHtml(email.body)}</div>
+                </div>
+            </div>
+            ` : ''}
+
             <div class="detail-section">
                 <div class="detail-label">
                     <i class="fas fa-star"></i> Importance Level
@@ -292,6 +421,7 @@ class EmailProcessor {
 
     showLoading(show) {
         this.loading.style.display = show ? 'flex' : 'none';
+        this.loadingText.textContent = 'Processing your emails...';
     }
 
     updateStatus(message, type) {
@@ -301,40 +431,13 @@ class EmailProcessor {
     }
 
     applyFilters() {
-        if (!this.currentEmails || this.currentEmails.length === 0) {
-            return;
-        }
-
-        const importanceFilter = this.importanceFilter.value;
-        const deadlineFilter = this.deadlineFilter.value;
-
-        let filteredEmails = this.currentEmails;
-
-        // Filter by importance
-        if (importanceFilter !== 'ALL') {
-            filteredEmails = filteredEmails.filter(email => 
-                email.importance_level === importanceFilter
-            );
-        }
-
-        // Filter by deadlines
-        if (deadlineFilter === 'WITH_DEADLINES') {
-            filteredEmails = filteredEmails.filter(email => 
-                email.has_deadline || (email.deadlines && email.deadlines.length > 0)
-            );
-        } else if (deadlineFilter === 'NO_DEADLINES') {
-            filteredEmails = filteredEmails.filter(email => 
-                !email.has_deadline && (!email.deadlines || email.deadlines.length === 0)
-            );
-        }
-
-        this.displayEmails(filteredEmails);
+        this.loadEmails();
     }
 
     clearFilters() {
         this.importanceFilter.value = 'ALL';
         this.deadlineFilter.value = 'ALL';
-        this.displayEmails();
+        this.loadEmails();
     }
 
     escapeHtml(text) {
@@ -0,0 +1,217 @@
+import os
+import sys
+import copy
+import json
+import base64
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# src.pipeline opens its database on import, so the tests point it at a
+# scratch directory instead of the project's database.
+os.chdir(tempfile.mkdtemp(prefix='inboxintel-tests-'))
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(os.getcwd(), 'gmail_processor.db')
+
+
+@pytest.fixture
+def store(tmp_path):
+    from src.email_store import EmailStore
+    return EmailStore(str(tmp_path / 'emails.db'))
+
+
+@pytest.fixture
+def client(store, monkeypatch):
+    """A Flask test client whose app and pipeline use the store fixture."""
+    import app as app_module
+    from src import pipeline
+    monkeypatch.setattr(app_module, 'email_store', store)
+    monkeypatch.setattr(pipeline, 'email_store', store)
+    return app_module.app.test_client()
+
+
+class StubLLM:
+    """An OpenAI-style chat completions server that answers from a script.
+
+    answer is a callable taking the prompt and returning (status, content);
+    every prompt received is kept in prompts, and the client port of each
+    request in ports. Connections are kept alive between requests.
+    """
+
+    def __init__(self):
+        self.answer = lambda prompt: (200, '{"importance_level": "Important"}')
+        self.prompts = []
+        self.ports = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                prompt = payload['messages'][-1]['content']
+                stub.prompts.append(prompt)
+                stub.ports.append(self.client_address[1])
+                status, content = stub.answer(prompt)
+                body = json.dumps({'choices': [{'message': {'content': content}}]}).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.handle_error = lambda request, client_address: None  # Clients that timed out
+        self.url = f'http://127.0.0.1:{self.server.server_port}/v1/chat/completions'
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+
+@pytest.fixture
+def stub_llm():
+    stub = StubLLM()
+    yield stub
+    stub.server.shutdown()
+    stub.server.server_close()
+
+
+@pytest.fixture
+def llm(stub_llm):
+    """An LLMService talking to stub_llm, retrying without waiting."""
+    from src.llm_service import LLMService, create_session
+    service = LLMService(session=create_session(max_retries=2, backoff=0), timeout=(1, 2))
+    service.api_url = stub_llm.url
+    return service
+
+
+def http_error(status, reason='', retry_after=None):
+    headers = {'status': status}
+    if retry_after is not None:
+        headers['retry-after'] = str(retry_after)
+    return HttpError(httplib2.Response(headers),
+                     json.dumps({'error': {'errors': [{'reason': reason}]}}).encode())
+
+
+def gmail_message(message_id, subject='Hello', body='Hi there', sender='Ann <ann@example.com>',
+                  received_time=1760000000000):
+    return {
+        'id': message_id, 'labelIds': ['UNREAD', 'INBOX'], 'snippet': body[:100],
+        'internalDate': str(received_time),
+        'payload': {
+            'mimeType': 'text/plain',
+            'headers': [{'name': 'Subject', 'value': subject}, {'name': 'From', 'value': sender},
+                        {'name': 'Date', 'value': 'Thu, 09 Oct 2025 08:53:20 +0000'}],
+            'body': {'data': base64.urlsafe_b64encode(body.encode()).decode()},
+        },
+    }
+
+
+class FakeGmailService:
+    """Just enough of googleapiclient's Gmail service for GmailClient, backed by a dict of messages.
+
+    fail(method, *errors, key=None) makes the next calls of method (e.g.
+    'messages.list', or 'messages.get' with key set to a message ID) raise
+    errors in turn. Every call is recorded in calls as (method, key), and
+    the IDs of each executed batch in batches.
+    """
+
+    def __init__(self, messages=()):
+        self.mailbox = {message['id']: message for message in messages}
+        self.history_records = []
+        self.history_id = '100'
+        self.errors = {}
+        self.calls = []
+        self.batches = []
+
+    def fail(self, method, *errors, key=None):
+        self.errors.setdefault((method, key), []).extend(errors)
+
+    def _request(self, method, key, run):
+        def execute():
+            self.calls.append((method, key))
+            for error_key in ((method, key), (method, None)):
+                if self.errors.get(error_key):
+                    raise self.errors[error_key].pop(0)
+            return run()
+        return SimpleNamespace(execute=execute)
+
+    def users(self):
+        return SimpleNamespace(messages=self._messages, history=self._history,
+                               labels=self._labels, getProfile=self._get_profile)
+
+    def _messages(self):
+        return SimpleNamespace(list=self._list, get=self._get)
+
+    def _list(self, userId, q='', maxResults=100, pageToken=None):
+        def run():
+            ids = sorted(self.mailbox)
+            start = int(pageToken or 0)
+            page = {'messages': [{'id': message_id} for message_id in ids[start:start + maxResults]]}
+            if start + maxResults < len(ids):
+                page['nextPageToken'] = str(start + maxResults)
+            return page
+        return self._request('messages.list', pageToken, run)
+
+    def _get(self, userId, id, format='full', metadataHeaders=None):
+        def run():
+            if id not in self.mailbox:
+                raise http_error(404)
+            message = copy.deepcopy(self.mailbox[id])
+            if format == 'metadata':
+                message['payload'] = {'headers': [header for header in message['payload']['headers']
+                                                  if header['name'] in metadataHeaders]}
+            return message
+        return self._request('messages.get', id, run)
+
+    def _history(self):
+        def history_list(userId, startHistoryId, pageToken=None, historyTypes=()):
+            return self._request('history.list', pageToken, lambda: {
+                'history': self.history_records, 'historyId': self.history_id})
+        return SimpleNamespace(list=history_list)
+
+    def _labels(self):
+        def get(userId, id):
+            return self._request('labels.get', id, lambda: {'messagesUnread': len(self.mailbox)})
+        return SimpleNamespace(get=get)
+
+    def _get_profile(self, userId):
+        return self._request('getProfile', None, lambda: {'historyId': self.history_id})
+
+    def new_batch_http_request(self, callback):
+        requests = []
+
+        def execute():
+            self.batches.append([request_id for request_id, _ in requests])
+            if self.errors.get(('batch', None)):
+                raise self.errors[('batch', None)].pop(0)
+            for request_id, request in requests:
+                try:
+                    response = request.execute()
+                except HttpError as e:
+                    callback(request_id, None, e)
+                else:
+                    callback(request_id, response, None)
+
+        return SimpleNamespace(add=lambda request, request_id: requests.append((request_id, request)),
+                               execute=execute)
+
+
+@pytest.fixture
+def gmail(monkeypatch):
+    """A FakeGmailService that the pipeline uses for every account; retries don't sleep."""
+    from src import gmail_client, pipeline
+    from src.gmail_client import GmailClient
+    service = FakeGmailService()
+    client = GmailClient(service)
+    monkeypatch.setattr(pipeline, 'gmail_accounts', SimpleNamespace(
+        get_client=lambda account=None, interactive=True: client, quota_stats=lambda account: {}))
+    service.sleeps = []
+    monkeypatch.setattr(gmail_client.time, 'sleep', service.sleeps.append)
+    return service
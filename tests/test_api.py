@@ -0,0 +1,107 @@
+def email(email_id, received_time, deadlines=()):
+    return {'id': email_id, 'subject': f'Subject {email_id}', 'received_time': str(received_time),
+            'deadlines': list(deadlines), 'has_deadline': bool(deadlines), 'body_fetched': True}
+
+
+def test_emails_sorted_and_filtered_by_deadline(client, store):
+    store.apply_changes(upserts=[
+        email('late', 1000, ['2026-11-20T23:59:00+00:00']),
+        email('none', 2000),
+        email('soon', 3000, ['2026-10-20T23:59:00+00:00', '2026-12-01T23:59:00+00:00']),
+        email('middle', 4000, ['2026-11-01T12:00:00+00:00']),
+    ])
+
+    response = client.get('/api/emails?sort=deadline&fields=id')
+    assert [e['id'] for e in response.json['emails']] == ['soon', 'middle', 'late']
+
+    response = client.get('/api/emails?sort=deadline&fields=id'
+                          '&due_after=2026-10-25T00:00:00%2B00:00&due_before=2026-11-10T00:00:00%2B00:00')
+    assert [e['id'] for e in response.json['emails']] == ['middle']
+
+    response = client.get('/api/emails?fields=id')
+    assert [e['id'] for e in response.json['emails']] == ['middle', 'soon', 'none', 'late']
+
+
+def test_deadline_sort_pages_with_cursor(client, store):
+    store.apply_changes(upserts=[
+        email(f'e{day}', day, [f'2026-10-{day:02d}T09:00:00+00:00']) for day in range(10, 15)])
+    seen, cursor = [], ''
+    while True:
+        response = client.get(f'/api/emails?sort=deadline&fields=id&limit=2&cursor={cursor}')
+        seen += [e['id'] for e in response.json['emails']]
+        cursor = response.json['next_cursor']
+        if not cursor:
+            break
+    assert seen == ['e10', 'e11', 'e12', 'e13', 'e14']
+
+
+def test_unknown_sort_is_rejected(client):
+    response = client.get('/api/emails?sort=importance')
+    assert response.status_code == 400
+
+
+def test_stream_requires_an_existing_job(client):
+    assert client.get('/api/process-emails/stream').status_code == 400
+    assert client.get('/api/process-emails/stream?job_id=nope').status_code == 404
+
+
+def test_stream_replays_a_finished_job(client, monkeypatch):
+    import app as app_module
+
+    def run(job, options):
+        for index in range(3):
+            job.add_email({'id': f'm{index}'})
+        return {'message': 'done'}
+
+    monkeypatch.setattr(app_module, 'run_processing', run)
+    job_id = client.post('/api/process-emails', json={}).json['job_id']
+    job = app_module.job_manager.get(job_id)
+    while job.is_running():
+        job.wait_for_emails(job.published, timeout=0.1)
+
+    response = client.get(f'/api/process-emails/stream?job_id={job_id}',
+                          headers={'Last-Event-ID': '0'})
+    events = [line for line in response.get_data(as_text=True).splitlines()
+              if line.startswith('event: ')]
+    assert events == ['event: job', 'event: email', 'event: email', 'event: done']
+
+
+def test_search_returns_projected_results_with_snippets(client, store):
+    store.apply_changes(upserts=[{'id': 'm1', 'subject': 'Invoice <42>', 'from': 'Ann'}],
+                        bodies={'m1': 'Please pay the invoice'})
+    store.apply_changes(upserts=[{'id': 'm2', 'account': 'work', 'subject': 'Invoice'}], account='work')
+
+    response = client.get('/api/search?q=invoi')
+    assert response.status_code == 200
+    assert {(r['account'], r['id']) for r in response.json['results']} == {('default', 'm1'), ('work', 'm2')}
+
+    result, = client.get('/api/search?q=invoice&account=default').json['results']
+    assert set(result) == {'id', 'account', 'subject', 'from', 'importance_level', 'received_time',
+                           'snippet', 'score'}
+    assert result['subject'] == 'Invoice <42>'
+    assert '<mark>Invoice</mark> &lt;42&gt;' in result['snippet']
+
+    assert len(client.get('/api/search?q=invoice&limit=1').json['results']) == 1
+
+
+def test_search_rejects_a_missing_query_or_bad_limit(client):
+    assert client.get('/api/search?q=%20').status_code == 400
+    assert client.get('/api/search?q=invoice&limit=many').status_code == 400
+
+
+def test_emails_etag_gives_304_until_a_write(client, store):
+    store.apply_changes(upserts=[email('m1', 1000)])
+    response = client.get('/api/emails?fields=id')
+    etag = response.headers['ETag']
+    assert response.status_code == 200 and etag
+
+    response = client.get('/api/emails?fields=id', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.headers['ETag'] == etag
+    assert response.data == b''
+
+    store.apply_changes(upserts=[email('m2', 2000)])
+    response = client.get('/api/emails?fields=id', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert [e['id'] for e in response.json['emails']] == ['m2', 'm1']
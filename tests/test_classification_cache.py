@@ -0,0 +1,57 @@
+from src.classification_cache import ClassificationCache
+
+
+def test_message_id_keys_are_scoped_by_account(tmp_path):
+    cache = ClassificationCache(str(tmp_path / 'cache.json'))
+    cache.put('model:1', 'Invoice', 'Please pay', 'Very Important', 'm1', 'default')
+
+    assert cache.get('model:1', 'Other', 'Text', 'm1', 'default') == 'Very Important'
+    assert cache.get('model:1', 'Other', 'Text', 'm1', 'work') is None
+    assert cache.get('model:1', 'Invoice', 'Please pay', 'm9', 'work') == 'Very Important'
+
+
+def test_two_instances_sharing_a_file_keep_each_others_entries(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    web, worker = ClassificationCache(path), ClassificationCache(path)
+    web.put('model:1', 'Invoice', 'Please pay', 'Important', 'm1')
+    worker.put('model:1', 'Sale', 'Everything must go', 'Unimportant', 'm2')
+    web.save()
+    worker.save()
+
+    reloaded = ClassificationCache(path)
+    assert reloaded.get('model:1', 'Invoice', 'Please pay', 'm1') == 'Important'
+    assert reloaded.get('model:1', 'Sale', 'Everything must go', 'm2') == 'Unimportant'
+
+    web.load()
+    assert web.get('model:1', 'Sale', 'Everything must go', 'm2') == 'Unimportant'
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    # Without message IDs each email takes one entry, keyed by its content
+    cache = ClassificationCache(str(tmp_path / 'cache.json'), max_entries=2)
+    cache.put('model:1', 'First', 'Body', 'Important')
+    cache.put('model:1', 'Second', 'Body', 'Unimportant')
+    assert cache.get('model:1', 'First', 'Body') == 'Important'  # Now the most recent
+
+    cache.put('model:1', 'Third', 'Body', 'Very Important')
+
+    assert cache.get('model:1', 'Second', 'Body') is None
+    assert cache.get('model:1', 'First', 'Body') == 'Important'
+    assert cache.get('model:1', 'Third', 'Body') == 'Very Important'
+    assert cache.stats()['entries'] == 2
+
+
+def test_saved_entries_load_in_a_new_instance(tmp_path):
+    path = str(tmp_path / 'cache.json')
+    cache = ClassificationCache(path, max_entries=3)
+    for subject in ('First', 'Second', 'Third'):
+        cache.put('model:1', subject, 'Body', 'Important')
+    cache.get('model:1', 'First', 'Body')
+    cache.save()
+
+    reloaded = ClassificationCache(path, max_entries=2)
+    # Recency survives the round trip, so the smaller cache keeps the two most recent
+    assert reloaded.get('model:1', '  FIRST ', 'body') == 'Important'
+    assert reloaded.get('model:1', 'Third', 'Body') == 'Important'
+    assert reloaded.get('model:1', 'Second', 'Body') is None
+    assert reloaded.get('model:2', 'Third', 'Body') is None
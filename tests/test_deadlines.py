@@ -0,0 +1,30 @@
+from datetime import datetime, timezone
+import pytest
+from src.deadlines import extract_deadlines
+
+SENT = datetime(2026, 10, 18, 9, 0, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize('text', [
+    'Please finish by 1/2', 'Cut the recipe by 1/2 before the party', 'deadline: 1/2 of the fee'])
+def test_fractions_are_not_dates(text):
+    assert extract_deadlines(text, SENT) == []
+
+
+@pytest.mark.parametrize('text, deadline', [
+    ('Payment due 3/14', '2027-03-14T23:59:00+00:00'),
+    ('Send it by Fri 3/14', '2027-03-14T23:59:00+00:00'),
+    ('Send it by 3/14/2027', '2027-03-14T23:59:00+00:00'),
+])
+def test_numeric_dates_with_context(text, deadline):
+    assert extract_deadlines(text, SENT) == [deadline]
+
+
+@pytest.mark.parametrize('text, deadline', [
+    ('The offer is open until May 2', '2027-05-02T23:59:00+00:00'),
+    ('Tickets are due Oct 18', '2026-10-18T23:59:00+00:00'),
+    ('Tickets are due Dec 1', '2026-12-01T23:59:00+00:00'),
+    ('Renew by Feb 29', '2028-02-29T23:59:00+00:00'),
+])
+def test_dates_without_a_year_are_not_in_the_past(text, deadline):
+    assert extract_deadlines(text, SENT) == [deadline]
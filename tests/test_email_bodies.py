@@ -0,0 +1,95 @@
+import pytest
+from conftest import gmail_message, http_error
+from src import accounts, pipeline
+from src.accounts import AccountRegistry
+from src.gmail_client import GmailClient
+from src.jobs import Job
+from src.pipeline import fetch_bodies, load_email_body, stream_emails_data
+
+
+@pytest.fixture
+def stored(store, monkeypatch):
+    """Store an email processed from metadata, i.e. with only its snippet."""
+    monkeypatch.setattr(pipeline, 'email_store', store)
+
+    def save(message_id, body=None, **fields):
+        store.apply_changes(upserts=[dict({'id': message_id, 'subject': 'Hello'}, **fields)],
+                            bodies={message_id: body} if body else None)
+        return store.get_email(message_id)
+    return save
+
+
+def gets(gmail):
+    return [key for method, key in gmail.calls if method == 'messages.get']
+
+
+def test_body_is_fetched_once_and_stored(stored, store, gmail):
+    gmail.mailbox = {'m1': gmail_message('m1', body='The full body')}
+    email = stored('m1', body_fetched=False)
+
+    assert load_email_body(email) == 'The full body'
+    assert load_email_body(store.get_email('m1')) == 'The full body'
+    assert store.get_email('m1')['body_fetched'] is True
+    assert gets(gmail) == ['m1']
+
+
+def test_indexed_body_is_used_without_asking_gmail(stored, gmail):
+    legacy = stored('m1', body='Imported with its body')  # No body_fetched flag
+    assert load_email_body(legacy) == 'Imported with its body'
+    assert gets(gmail) == []
+
+
+def test_failed_fetch_is_remembered(stored, store, gmail):
+    gmail.fail('messages.get', http_error(404), key='m1')
+    email = stored('m1', body_fetched=False)
+
+    assert load_email_body(email) == ''
+    assert load_email_body(store.get_email('m1')) == ''
+    assert gets(gmail) == ['m1']
+
+
+def test_request_never_starts_the_consent_flow(stored, store, tmp_path, monkeypatch):
+    monkeypatch.setattr(accounts, 'TOKEN_FILE', str(tmp_path / 'missing.token'))
+    monkeypatch.setattr(pipeline, 'gmail_accounts', AccountRegistry())
+
+    def consent(*args, **kwargs):
+        raise AssertionError('the consent flow must not run inside a request')
+    monkeypatch.setattr('src.gmail_client.InstalledAppFlow.from_client_secrets_file', consent)
+
+    assert load_email_body(stored('m1', body_fetched=False)) == ''
+    assert store.get_email('m1')['body_fetched'] is True
+
+
+def test_fetch_bodies_replaces_snippets(gmail):
+    gmail.mailbox = {message_id: gmail_message(message_id, body=f'Full body of {message_id}. ' * 20)
+                     for message_id in ('m1', 'm2', 'm3')}
+    client = GmailClient(gmail)
+    emails = list(stream_emails_data(client, ['m1', 'm2', 'm3'], msg_format='metadata'))
+    assert [email['body_fetched'] for email in emails] == [False, False, False]
+    gmail.fail('messages.get', http_error(404), key='m3')
+    emails[0]['prompt_body'] = 'from the snippet'
+    gmail.calls.clear()
+
+    bodies = {}
+    fetch_bodies(client, emails, bodies=bodies)
+
+    assert [key for method, key in gmail.calls] == ['m1', 'm2', 'm3']
+    assert [email['body_fetched'] for email in emails] == [True, True, False]
+    assert emails[0]['content'].startswith('Full body of m1.')
+    assert 'prompt_body' not in emails[0]
+    assert sorted(bodies) == ['m1', 'm2']
+
+    gmail.calls.clear()
+    fetch_bodies(client, emails[:2])
+    assert gmail.calls == []
+
+
+def test_metadata_sync_stores_fetched_bodies(store, gmail, llm, stub_llm, monkeypatch):
+    monkeypatch.setattr(pipeline, 'email_store', store)
+    monkeypatch.setattr(pipeline, 'GMAIL_FETCH_FORMAT', 'metadata')
+    gmail.mailbox = {'m1': gmail_message('m1', body='Can we meet on Thursday about the budget?')}
+
+    pipeline.sync_account(Job(), 'default', llm, concurrency=1, batch_size=1)
+
+    assert store.get_email('m1')['body_fetched'] is True
+    assert store.get_body('m1') == 'Can we meet on Thursday about the budget?'
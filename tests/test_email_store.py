@@ -0,0 +1,54 @@
+from src import email_store
+from src.email_store import search_query
+
+
+def test_lookup_by_id_alone_uses_an_index(store):
+    store.apply_changes(upserts=[{'id': 'm1', 'account': 'work', 'subject': 'Hello'}])
+    plan = store._connection().execute(
+        'EXPLAIN QUERY PLAN SELECT account, data FROM emails WHERE id = ? LIMIT 1', ('m1',)).fetchall()
+    assert 'idx_emails_id' in ' '.join(row[-1] for row in plan)
+    assert store.get_email('m1')['account'] == 'work'
+
+
+def search_ids(results):
+    return [(email['account'], email['id']) for email, snippet, score in results]
+
+
+def test_search_matches_every_word_and_the_last_as_a_prefix(store):
+    store.apply_changes(upserts=[{'id': 'm1', 'subject': 'Quarterly report'},
+                                 {'id': 'm2', 'subject': 'Report card'}])
+    assert search_query('quarterly rep') == '"quarterly" "rep"*'
+    assert search_query(' -- ') is None
+    assert search_ids(store.search('quarterly rep')) == [('default', 'm1')]
+    assert search_ids(store.search('rep quarterly')) == []
+    assert sorted(search_ids(store.search('report'))) == [('default', 'm1'), ('default', 'm2')]
+
+
+def test_search_ranks_subject_matches_first_and_filters_by_account(store):
+    store.apply_changes(upserts=[{'id': 'm1', 'subject': 'Hello'}], bodies={'m1': 'Your invoice is attached'})
+    store.apply_changes(upserts=[{'id': 'm2', 'subject': 'Invoice'}])
+    store.apply_changes(upserts=[{'id': 'm1', 'account': 'work', 'subject': 'Invoice overdue'}],
+                        account='work')
+    assert search_ids(store.search('invoice', account='default')) == [('default', 'm2'), ('default', 'm1')]
+    assert search_ids(store.search('invoice', account='work')) == [('work', 'm1')]
+    assert len(store.search('invoice')) == 3
+    assert len(store.search('invoice', limit=1)) == 1
+
+
+def test_search_ranks_only_the_most_recent_matches(store, monkeypatch):
+    monkeypatch.setattr(email_store, 'SEARCH_RANK_WINDOW', 2)
+    store.apply_changes(upserts=[{'id': f'old{i}', 'subject': 'Invoice invoice invoice'} for i in range(2)])
+    store.apply_changes(upserts=[{'id': f'new{i}', 'subject': 'Re: invoice and other things'}
+                                 for i in range(2)])
+    store.apply_changes(upserts=[{'id': 'other', 'account': 'work', 'subject': 'Invoice'}], account='work')
+    assert sorted(search_ids(store.search('invoice', account='default'))) == [
+        ('default', 'new0'), ('default', 'new1')]
+    assert sorted(search_ids(store.search('invoice'))) == [('default', 'new1'), ('work', 'other')]
+
+
+def test_search_snippet_is_escaped_with_marked_matches(store):
+    store.apply_changes(upserts=[{'id': 'm1', 'subject': 'Hello'}],
+                        bodies={'m1': 'See <b>the</b> invoice & pay'})
+    (email, snippet, score), = store.search('invoice')
+    assert snippet == 'See &lt;b&gt;the&lt;/b&gt; <mark>invoice</mark> &amp; pay'
+    assert score > 0
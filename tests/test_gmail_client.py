@@ -0,0 +1,160 @@
+import json
+import threading
+from datetime import datetime, timedelta, timezone
+import google_auth_httplib2
+import pytest
+from google.oauth2.credentials import Credentials
+from conftest import FakeGmailService, gmail_message, http_error
+from src import gmail_client
+from src.gmail_client import GmailClient, GmailClientManager
+
+
+@pytest.fixture
+def service(monkeypatch):
+    service = FakeGmailService(gmail_message(f'm{i}') for i in range(5))
+    service.sleeps = []
+    monkeypatch.setattr(gmail_client.time, 'sleep', service.sleeps.append)
+    monkeypatch.setattr(gmail_client, 'GMAIL_BATCH_SIZE', 2)
+    monkeypatch.setattr(gmail_client, 'GMAIL_RETRY_BASE_DELAY', 1.0)
+    monkeypatch.setattr(gmail_client, 'GMAIL_BATCH_MAX_RETRIES', 3)
+    return service
+
+
+def ids(messages):
+    return [message and message['id'] for message in messages]
+
+
+def test_messages_are_fetched_in_batches_in_request_order(service):
+    messages = GmailClient(service).get_messages_batch(['m4', 'm0', 'm3', 'm0', 'm1'])
+    assert ids(messages) == ['m4', 'm0', 'm3', 'm0', 'm1']
+    assert service.batches == [['m4', 'm0'], ['m3', 'm1']]
+
+
+def test_metadata_format_returns_only_headers(service):
+    [message] = GmailClient(service).get_messages_batch(['m1'], 'metadata')
+    assert 'body' not in message['payload']
+    assert {header['name'] for header in message['payload']['headers']} == {'Subject', 'From', 'Date'}
+
+
+def test_rate_limited_messages_are_retried_with_backoff(service):
+    service.fail('messages.get', http_error(429), http_error(503), key='m1')
+    service.fail('messages.get', http_error(403, 'userRateLimitExceeded'), key='m2')
+
+    messages = GmailClient(service).get_messages_batch(['m0', 'm1', 'm2'])
+
+    assert ids(messages) == ['m0', 'm1', 'm2']
+    assert service.batches == [['m0', 'm1'], ['m2'], ['m1', 'm2'], ['m1']]
+    assert service.sleeps == [1.0, 2.0]
+
+
+def test_retry_after_is_honoured(service):
+    service.fail('messages.get', http_error(429, retry_after=7), key='m0')
+    assert ids(GmailClient(service).get_messages_batch(['m0'])) == ['m0']
+    assert service.sleeps == [7.0]
+
+
+def test_failed_batch_request_is_retried(service):
+    service.fail('batch', http_error(503))
+    assert ids(GmailClient(service).get_messages_batch(['m0', 'm1'])) == ['m0', 'm1']
+    assert service.batches == [['m0', 'm1'], ['m0', 'm1']]
+
+
+def test_permanent_failures_are_not_retried(service):
+    service.fail('messages.get', http_error(400), key='m0')
+    assert ids(GmailClient(service).get_messages_batch(['m0', 'missing'])) == [None, None]
+    assert service.batches == [['m0', 'missing']]
+    assert service.sleeps == []
+
+
+def test_retries_give_up_after_the_limit(service):
+    service.fail('messages.get', *[http_error(500)] * 10, key='m0')
+    assert ids(GmailClient(service).get_messages_batch(['m0', 'm1'])) == [None, 'm1']
+    assert service.sleeps == [1.0, 2.0, 4.0]
+
+
+def utc_in(seconds):
+    return datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=seconds)
+
+
+class FakeCredentials(Credentials):
+    """OAuth2 credentials whose refresh() only counts calls and extends the expiry."""
+
+    def __init__(self, expires_in):
+        super().__init__('token', refresh_token='refresh', expiry=utc_in(expires_in))
+        self.refreshes = 0
+
+    def refresh(self, request):
+        self.refreshes += 1
+        self.expiry = utc_in(3600)
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    """A GmailClientManager whose credentials are a FakeCredentials counting loads and saves."""
+    manager = GmailClientManager(str(tmp_path / 'token'), refresh_margin=300)
+    manager.creds = FakeCredentials(expires_in=3600)
+    manager.loads, manager.saves = [], []
+    monkeypatch.setattr(gmail_client, 'load_credentials',
+                        lambda *args: manager.loads.append(args) or manager.creds)
+    monkeypatch.setattr(gmail_client, 'save_credentials',
+                        lambda creds, token_file: manager.saves.append(token_file))
+    discovery = str(tmp_path / 'discovery.json')
+    load_document = gmail_client.load_discovery_document
+    monkeypatch.setattr(gmail_client, 'load_discovery_document', lambda: load_document(discovery))
+    return manager
+
+
+def test_client_is_built_once_and_shared(manager):
+    client = manager.get_client()
+    assert manager.get_client() is client
+    assert len(manager.loads) == 1
+    assert manager.creds.refreshes == 0
+    assert manager.saves == []
+
+
+def test_token_is_refreshed_within_the_margin(manager):
+    manager.get_client()
+    manager.creds.expiry = utc_in(100)
+    manager.get_client()
+    assert manager.creds.refreshes == 1
+    assert manager.saves == [manager.token_file]
+
+    manager.get_client()  # Fresh again for an hour
+    assert manager.creds.refreshes == 1
+
+
+def test_each_thread_sends_requests_on_its_own_http(manager):
+    service = manager.get_client().service
+
+    def request_http():
+        return service.users().messages().get(userId='me', id='m1').http
+
+    main_http = request_http()
+    assert request_http() is main_http
+    assert isinstance(main_http, google_auth_httplib2.AuthorizedHttp)
+    assert main_http.credentials is manager.creds
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(request_http()))
+    thread.start()
+    thread.join()
+    assert other[0] is not main_http
+
+
+def test_discovery_document_is_cached_in_a_file(tmp_path, monkeypatch):
+    cache_file = tmp_path / 'discovery.json'
+    document = gmail_client.load_discovery_document(str(cache_file))
+    assert document['name'] == 'gmail'
+    assert json.loads(cache_file.read_text())['version'] == 'v1'
+
+    def no_bundled_copy(*args):
+        raise AssertionError('the cached copy should be used')
+    monkeypatch.setattr(gmail_client.discovery_cache, 'get_static_doc', no_bundled_copy)
+    assert gmail_client.load_discovery_document(str(cache_file)) == document
+
+
+def test_unreadable_discovery_cache_is_replaced(tmp_path):
+    cache_file = tmp_path / 'discovery.json'
+    cache_file.write_text('{not json')
+    assert gmail_client.load_discovery_document(str(cache_file))['name'] == 'gmail'
+    assert json.loads(cache_file.read_text())['name'] == 'gmail'
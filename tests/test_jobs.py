@@ -0,0 +1,27 @@
+from src.jobs import Job
+
+
+def test_replay_buffer_keeps_the_most_recent_emails():
+    job = Job(replay_emails=3)
+    for index in range(5):
+        job.add_email({'id': f'm{index}'})
+
+    first, emails, running = job.wait_for_emails(0, timeout=0)
+    assert (first, [email['id'] for email in emails], running) == (2, ['m2', 'm3', 'm4'], True)
+    first, emails, _ = job.wait_for_emails(4, timeout=0)
+    assert (first, [email['id'] for email in emails]) == (4, ['m4'])
+    first, emails, _ = job.wait_for_emails(5, timeout=0)
+    assert (first, emails) == (5, [])
+
+
+def test_finish_and_fail_end_the_job_and_wake_streams():
+    job = Job()
+    job.finish({'message': 'done'})
+    assert job.wait_for_emails(0, timeout=5) == (0, [], False)
+    assert (job.status, job.result, job.error) == ('completed', {'message': 'done'}, None)
+
+    job = Job()
+    job.fail('Gmail is down')
+    assert job.to_dict()['status'] == 'failed'
+    assert job.to_dict()['error'] == 'Gmail is down'
+    assert job.finished_at is not None
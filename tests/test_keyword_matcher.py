@@ -0,0 +1,24 @@
+from src.keyword_matcher import KeywordMatcher
+from src.pipeline import simple_categorize_email
+from src.pre_classifier import PreClassifier
+
+
+def test_plural_and_inflected_keywords_match():
+    assert simple_categorize_email('Team meetings scheduled',
+                                   'Calls moved; deadlines next week') == ['DEADLINE', 'MEETING']
+
+
+def test_inflections_map_back_to_the_keyword():
+    matcher = KeywordMatcher({'pay': ['payment', 'invoice'], 'talk': ['call']})
+    assert matcher.find('Invoices and PAYMENTS; we called, calling again') == {
+        'invoice', 'payment', 'call'}
+    assert matcher.find('recall the callback') == set()
+
+
+def test_inflected_escalation_keyword_defers_bulk_mail_to_the_llm():
+    email_data = {'from_email': 'noreply@billing.example.com', 'subject': 'Your invoices',
+                  'content': 'Payments for March are listed below.',
+                  'list_unsubscribe': '<mailto:unsubscribe@example.com>'}
+    assert PreClassifier().classify(email_data) is None
+    email_data.update(subject='Your statement', content='Balance for March is listed below.')
+    assert PreClassifier().classify(email_data) == 'Unimportant'
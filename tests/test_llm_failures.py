@@ -0,0 +1,32 @@
+from src.classification_cache import ClassificationCache
+from src.pipeline import process_batch_safely
+from src.tiered_classifier import TieredClassifier
+
+
+def test_failed_call_is_not_a_label(llm, stub_llm, tmp_path):
+    llm.cache = ClassificationCache(str(tmp_path / 'cache.json'))
+    stub_llm.answer = lambda prompt: (500, 'overloaded')
+    assert llm.classify_email_importance('Invoice', 'Please pay', 'm1') is None
+
+    stub_llm.answer = lambda prompt: (200, '{"importance_level": "Very Important"}')
+    assert llm.classify_email_importance('Invoice', 'Please pay', 'm1') == 'Very Important'
+
+
+def test_unparseable_answer_is_not_a_label(llm, stub_llm):
+    stub_llm.answer = lambda prompt: (200, 'I am not sure.')
+    assert llm.classify_email_importance('Hello', 'Hi there') is None
+    stub_llm.answer = lambda prompt: (200, '{"importance_level": "Urgent"}')
+    assert llm.classify_email_importance('Hello', 'Hi there') is None
+
+
+def test_failed_emails_are_not_observed(llm, stub_llm):
+    stub_llm.answer = lambda prompt: (503, 'down')
+    observed = []
+    classifier = TieredClassifier([], observers=[lambda email_data, record: observed.append(record)])
+    batch = [{'id': f'm{i}', 'subject': f'Subject {i}', 'content': 'Body'} for i in range(3)]
+
+    records = process_batch_safely(batch, llm, use_llm=True, classifier=classifier)
+
+    assert [record['importance_level'] for record in records] == [None, None, None]
+    assert {record['classified_by'] for record in records} == {'unclassified'}
+    assert observed == []
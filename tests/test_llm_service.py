@@ -0,0 +1,133 @@
+import re
+import json
+import time
+from src.classification_cache import ClassificationCache
+from src.llm_service import (LLMService, create_session, estimate_tokens, LABEL_DEFINITIONS,
+                             BATCH_INSTRUCTIONS, FEW_SHOT_EXAMPLES)
+
+
+def scripted(*replies):
+    """An answer function returning replies in turn, then repeating the last one."""
+    replies = list(replies)
+    return lambda prompt: replies.pop(0) if len(replies) > 1 else replies[0]
+
+
+def emails_in(prompt):
+    return [int(index) for index in re.findall(r'^Email (\d+):$', prompt, re.M)]
+
+
+def batch_answer(prompt):
+    """Label every email of a batched or single-email prompt Important."""
+    indices = emails_in(prompt)
+    if not indices:
+        return 200, json.dumps({'importance_level': 'Important'})
+    return 200, json.dumps([{'index': index, 'importance_level': 'Important'} for index in indices])
+
+
+def emails(count, body='Body'):
+    return [{'id': f'm{index}', 'subject': f'Subject {index}', 'body': body} for index in range(count)]
+
+
+def test_requests_share_one_keep_alive_connection(llm, stub_llm):
+    for index in range(3):
+        assert llm.classify_email_importance(f'Subject {index}', 'Body') == 'Important'
+    assert len(stub_llm.ports) == 3
+    assert len(set(stub_llm.ports)) == 1
+
+
+def test_overloaded_server_is_retried(llm, stub_llm):
+    stub_llm.answer = scripted((503, ''), (429, ''), (200, '{"importance_level": "Unimportant"}'))
+    assert llm.classify_email_importance('Sale', 'Everything must go') == 'Unimportant'
+    assert len(stub_llm.prompts) == 3
+    assert llm.usage_stats()['errors'] == 0
+
+
+def test_retries_give_up_after_the_limit(llm, stub_llm):
+    stub_llm.answer = lambda prompt: (500, '')
+    assert llm.classify_email_importance('Sale', 'Everything must go') is None
+    assert len(stub_llm.prompts) == 3  # The first try and max_retries=2
+    assert llm.usage_stats()['errors'] == 1
+
+
+def test_read_timeout_is_not_retried(llm, stub_llm):
+    def slow(prompt):
+        time.sleep(0.5)
+        return 200, '{"importance_level": "Important"}'
+    stub_llm.answer = slow
+    llm.timeout = (1, 0.1)
+    assert llm.classify_email_importance('Slow', 'Model') is None
+    assert len(stub_llm.prompts) == 1
+
+
+def test_unreachable_server_fails_without_a_label():
+    llm = LLMService(session=create_session(max_retries=1, backoff=0), timeout=(0.5, 0.5))
+    llm.api_url = 'http://127.0.0.1:9/v1/chat/completions'
+    assert llm.classify_email_importance('Hello', 'Hi') is None
+    assert llm.usage_stats()['errors'] == 1
+
+
+def test_session_retries_with_exponential_backoff():
+    retry = create_session(max_retries=3, backoff=0.5).get_adapter('http://x').max_retries
+    assert (retry.total, retry.read, retry.backoff_factor) == (3, 0, 0.5)
+    assert set(retry.status_forcelist) == {429, 500, 502, 503, 504}
+    assert 'POST' in retry.allowed_methods
+
+
+def test_batches_are_packed_to_the_token_budget(llm, stub_llm):
+    stub_llm.answer = batch_answer
+    body = 'x' * 400  # About 100 tokens per email
+    prefix = estimate_tokens(LABEL_DEFINITIONS + BATCH_INSTRUCTIONS + FEW_SHOT_EXAMPLES)
+    llm.batch_token_budget = prefix + 250  # Room for two emails per request
+    assert llm.classify_batch(emails(5, body)) == ['Important'] * 5
+    # The fifth email is alone in its batch, so it gets the single-email prompt
+    assert [len(emails_in(prompt)) for prompt in stub_llm.prompts] == [2, 2, 0]
+
+    stub_llm.prompts.clear()
+    llm.batch_token_budget = 100000
+    llm.batch_max_emails = 3
+    assert llm.classify_batch(emails(5)) == ['Important'] * 5
+    assert [len(emails_in(prompt)) for prompt in stub_llm.prompts] == [3, 2]
+
+
+def test_batch_answer_wrapped_in_prose_or_code_fences(llm, stub_llm):
+    for wrap in ('Here you go: {} Let me know!', '```json\n{}\n```'):
+        stub_llm.prompts.clear()
+        stub_llm.answer = lambda prompt: (200, wrap.format(
+            '[{"index": 0, "importance_level": "Very Important"},'
+            ' {"index": 1, "importance_level": "Unimportant"}]'))
+        assert llm.classify_batch(emails(2)) == ['Very Important', 'Unimportant']
+        assert len(stub_llm.prompts) == 1
+
+
+def test_unparsed_emails_fall_back_to_single_calls(llm, stub_llm):
+    def partial(prompt):
+        if 'Email 0:' in prompt:
+            return 200, '[{"index": 0, "importance_level": "Unimportant"}, {"index": 7, "importance_level": "Important"}]'
+        return 200, '{"importance_level": "Very Important"}'
+    stub_llm.answer = partial
+    assert llm.classify_batch(emails(3)) == ['Unimportant', 'Very Important', 'Very Important']
+    assert len(stub_llm.prompts) == 3  # The batch, then one call each for emails 1 and 2
+
+    stub_llm.prompts.clear()
+    stub_llm.answer = scripted((200, 'I cannot help with that.'), (200, '{"importance_level": "Important"}'))
+    assert llm.classify_batch(emails(2)) == ['Important', 'Important']
+    assert len(stub_llm.prompts) == 3
+
+
+def test_failed_batch_request_falls_back_to_single_calls(llm, stub_llm):
+    stub_llm.answer = lambda prompt: (500, '') if 'Email 0:' in prompt else batch_answer(prompt)
+    assert llm.classify_batch(emails(2)) == ['Important', 'Important']
+    assert sum('Email 0:' in prompt for prompt in stub_llm.prompts) == 3  # The first try and max_retries=2
+    assert len(stub_llm.prompts) == 5
+
+
+def test_fallback_calls_count_one_cache_miss_per_email(llm, stub_llm, tmp_path):
+    llm.cache = ClassificationCache(str(tmp_path / 'cache.json'))
+    stub_llm.answer = lambda prompt: ((200, '[{"index": 0, "importance_level": "Unimportant"}]')
+                                      if 'Email 0:' in prompt else batch_answer(prompt))
+    assert llm.classify_batch(emails(2)) == ['Unimportant', 'Important']
+    assert llm.classify_batch([{'id': 'solo', 'subject': 'Solo', 'body': 'Body'}]) == ['Important']
+    assert (llm.cache.stats()['hits'], llm.cache.stats()['misses']) == (0, 3)
+
+    assert llm.classify_batch(emails(2)) == ['Unimportant', 'Important']
+    assert (llm.cache.stats()['hits'], llm.cache.stats()['misses']) == (2, 3)
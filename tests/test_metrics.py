@@ -0,0 +1,51 @@
+from src import metrics
+from src.metrics import Counter, Histogram, Registry
+
+
+def parse(text):
+    """Map each sample line of Prometheus text output to its value."""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+    return samples
+
+
+def test_histogram_buckets_are_cumulative_with_sum_and_count():
+    registry = Registry()
+    histogram = registry.register(Histogram('work_seconds', 'Work time', ['stage'], buckets=(0.1, 1.0)))
+    histogram.observe(0.05, stage='fetch')
+    histogram.observe(0.1, stage='fetch')  # A value on a bound counts in that bucket
+    histogram.observe(0.5, count=3, stage='fetch')
+    histogram.observe(7.0, stage='fetch')
+    histogram.observe(0.2, stage='list')
+
+    text = registry.render()
+    assert '# HELP work_seconds Work time\n# TYPE work_seconds histogram\n' in text
+    samples = parse(text)
+    assert samples['work_seconds_bucket{stage="fetch",le="0.1"}'] == 2
+    assert samples['work_seconds_bucket{stage="fetch",le="1.0"}'] == 5
+    assert samples['work_seconds_bucket{stage="fetch",le="+Inf"}'] == 6
+    assert samples['work_seconds_count{stage="fetch"}'] == 6
+    assert samples['work_seconds_sum{stage="fetch"}'] == 0.05 + 0.1 + 1.5 + 7.0
+    assert samples['work_seconds_bucket{stage="list",le="0.1"}'] == 0
+    assert samples['work_seconds_count{stage="list"}'] == 1
+    assert histogram.summary(stage='fetch') == (6, samples['work_seconds_sum{stage="fetch"}'])
+
+
+def test_counter_labels_are_escaped():
+    registry = Registry()
+    counter = registry.register(Counter('errors_total', 'Errors', ['stage']))
+    counter.inc(stage='say "hi"\n')
+    counter.inc(2, stage='say "hi"\n')
+    assert parse(registry.render()) == {'errors_total{stage="say \\"hi\\"\\n"}': 3}
+
+
+def test_metrics_endpoint_serves_the_registry(client):
+    metrics.errors_total.inc(stage='classify')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type == metrics.CONTENT_TYPE
+    assert '# TYPE inboxintel_llm_request_seconds histogram' in response.text
+    assert parse(response.text)['inboxintel_errors_total{stage="classify"}'] >= 1
@@ -0,0 +1,96 @@
+from src import pipeline
+from src.near_duplicates import NearDuplicateIndex
+from src.pipeline import process_batch_safely
+from src.tiered_classifier import TieredClassifier
+
+BODY = ('Your weekly report for the Berlin office is ready. Open the dashboard to see '
+        'sales, returns and open tickets for the week.')
+
+
+def newsletter(message_id):
+    return {'id': message_id, 'subject': 'Weekly report', 'content': BODY,
+            'from_email': 'reports@example.com', 'from': 'Reports <reports@example.com>'}
+
+
+def run(batch, llm):
+    classifier = TieredClassifier([('near_duplicate', pipeline.find_near_duplicate)],
+                                  observers=[pipeline.remember_near_duplicate])
+    return process_batch_safely(batch, llm, use_llm=True, classifier=classifier)
+
+
+def test_failed_label_is_not_reused(llm, stub_llm, tmp_path, monkeypatch):
+    index = NearDuplicateIndex(str(tmp_path / 'near.db'))
+    monkeypatch.setattr(pipeline, 'near_duplicates', index)
+
+    stub_llm.answer = lambda prompt: (500, 'down')
+    [record] = run([newsletter('m1')], llm)
+    assert record['classified_by'] == 'unclassified'
+    assert index.stats() == {'entries': 0}
+
+    stub_llm.answer = lambda prompt: (200, '{"importance_level": "Important"}')
+    [record] = run([newsletter('m2')], llm)
+    assert (record['importance_level'], record['classified_by']) == ('Important', 'llm')
+
+    [record] = run([newsletter('m3')], llm)
+    assert (record['importance_level'], record['classified_by']) == ('Important', 'near_duplicate')
+    assert record['duplicate_of'] == 'm2'
+
+
+def test_duplicate_is_summarized_from_its_own_body(llm, stub_llm, tmp_path, monkeypatch):
+    index = NearDuplicateIndex(str(tmp_path / 'near.db'))
+    monkeypatch.setattr(pipeline, 'near_duplicates', index)
+    stub_llm.answer = lambda prompt: (200, '{"importance_level": "Important"}')
+
+    def notice(message_id, order, date):
+        return {'id': message_id, 'subject': 'Your order has shipped', 'from_email': 'shop@example.com',
+                'from': 'Shop <shop@example.com>',
+                'content': f'Your order #{order} has shipped and will arrive on {date}. '
+                           'Track the parcel from your account page.'}
+
+    [first] = run([notice('m1', 12345, '10/21')], llm)
+    [second] = run([notice('m2', 67890, '11/03')], llm)
+    assert second['classified_by'] == 'near_duplicate'
+    assert '#12345' in first['summary'] and '10/21' in first['summary']
+    assert '#67890' in second['summary'] and '11/03' in second['summary']
+    assert '12345' not in second['summary']
+
+
+def test_only_llm_labels_are_remembered(tmp_path, monkeypatch):
+    index = NearDuplicateIndex(str(tmp_path / 'near.db'))
+    monkeypatch.setattr(pipeline, 'near_duplicates', index)
+    for classified_by in ('unclassified', 'rules', 'sender_profile'):
+        pipeline.remember_near_duplicate(
+            newsletter(classified_by),
+            {'importance_level': 'Unimportant', 'classified_by': classified_by, 'summary': ''})
+    assert index.stats() == {'entries': 0}
+
+
+def test_matches_stay_within_their_account(tmp_path):
+    index = NearDuplicateIndex(str(tmp_path / 'near.db'))
+    fingerprint = pipeline.email_fingerprint(newsletter('m1'))
+    index.add('m1', 'reports@example.com', fingerprint, 'Important', account='default')
+    index.add('m1', 'reports@example.com', fingerprint, 'Unimportant', account='work')
+    assert index.stats() == {'entries': 2}
+
+    index.flush()
+    reloaded = NearDuplicateIndex(str(tmp_path / 'near.db'))
+    assert reloaded.stats() == {'entries': 2}
+    assert reloaded.lookup('reports@example.com', fingerprint)['importance_level'] == 'Important'
+    assert reloaded.lookup('reports@example.com', fingerprint, 'work')['importance_level'] == 'Unimportant'
+
+    index.add('m2', 'reports@example.com', fingerprint, 'Important', account='home')
+    assert index.lookup('reports@example.com', fingerprint, 'other') is None
+    match = index.lookup('reports@example.com', fingerprint, 'home')
+    assert (match['account'], match['message_id']) == ('home', 'm2')
+
+
+def test_reload_picks_up_another_processes_entries(tmp_path):
+    path = str(tmp_path / 'near.db')
+    web, worker = NearDuplicateIndex(path), NearDuplicateIndex(path)
+    fingerprint = pipeline.email_fingerprint(newsletter('m1'))
+    worker.add('m1', 'reports@example.com', fingerprint, 'Unimportant')
+    worker.flush()
+    assert web.lookup('reports@example.com', fingerprint) is None
+
+    web.reload()
+    assert web.lookup('reports@example.com', fingerprint)['message_id'] == 'm1'
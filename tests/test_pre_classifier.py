@@ -0,0 +1,76 @@
+import pytest
+from test_llm_service import batch_answer, emails_in
+from src.pipeline import process_emails_concurrently
+from src.pre_classifier import PreClassifier
+from src.tiered_classifier import TieredClassifier
+
+classifier = PreClassifier({'bank.example': 'Very Important', 'shop.example': 'Unimportant'})
+
+
+def email(from_email='news@store.example', subject='Hello', content='Nothing to see', **fields):
+    return dict({'from_email': from_email, 'subject': subject, 'content': content}, **fields)
+
+
+@pytest.mark.parametrize('from_email, level', [
+    ('alerts@bank.example', 'Very Important'),
+    ('alerts@mail.BANK.example', 'Very Important'),  # Parent domains match too
+    ('deals@shop.example', 'Unimportant'),
+    ('alerts@notbank.example', None),
+    ('alerts@bank.example.net', None),
+])
+def test_sender_domain_rules(from_email, level):
+    assert classifier.classify_domain({'from_email': from_email}) == level
+    assert classifier.classify(email(from_email)) == level
+
+
+def test_domain_rule_wins_over_escalation_keywords():
+    assert classifier.classify(email('deals@shop.example', subject='Final notice')) == 'Unimportant'
+
+
+@pytest.mark.parametrize('label', ['CATEGORY_PROMOTIONS', 'CATEGORY_SOCIAL', 'CATEGORY_FORUMS'])
+def test_bulk_labels(label):
+    assert classifier.classify(email('ann@friends.example', label_ids=['INBOX', label])) == 'Unimportant'
+    assert classifier.classify(email('ann@friends.example', label_ids=['INBOX'])) is None
+
+
+@pytest.mark.parametrize('headers', [
+    {'precedence': 'Bulk'},
+    {'precedence': 'list'},
+    {'auto_submitted': 'auto-generated'},
+    {'list_unsubscribe': '<mailto:unsubscribe@store.example>'},
+])
+def test_bulk_headers_from_automated_senders(headers):
+    assert classifier.classify(email('noreply@store.example', **headers)) == 'Unimportant'
+    # A person writing to a mailing list isn't decided here
+    assert classifier.classify(email('ann@store.example', **headers)) is None
+
+
+def test_bulk_headers_with_promotional_wording():
+    assert classifier.classify(email('ann@store.example', subject='Big sale this weekend',
+                                     list_unsubscribe='<https://store.example/u>')) == 'Unimportant'
+
+
+@pytest.mark.parametrize('headers', [{'auto_submitted': 'no'}, {'precedence': 'first-class'}, {}])
+def test_headers_that_are_not_bulk(headers):
+    assert classifier.classify(email('noreply@store.example', **headers)) is None
+
+
+def test_escalation_keywords_defer_to_the_llm():
+    assert classifier.classify(email('noreply@store.example', subject='Your invoice is overdue',
+                                     label_ids=['CATEGORY_PROMOTIONS'], precedence='bulk')) is None
+
+
+def test_only_emails_the_tiers_leave_undecided_fill_llm_batches(llm, stub_llm):
+    stub_llm.answer = batch_answer
+    tiered = TieredClassifier([('rules', classifier.classify)])
+    batch = [email('deals@shop.example' if index % 2 else 'ann@friends.example',
+                   subject=f'Subject {index}') for index in range(8)]
+    for index, email_data in enumerate(batch):
+        email_data['id'] = f'm{index}'
+
+    records = list(process_emails_concurrently(batch, llm, use_llm=True, max_in_flight=2,
+                                               batch_size=2, classifier=tiered))
+
+    assert [record['id'] for record in records] == [f'm{index}' for index in range(8)]
+    assert [record['classified_by'] for record in records] == ['llm', 'rules'] * 4
+    assert sorted(len(emails_in(prompt)) for prompt in stub_llm.prompts) == [2, 2]
@@ -0,0 +1,43 @@
+from src.prompt_compaction import TRUNCATION_MARKER, compact_email_body, is_boilerplate
+
+
+def test_quoted_history_and_signature_are_removed():
+    body = ('Can we move the review to Friday?\n\n'
+            '-- \nAnn Smith\nHead of Sales\n\n'
+            'On Mon, Oct 13, 2026 at 9:00 AM Bob <bob@example.com> wrote:\n'
+            '> The review is on Thursday.\n> Thanks')
+    text, original, compacted = compact_email_body(body, token_budget=1000)
+    assert text == 'Can we move the review to Friday?'
+    assert compacted < original
+
+
+def test_quoted_lines_and_forwarded_history_are_removed():
+    body = ('Looks good to me.\n> Earlier reply\n> more\nShip it.\n\n'
+            '---------- Forwarded message ---------\nFrom: Carol\nDate: Mon\n\nOld text')
+    text, _, _ = compact_email_body(body, token_budget=1000)
+    assert text == 'Looks good to me.\nShip it.'
+
+
+def test_footer_boilerplate_is_removed_and_links_shortened():
+    body = ('Your statement is ready: https://bank.example.com/statements/2026/10?id=123\n'
+            'Unsubscribe or manage your email preferences here.\n'
+            '© 2026 Example Bank. All rights reserved.')
+    text, _, _ = compact_email_body(body, token_budget=1000)
+    assert text == 'Your statement is ready: [link:bank.example.com]'
+    assert is_boilerplate('You are receiving this because you signed up.')
+    assert not is_boilerplate('Please send me the receipt.')
+
+
+def test_all_boilerplate_keeps_the_original():
+    body = 'Unsubscribe from this list'
+    assert compact_email_body(body, token_budget=1000)[0] == body
+
+
+def test_long_body_keeps_the_head_and_tail():
+    body = 'HEAD ' + 'middle ' * 500 + 'TAIL'
+    text, original, compacted = compact_email_body(body, token_budget=50)
+    assert len(text) == 200
+    assert text.startswith('HEAD middle')
+    assert text.endswith('middle TAIL')
+    assert TRUNCATION_MARKER in text
+    assert compacted < original
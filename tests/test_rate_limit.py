@@ -0,0 +1,114 @@
+import threading
+import time
+
+import pytest
+
+from src import rate_limit
+from src.rate_limit import FairShare, TokenBucket
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, 'time', clock)
+    return clock
+
+
+def test_bucket_allows_a_burst_then_refills_at_rate(clock):
+    bucket = TokenBucket(rate=10, capacity=20)
+    bucket.acquire(20)
+    assert clock.sleeps == []
+
+    bucket.acquire(5)
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+    clock.now += 1.0
+    bucket.acquire(10)
+    assert len(clock.sleeps) == 1
+    assert bucket.waited == pytest.approx(0.5)
+
+
+def test_bucket_refill_is_capped_at_capacity(clock):
+    bucket = TokenBucket(rate=10, capacity=20)
+    clock.now += 60
+    bucket.acquire(20)
+    bucket.acquire(1)
+    assert clock.sleeps == [pytest.approx(0.1)]
+
+
+def test_request_larger_than_capacity_leaves_the_bucket_in_debt(clock):
+    bucket = TokenBucket(rate=10, capacity=20)
+    bucket.acquire(50)
+    assert clock.sleeps == []
+
+    bucket.acquire(1)
+    assert clock.sleeps == [pytest.approx(3.1)]
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timed out'
+        time.sleep(0.005)
+
+
+def test_freed_slot_goes_to_the_key_holding_fewest_slots():
+    share = FairShare(2)
+    share.acquire('a')
+    share.acquire('a')
+    order = []
+
+    def worker(key):
+        share.acquire(key)
+        order.append(key)
+
+    threads = []
+    for expected, key in enumerate(('a', 'b'), 1):
+        thread = threading.Thread(target=worker, args=(key,))
+        thread.start()
+        threads.append(thread)
+        wait_for(lambda: share.waiting == expected)
+
+    share.release('a')
+    wait_for(lambda: order == ['b'])
+    assert share.waiting == 1
+
+    share.release('a')
+    for thread in threads:
+        thread.join(5)
+    assert order == ['b', 'a']
+
+
+def test_same_share_goes_to_the_oldest_request():
+    share = FairShare(1)
+    share.acquire('x')
+    order = []
+
+    def worker(key):
+        with share.slot(key):
+            order.append(key)
+
+    threads = []
+    for expected, key in enumerate(('b', 'a', 'c'), 1):
+        thread = threading.Thread(target=worker, args=(key,))
+        thread.start()
+        threads.append(thread)
+        wait_for(lambda: share.waiting == expected)
+
+    share.release('x')
+    for thread in threads:
+        thread.join(5)
+    assert order == ['b', 'a', 'c']
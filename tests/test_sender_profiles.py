@@ -0,0 +1,51 @@
+import sqlite3
+from src.sender_profiles import SenderProfileIndex
+
+
+def test_profiles_are_kept_per_account(tmp_path):
+    index = SenderProfileIndex(str(tmp_path / 'profiles.db'), min_samples=2, reverify_rate=0)
+    for message_id in ('m1', 'm2'):
+        index.observe({'id': message_id, 'account': 'default', 'from_email': 'boss@example.com'},
+                      {'importance_level': 'Very Important'})
+        index.observe({'id': message_id, 'account': 'work', 'from_email': 'boss@example.com'},
+                      {'importance_level': 'Unimportant'})
+    assert index.predict({'from_email': 'boss@example.com'}) == 'Very Important'
+    assert index.predict({'account': 'work', 'from_email': 'boss@example.com'}) == 'Unimportant'
+    assert index.predict({'account': 'home', 'from_email': 'boss@example.com'}) is None
+
+    index.flush()
+    reloaded = SenderProfileIndex(str(tmp_path / 'profiles.db'), min_samples=2, reverify_rate=0)
+    assert reloaded.predict({'from_email': 'boss@example.com'}) == 'Very Important'
+    assert reloaded.predict({'account': 'work', 'from_email': 'boss@example.com'}) == 'Unimportant'
+
+
+def test_observations_from_before_accounts_are_migrated(tmp_path):
+    path = str(tmp_path / 'profiles.db')
+    conn = sqlite3.connect(path)
+    with conn:
+        conn.execute('CREATE TABLE sender_observations (message_id TEXT PRIMARY KEY, '
+                     'sender TEXT NOT NULL, importance_level TEXT NOT NULL)')
+        conn.executemany('INSERT INTO sender_observations VALUES (?, ?, ?)',
+                         [(f'm{i}', 'news@example.com', 'Unimportant') for i in range(3)])
+    conn.close()
+
+    index = SenderProfileIndex(path, min_samples=3, reverify_rate=0)
+
+    assert index.predict({'from_email': 'news@example.com'}) == 'Unimportant'
+    index.observe({'id': 'm0', 'account': 'default', 'from_email': 'news@example.com'},
+                  {'importance_level': 'Important'})
+    assert index.predict({'from_email': 'news@example.com'}) == 'Unimportant'
+
+
+def test_reload_picks_up_another_processes_observations(tmp_path):
+    path = str(tmp_path / 'profiles.db')
+    web = SenderProfileIndex(path, min_samples=2, reverify_rate=0)
+    worker = SenderProfileIndex(path, min_samples=2, reverify_rate=0)
+    for message_id in ('m1', 'm2'):
+        worker.observe({'id': message_id, 'from_email': 'boss@example.com'},
+                       {'importance_level': 'Important'})
+    worker.flush()
+    assert web.predict({'from_email': 'boss@example.com'}) is None
+
+    web.reload()
+    assert web.predict({'from_email': 'boss@example.com'}) == 'Important'
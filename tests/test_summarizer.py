@@ -0,0 +1,39 @@
+from src.summarizer import NO_CONTENT, iter_sentences, summarize
+
+
+def test_boilerplate_greetings_and_links_never_reach_the_summary():
+    body = ('Hi Ann,\n\n'
+            'Your flight to Lisbon on Friday has been moved to 18:40 because of a crew change. '
+            'The new gate will be announced at the airport three hours before departure. '
+            'You can pick a new seat in the app at no extra cost.\n\n'
+            'View this email in your browser: https://airline.example.com/view\n'
+            'You are receiving this email because you booked a flight with us.\n'
+            'Unsubscribe from flight updates here.\n\n'
+            'Best regards,\nThe Airline Team')
+    summary = summarize(body, max_sentences=2, max_chars=300)
+    assert 'flight to Lisbon' in summary
+    for unwanted in ('Hi Ann', 'browser', 'receiving', 'Unsubscribe', 'http', 'regards'):
+        assert unwanted not in summary
+    assert len(summary) <= 300
+
+
+def test_summary_keeps_the_original_sentence_order():
+    body = ('The budget meeting moved to Thursday at 3pm in room 4. '
+            'Coffee will be served in the lobby beforehand for everyone. '
+            'Please bring the updated budget numbers for the meeting on Thursday.')
+    summary = summarize(body, max_sentences=2)
+    sentences = list(iter_sentences(summary))
+    assert len(sentences) == 2
+    assert body.index(sentences[0]) < body.index(sentences[1])
+
+
+def test_abbreviations_and_decimals_do_not_split_sentences():
+    text = 'Dr. Smith paid $3.50 to Acme Inc. on Monday. The invoice is attached.'
+    assert list(iter_sentences(text)) == [
+        'Dr. Smith paid $3.50 to Acme Inc. on Monday.', 'The invoice is attached.']
+
+
+def test_short_or_empty_bodies():
+    assert summarize('') == NO_CONTENT
+    assert summarize('Thanks!') == 'Thanks!'
+    assert summarize('word ' * 200, max_chars=50).endswith('...')
@@ -0,0 +1,174 @@
+import pytest
+from conftest import gmail_message, http_error
+from src import pipeline
+from src.jobs import Job
+from src.lock_file import LockFile
+
+
+@pytest.fixture
+def sync(store, gmail, llm, monkeypatch):
+    """Run sync_account for the default account with the simple (non-LLM) pipeline."""
+    monkeypatch.setattr(pipeline, 'email_store', store)
+    monkeypatch.setattr(pipeline, 'GMAIL_LIST_PAGE_SIZE', 2)
+    llm.api_key = None
+
+    def run(force_full_sync=False):
+        return pipeline.sync_account(Job(), 'default', llm, concurrency=2, batch_size=1,
+                                     force_full_sync=force_full_sync)
+    return run
+
+
+def stored_ids(store):
+    return sorted(email['id'] for email in store.query_emails(limit=100)[0])
+
+
+def test_full_sync_replaces_stored_emails(sync, store, gmail):
+    store.apply_changes(upserts=[{'id': 'gone', 'subject': 'Read elsewhere', 'received_time': '1'}])
+    gmail.mailbox = {f'm{i}': gmail_message(f'm{i}') for i in range(5)}
+
+    result = sync()
+
+    assert (result['sync_mode'], result['complete'], result['processed']) == ('full', True, 5)
+    assert stored_ids(store) == ['m0', 'm1', 'm2', 'm3', 'm4']
+    assert store.get_state(pipeline.history_state_key('default')) == '100'
+
+
+def test_broken_listing_keeps_stored_emails_and_history(sync, store, gmail):
+    store.apply_changes(upserts=[{'id': 'kept', 'subject': 'Still unread', 'received_time': '1'}])
+    gmail.mailbox = {f'm{i}': gmail_message(f'm{i}') for i in range(5)}
+    gmail.fail('messages.list', http_error(500), key='2')
+
+    result = sync()
+
+    assert (result['complete'], result['processed']) == (False, 2)
+    assert stored_ids(store) == ['kept', 'm0', 'm1']
+    assert store.get_state(pipeline.history_state_key('default')) is None
+
+
+def added(*message_ids):
+    return [{'messagesAdded': [{'message': {'id': message_id, 'labelIds': ['UNREAD', 'INBOX']}}]}
+            for message_id in message_ids]
+
+
+def test_incremental_sync_retries_failed_fetches(sync, store, gmail):
+    store.set_state(pipeline.history_state_key('default'), '50')
+    gmail.mailbox = {message_id: gmail_message(message_id) for message_id in ('m1', 'm2')}
+    gmail.history_records = added('m1', 'm2')
+    gmail.fail('messages.get', http_error(400), key='m2')
+
+    result = sync()
+
+    assert (result['sync_mode'], result['processed'], result['retry']) == ('incremental', 1, 1)
+    assert stored_ids(store) == ['m1']
+    assert store.get_state(pipeline.history_state_key('default')) == '100'
+
+    gmail.history_records = []
+    gmail.history_id = '120'
+    result = sync()
+
+    assert (result['processed'], result['retry']) == (1, 0)
+    assert stored_ids(store) == ['m1', 'm2']
+    assert store.get_state(pipeline.history_state_key('default')) == '120'
+
+
+def test_fetch_is_retried_a_limited_number_of_syncs(sync, store, gmail, monkeypatch):
+    monkeypatch.setattr(pipeline, 'FETCH_RETRY_SYNCS', 2)
+    store.set_state(pipeline.history_state_key('default'), '50')
+    gmail.history_records = added('missing')
+
+    assert sync()['retry'] == 1
+    gmail.history_records = []
+    assert sync()['retry'] == 0
+    assert [key for method, key in gmail.calls if method == 'messages.get'] == ['missing', 'missing']
+
+
+def test_processed_emails_are_saved_in_batches(sync, store, gmail, monkeypatch):
+    monkeypatch.setattr(pipeline, 'PERSIST_BATCH_SIZE', 2)
+    monkeypatch.setattr(pipeline, 'GMAIL_FETCH_FORMAT', 'full')
+    gmail.mailbox = {f'm{i}': gmail_message(f'm{i}', body=f'Body of message number{i}')
+                     for i in range(5)}
+    saved = []
+    apply_changes = store.apply_changes
+    monkeypatch.setattr(store, 'apply_changes', lambda upserts=(), **kwargs: (
+        saved.append(len(upserts)), apply_changes(upserts=upserts, **kwargs)))
+
+    sync()
+
+    assert saved == [2, 2, 1]
+    assert store.get_body('m3') == 'Body of message number3'
+
+
+def test_run_refused_while_another_process_syncs(tmp_path, monkeypatch):
+    path = str(tmp_path / 'sync.lock')
+    monkeypatch.setattr(pipeline, 'SYNC_LOCK_FILE', path)
+    held = LockFile(path)
+    assert held.acquire()
+    try:
+        with pytest.raises(RuntimeError, match='Another sync'):
+            pipeline.run_processing(Job(), {'accounts': ['default']})
+    finally:
+        held.release()
+
+
+def test_run_releases_the_lock(tmp_path, monkeypatch):
+    path = str(tmp_path / 'sync.lock')
+    monkeypatch.setattr(pipeline, 'SYNC_LOCK_FILE', path)
+    with pytest.raises(ValueError, match='Unknown accounts'):
+        pipeline.run_processing(Job(), {'accounts': ['nobody']})
+    lock = LockFile(path)
+    assert lock.acquire()
+    lock.release()
+
+
+def test_metadata_fetch_checks_escalation_keywords_in_the_body(store, gmail, llm, stub_llm,
+                                                                monkeypatch):
+    monkeypatch.setattr(pipeline, 'email_store', store)
+    monkeypatch.setattr(pipeline, 'GMAIL_FETCH_FORMAT', 'metadata')
+    message = gmail_message('m1', subject='Your monthly statement', sender='noreply@shop.example',
+                            body='Thanks for shopping with us this month. ' * 5
+                                 + 'Your invoice is overdue and must be paid today.')
+    message['labelIds'].append('CATEGORY_PROMOTIONS')
+    gmail.mailbox = {'m1': message}
+    stub_llm.answer = lambda prompt: (200, '{"importance_level": "Very Important"}')
+
+    pipeline.sync_account(Job(), 'default', llm, concurrency=1, batch_size=1)
+
+    email = store.get_email('m1')
+    assert (email['importance_level'], email['classified_by']) == ('Very Important', 'llm')
+
+
+@pytest.mark.parametrize('requested, used', [(1000, pipeline.LLM_MAX_CONCURRENCY), (0, 1), (2, 2)])
+def test_concurrency_is_clamped(requested, used, tmp_path, monkeypatch):
+    monkeypatch.setattr(pipeline, 'SYNC_LOCK_FILE', str(tmp_path / 'sync.lock'))
+    monkeypatch.setattr(pipeline, 'list_accounts', lambda: ['default'])
+    seen = []
+
+    def sync_account(job, account, llm_service, concurrency, batch_size, force_full_sync):
+        seen.append(concurrency)
+        return {'processed': 0, 'removed': 0}
+
+    monkeypatch.setattr(pipeline, 'sync_account', sync_account)
+    pipeline.run_processing(Job(), {'concurrency': requested})
+    assert seen == [used]
+
+
+def test_emails_the_llm_could_not_classify_are_retried(store, gmail, llm, stub_llm, monkeypatch):
+    monkeypatch.setattr(pipeline, 'email_store', store)
+    store.set_state(pipeline.history_state_key('default'), '50')
+    gmail.mailbox = {'m1': gmail_message('m1', subject='Quarterly plan', body='Can we talk about the plan?')}
+    gmail.history_records = added('m1')
+    stub_llm.answer = lambda prompt: (503, '')
+
+    result = pipeline.sync_account(Job(), 'default', llm, concurrency=1, batch_size=1)
+
+    assert (result['processed'], result['retry']) == (1, 1)
+    stored = store.get_email('m1')
+    assert (stored['classified_by'], stored['importance_level']) == ('unclassified', None)
+
+    stub_llm.answer = lambda prompt: (200, '{"importance_level": "Important"}')
+    gmail.history_records = []
+    result = pipeline.sync_account(Job(), 'default', llm, concurrency=1, batch_size=1)
+
+    assert (result['sync_mode'], result['processed'], result['retry']) == ('incremental', 1, 0)
+    stored = store.get_email('m1')
+    assert (stored['classified_by'], stored['importance_level']) == ('llm', 'Important')
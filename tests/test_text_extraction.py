@@ -0,0 +1,35 @@
+import base64
+from src.text_extraction import extract_part_text, html_to_text, part_charset
+
+
+def part(data, mime_type='text/plain', content_type=None):
+    headers = [{'name': 'Content-Type', 'value': content_type}] if content_type else []
+    return {'mimeType': mime_type, 'headers': headers,
+            'body': {'data': base64.urlsafe_b64encode(data).decode()}}
+
+
+def test_style_script_and_comments_are_dropped():
+    markup = ('<html><head><title>Promo</title><style>p { color: red; }</style></head>'
+              '<body><!-- tracking --><script>var x = "<p>";</script>'
+              '<p>Your order&nbsp;has <b>shipped</b>.</p><div>Track it &amp; relax</div></body></html>')
+    assert html_to_text(markup) == 'Your order has shipped.\n\nTrack it & relax'
+
+
+def test_invisible_preheader_padding_is_collapsed():
+    assert html_to_text('<p>Sale\u200b\u034f \u200b\u034f ends\u00a0today</p>') == 'Sale ends today'
+
+
+def test_charset_comes_from_the_parts_content_type():
+    text = 'Café déjà vu'
+    latin1 = part(text.encode('latin-1'), content_type='text/plain; charset="ISO-8859-1"')
+    assert part_charset(latin1) == 'ISO-8859-1'
+    assert extract_part_text(latin1) == text
+
+    html = part(text.encode('utf-8'), 'text/html', 'text/html; charset=utf-8')
+    assert extract_part_text(html) == text
+
+
+def test_undeclared_or_unknown_charset_falls_back():
+    assert extract_part_text(part('Café'.encode('utf-8'))) == 'Café'
+    assert extract_part_text(part('Café'.encode('cp1252'), content_type='text/plain; charset=bogus')) == 'Café'
+    assert extract_part_text({'mimeType': 'text/plain', 'body': {}}) == ''
@@ -0,0 +1,51 @@
+from types import SimpleNamespace
+import pytest
+from src import worker
+from src.lock_file import LockFile
+
+
+@pytest.mark.parametrize('jitter, elapsed, low, high', [
+    (0, 0, 600, 600),
+    (0, 150, 450, 450),
+    (0.1, 0, 540, 660),
+    (0.1, 1000, 0, 0),  # A run that overran the interval is followed right away
+])
+def test_next_delay(jitter, elapsed, low, high):
+    for _ in range(50):
+        assert low <= worker.next_delay(600, jitter, elapsed) <= high
+
+
+@pytest.fixture
+def runs(tmp_path, monkeypatch):
+    """Records the options of each run_processing call; a run raises if error is set."""
+    runs = SimpleNamespace(options=[], error=None, lock_file=str(tmp_path / 'worker.lock'))
+
+    def run_processing(job, options):
+        runs.options.append(dict(options))
+        if runs.error:
+            raise RuntimeError(runs.error)
+        return {'message': 'Processed 0 emails', 'accounts': {}}
+
+    monkeypatch.setattr(worker, 'run_processing', run_processing)
+    monkeypatch.setattr(worker, 'import_legacy_emails', lambda: None)
+    monkeypatch.setattr(worker.signal, 'signal', lambda signum, handler: None)
+    return runs
+
+
+def test_once_exits_with_the_runs_outcome(runs):
+    assert worker.main(['--once', '--lock-file', runs.lock_file, '--full-sync']) == 0
+    assert [options['full_sync'] for options in runs.options] == [True]
+
+    runs.error = 'Gmail is down'
+    assert worker.main(['--once', '--lock-file', runs.lock_file]) == 1
+    assert [options['full_sync'] for options in runs.options] == [True, False]
+
+
+def test_exits_when_another_worker_holds_the_lock(runs):
+    other = LockFile(runs.lock_file)
+    assert other.acquire()
+    try:
+        assert worker.main(['--once', '--lock-file', runs.lock_file]) == 2
+    finally:
+        other.release()
+    assert runs.options == []